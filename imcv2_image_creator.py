@@ -31,88 +31,370 @@ Examples:
 
 Dependencies:
 - Python 3.x
-- curl (for downloading resources)
 - WSL installed and configured on the Windows system
 
 Notes:
 - This script is designed for internal use by the Intel IMCv2 team.
 """
+import time
+
+# Reference point of the startup timings (see '--profile_startup')
+startup_time = time.perf_counter()
+
 import os
 
 try:
     import winreg
 except ImportError:
-    raise EnvironmentError("This script must be run on Windows.")
-import argparse
-import configparser
+    # Checked by wsl_runner_main(), the rest of the module stays importable for testing
+    winreg = None
+import atexit
+import contextvars
+import importlib
 import itertools
-import shutil
-import re
-import platform
-import ctypes
-import subprocess
 import sys
-import time
 import threading
-import urllib.request
-import urllib.error
 from contextlib import suppress
 from enum import Enum
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 from typing import Optional
-from ctypes import wintypes
+
+# Modules imported on first use: (name, seconds since startup, import duration)
+import_timings = []
+
+
+class LazyModule:
+    """
+    Stands in for a module which is imported on first attribute access.
+    The script is usually piped from curl and most runs use only part of what it imports, deferring the heavier
+    modules (http.client pulls in ssl and email) keeps '--help', '--version' and the first status line fast.
+    Submodules are imported on first access too, e.g. 'http.client' through LazyModule("http").
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            self._module = wsl_runner_import(self._name)
+        try:
+            return getattr(self._module, attribute)
+        except AttributeError:
+            try:
+                return wsl_runner_import(f"{self._name}.{attribute}")
+            except ModuleNotFoundError:
+                raise AttributeError(f"module '{self._name}' has no attribute '{attribute}'") from None
+
+
+def wsl_runner_import(name: str):
+    """
+    Imports a module, recording how long it took.
+
+    Args:
+        name (str): The module name.
+
+    Returns:
+        module: The imported module.
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    import_timings.append((name, start - startup_time, time.perf_counter() - start))
+    return module
+
+
+argparse = LazyModule("argparse")
+asyncio = LazyModule("asyncio")
+concurrent = LazyModule("concurrent")
+configparser = LazyModule("configparser")
+ctypes = LazyModule("ctypes")
+gzip = LazyModule("gzip")
+hashlib = LazyModule("hashlib")
+http = LazyModule("http")
+json = LazyModule("json")
+lzma = LazyModule("lzma")
+platform = LazyModule("platform")
+re = LazyModule("re")
+shutil = LazyModule("shutil")
+socket = LazyModule("socket")
+ssl = LazyModule("ssl")
+subprocess = LazyModule("subprocess")
+tarfile = LazyModule("tarfile")
+urllib = LazyModule("urllib")
+zipfile = LazyModule("zipfile")
+zlib = LazyModule("zlib")
 
 # Script defaults, some of which could be override using command arguments
-IMCV2_WSL_DEFAULT_BASE_PATH = os.path.join(os.environ["USERPROFILE"], "IMCV2_SDK")
+IMCV2_WSL_DEFAULT_BASE_PATH = os.path.join(os.environ.get("USERPROFILE", os.path.expanduser("~")), "IMCV2_SDK")
 IMCV2_WSL_DEFAULT_INTEL_PROXY = "http://proxy-dmz.intel.com:911"
 IMCV2_WSL_DEFAULT_LINUX_IMAGE_PATH = "Bare"
 IMCV2_WSL_DEFAULT_SDK_INSTANCES_PATH = "Instances"
+IMCV2_WSL_DEFAULT_CACHE_PATH = "Cache"
+IMCV2_WSL_DEFAULT_RESOURCES_CACHE_PATH = "resources"
+IMCV2_WSL_DEFAULT_ARTIFACTS_CACHE_PATH = "artifacts"
+IMCV2_WSL_DEFAULT_RESOURCE_VERSIONS = 3
+IMCV2_WSL_DEFAULT_DELTA_BLOCK_SIZE = 1024 * 1024
+IMCV2_WSL_BUNDLE_INDEX = "imcv2_bundle.json"
+IMCV2_WSL_RESOURCES_INDEX = "resources.json"
+IMCV2_WSL_BLOCK_INDEX_SUFFIX = ".blocks.json"
 IMCV2_WSL_DEFAULT_UBUNTU_URL = ("https://cdimage.ubuntu.com/ubuntu-base/releases/24.04.1/release/"
                                 "ubuntu-base-24.04.2-base-amd64.tar.gz")
 IMCV2_WSL_DEFAULT_RESOURCES_URL = "https://raw.githubusercontent.com/emichael72/wsl_starter/main/resources"
+IMCV2_WSL_DEFAULT_UBUNTU_MIRROR = "http://archive.ubuntu.com/ubuntu"
+IMCV2_WSL_DEFAULT_UBUNTU_SUITE = "noble"
+IMCV2_WSL_DEFAULT_UBUNTU_COMPONENTS = ("main", "universe")
+IMCV2_WSL_DEFAULT_INDEXES_CACHE_PATH = "indexes"
+IMCV2_WSL_DEFAULT_APT_LISTS_CACHE_PATH = "apt_lists"
+IMCV2_WSL_DEFAULT_APT_LISTS_MAX_AGE = 6 * 3600  # Snapshots younger than this are used without 'apt update'
 IMCV2_WSL_DEFAULT_PASSWORD = "intel@1234"
 IMCV2_WSL_DEFAULT_MIN_FREE_SPACE = 10 * (1024 ** 3)  # Minimum 10 Gigs of free disk space
+IMCV2_WSL_ESTIMATE_BASE_SIZE = 768 * (1024 ** 2)  # Unpacked base image and APT lists
+IMCV2_WSL_ESTIMATE_PYENV_SIZE = 1024 * (1024 ** 2)  # Python build tree and installation
+IMCV2_WSL_ESTIMATE_PACKAGE_SIZE = 8 * (1024 ** 2)  # Download and installed size per package, without an index
+IMCV2_WSL_ESTIMATE_MARGIN = 1024 * (1024 ** 2)  # Headroom on top of the estimated peak (plus 10%)
 IMCV2_WSL_DEFAULT_DRIVE_LETTER = "W"
+IMCV2_WSL_DEFAULT_PROBE_TIMEOUT = 1.5  # Seconds allowed for the network route probe
+IMCV2_WSL_DEFAULT_MIN_STEP_TIMEOUT = 60
+IMCV2_WSL_DEFAULT_STEP_HISTORY = 5
+IMCV2_WSL_DEFAULT_ROUTE_CACHE_TTL = 24 * 3600  # Seconds a probed route is reused for the same network
+IMCV2_WSL_DEFAULT_MIRROR_CACHE_TTL = 7 * 24 * 3600  # Seconds a mirror benchmark is reused for the same network
+IMCV2_WSL_DEFAULT_MIRROR_TIMEOUT = 5  # Seconds allowed for each mirror benchmark
+IMCV2_WSL_MIRROR_SAMPLE_SIZE = 1024 * 1024  # Bytes fetched from each mirror, about a typical package
+IMCV2_WSL_MIRROR_MIN_SAMPLE_SIZE = 256 * 1024  # Mirrors that send less than this are not ranked
+
+# Tasks of each resource class run at the same time by the asynchronous engine (see AsyncEngine)
+IMCV2_WSL_ASYNC_LIMITS = {"guest": 2, "network": 4, "disk": 1}
+
+# Resource class of the external processes, others are not limited
+IMCV2_WSL_PROCESS_RESOURCES = {"wsl": "guest"}
 
 # Script version
 IMCV2_SCRIPT_NAME = "WSL Creator"
 IMCV2_SCRIPT_VERSION = "1.1"
 IMCV2_SCRIPT_DESCRIPTION = "WSL Image Creator"
 
-# List of remote downloadable resources
+# Time zone used when the host time zone is unknown
+IMCV2_WSL_DEFAULT_TIME_ZONE = "Asia/Jerusalem"
+
+# Packages configured through the debconf preseed, installed along with the packages list
+IMCV2_WSL_PRESEED_PACKAGES = ("tzdata", "console-setup", "krb5-config", "krb5-user")
+
+# Provisioning dpkg and APT settings: no fsync per file and triggers run once at the end of each APT run,
+# removed once the packages are installed (see run_install_system_packages())
+IMCV2_WSL_DPKG_UNSAFE_IO_FILE = "/etc/dpkg/dpkg.cfg.d/imcv2-unsafe-io"
+IMCV2_WSL_APT_TRIGGERS_FILE = "/etc/apt/apt.conf.d/90imcv2-triggers"
+IMCV2_WSL_APT_TRIGGERS = ('DPkg::NoTriggers "true";', 'DPkg::ConfigurePending "true";',
+                          'DPkg::TriggersPending "true";')
+
+# Files dpkg does not unpack during provisioning: documentation, man pages and non-English locales
+IMCV2_WSL_DPKG_EXCLUDES_FILE = "/etc/dpkg/dpkg.cfg.d/imcv2-excludes"
+IMCV2_WSL_DPKG_EXCLUDES = ("path-exclude /usr/share/doc/*", "path-include /usr/share/doc/*/copyright",
+                           "path-exclude /usr/share/man/*", "path-exclude /usr/share/info/*",
+                           "path-exclude /usr/share/locale/*", "path-include /usr/share/locale/en*",
+                           "path-include /usr/share/locale/locale.alias")
+
+# Ubuntu archive mirrors benchmarked for the instance, the country mirrors of the main Intel sites
+IMCV2_WSL_UBUNTU_MIRRORS = ("http://archive.ubuntu.com/ubuntu", "http://il.archive.ubuntu.com/ubuntu",
+                            "http://us.archive.ubuntu.com/ubuntu", "http://de.archive.ubuntu.com/ubuntu",
+                            "http://in.archive.ubuntu.com/ubuntu", "http://my.archive.ubuntu.com/ubuntu",
+                            "http://mirrors.edge.kernel.org/ubuntu")
+
+# APT downloads through the proxy: several connections per host, pipelined requests and retries
+IMCV2_WSL_APT_ACQUIRE_CONFIG_FILE = "/etc/apt/apt.conf.d/90imcv2-acquire"
+IMCV2_WSL_APT_ACQUIRE_CONFIG = ('Acquire::Queue-Mode "host";', 'Acquire::QueueHost::Limit "8";',
+                                'Acquire::http::Pipeline-Depth "10";', 'Acquire::Retries "3";')
+
+# APT index downloads: no translations and index diffs when refreshing
+IMCV2_WSL_APT_LISTS_CONFIG_FILE = "/etc/apt/apt.conf.d/90imcv2-lists"
+IMCV2_WSL_APT_LISTS_CONFIG = ('Acquire::Languages "none";', 'Acquire::PDiffs "true";',
+                              'Acquire::PDiffs::Merge "true";')
+
+# Description of the main packages install step, the unsafe I/O one is timed separately against it
+IMCV2_WSL_INSTALL_STEP = "Installing (a lot of) packages"
+IMCV2_WSL_INSTALL_STEP_UNSAFE_IO = "Installing (a lot of) packages (unsafe I/O)"
+
+# Windows time zone key names and their IANA equivalents (CLDR 'windowsZones', default territory)
+IMCV2_WSL_WINDOWS_TIME_ZONES = {
+    "Dateline Standard Time": "Etc/GMT+12",
+    "UTC-11": "Etc/GMT+11",
+    "Hawaiian Standard Time": "Pacific/Honolulu",
+    "Alaskan Standard Time": "America/Anchorage",
+    "Pacific Standard Time (Mexico)": "America/Tijuana",
+    "UTC-09": "Etc/GMT+9",
+    "UTC-08": "Etc/GMT+8",
+    "Pacific Standard Time": "America/Los_Angeles",
+    "US Mountain Standard Time": "America/Phoenix",
+    "Mountain Standard Time (Mexico)": "America/Mazatlan",
+    "Mountain Standard Time": "America/Denver",
+    "Central America Standard Time": "America/Guatemala",
+    "Central Standard Time": "America/Chicago",
+    "Central Standard Time (Mexico)": "America/Mexico_City",
+    "Canada Central Standard Time": "America/Regina",
+    "SA Pacific Standard Time": "America/Bogota",
+    "Eastern Standard Time (Mexico)": "America/Cancun",
+    "Eastern Standard Time": "America/New_York",
+    "Haiti Standard Time": "America/Port-au-Prince",
+    "Cuba Standard Time": "America/Havana",
+    "US Eastern Standard Time": "America/Indiana/Indianapolis",
+    "Paraguay Standard Time": "America/Asuncion",
+    "Atlantic Standard Time": "America/Halifax",
+    "Venezuela Standard Time": "America/Caracas",
+    "SA Western Standard Time": "America/La_Paz",
+    "Pacific SA Standard Time": "America/Santiago",
+    "Newfoundland Standard Time": "America/St_Johns",
+    "E. South America Standard Time": "America/Sao_Paulo",
+    "Argentina Standard Time": "America/Argentina/Buenos_Aires",
+    "SA Eastern Standard Time": "America/Cayenne",
+    "Greenland Standard Time": "America/Nuuk",
+    "Montevideo Standard Time": "America/Montevideo",
+    "UTC-02": "Etc/GMT+2",
+    "Azores Standard Time": "Atlantic/Azores",
+    "Cape Verde Standard Time": "Atlantic/Cape_Verde",
+    "UTC": "Etc/UTC",
+    "GMT Standard Time": "Europe/London",
+    "Greenwich Standard Time": "Atlantic/Reykjavik",
+    "Morocco Standard Time": "Africa/Casablanca",
+    "Sao Tome Standard Time": "Africa/Sao_Tome",
+    "W. Europe Standard Time": "Europe/Berlin",
+    "Central Europe Standard Time": "Europe/Budapest",
+    "Romance Standard Time": "Europe/Paris",
+    "Central European Standard Time": "Europe/Warsaw",
+    "W. Central Africa Standard Time": "Africa/Lagos",
+    "Jordan Standard Time": "Asia/Amman",
+    "GTB Standard Time": "Europe/Bucharest",
+    "Middle East Standard Time": "Asia/Beirut",
+    "Egypt Standard Time": "Africa/Cairo",
+    "E. Europe Standard Time": "Europe/Chisinau",
+    "Syria Standard Time": "Asia/Damascus",
+    "South Africa Standard Time": "Africa/Johannesburg",
+    "FLE Standard Time": "Europe/Kyiv",
+    "Israel Standard Time": "Asia/Jerusalem",
+    "Kaliningrad Standard Time": "Europe/Kaliningrad",
+    "Sudan Standard Time": "Africa/Khartoum",
+    "Libya Standard Time": "Africa/Tripoli",
+    "Namibia Standard Time": "Africa/Windhoek",
+    "Arabic Standard Time": "Asia/Baghdad",
+    "Turkey Standard Time": "Europe/Istanbul",
+    "Arab Standard Time": "Asia/Riyadh",
+    "Belarus Standard Time": "Europe/Minsk",
+    "Russian Standard Time": "Europe/Moscow",
+    "E. Africa Standard Time": "Africa/Nairobi",
+    "Iran Standard Time": "Asia/Tehran",
+    "Arabian Standard Time": "Asia/Dubai",
+    "Azerbaijan Standard Time": "Asia/Baku",
+    "Russia Time Zone 3": "Europe/Samara",
+    "Mauritius Standard Time": "Indian/Mauritius",
+    "Georgian Standard Time": "Asia/Tbilisi",
+    "Caucasus Standard Time": "Asia/Yerevan",
+    "Afghanistan Standard Time": "Asia/Kabul",
+    "West Asia Standard Time": "Asia/Tashkent",
+    "Ekaterinburg Standard Time": "Asia/Yekaterinburg",
+    "Pakistan Standard Time": "Asia/Karachi",
+    "India Standard Time": "Asia/Kolkata",
+    "Sri Lanka Standard Time": "Asia/Colombo",
+    "Nepal Standard Time": "Asia/Kathmandu",
+    "Central Asia Standard Time": "Asia/Almaty",
+    "Bangladesh Standard Time": "Asia/Dhaka",
+    "Omsk Standard Time": "Asia/Omsk",
+    "Myanmar Standard Time": "Asia/Yangon",
+    "SE Asia Standard Time": "Asia/Bangkok",
+    "N. Central Asia Standard Time": "Asia/Novosibirsk",
+    "North Asia Standard Time": "Asia/Krasnoyarsk",
+    "China Standard Time": "Asia/Shanghai",
+    "North Asia East Standard Time": "Asia/Irkutsk",
+    "Singapore Standard Time": "Asia/Singapore",
+    "W. Australia Standard Time": "Australia/Perth",
+    "Taipei Standard Time": "Asia/Taipei",
+    "Ulaanbaatar Standard Time": "Asia/Ulaanbaatar",
+    "Tokyo Standard Time": "Asia/Tokyo",
+    "Korea Standard Time": "Asia/Seoul",
+    "Yakutsk Standard Time": "Asia/Yakutsk",
+    "Cen. Australia Standard Time": "Australia/Adelaide",
+    "AUS Central Standard Time": "Australia/Darwin",
+    "E. Australia Standard Time": "Australia/Brisbane",
+    "AUS Eastern Standard Time": "Australia/Sydney",
+    "West Pacific Standard Time": "Pacific/Port_Moresby",
+    "Tasmania Standard Time": "Australia/Hobart",
+    "Vladivostok Standard Time": "Asia/Vladivostok",
+    "Magadan Standard Time": "Asia/Magadan",
+    "Central Pacific Standard Time": "Pacific/Guadalcanal",
+    "Russia Time Zone 11": "Asia/Kamchatka",
+    "New Zealand Standard Time": "Pacific/Auckland",
+    "UTC+12": "Etc/GMT-12",
+    "Fiji Standard Time": "Pacific/Fiji",
+    "UTC+13": "Etc/GMT-13",
+    "Tonga Standard Time": "Pacific/Tongatapu",
+    "Samoa Standard Time": "Pacific/Apia",
+    "Line Islands Standard Time": "Pacific/Kiritimati",
+}
+
+# List of remote downloadable resources.
+# 'sha256' pins the expected content, it must be updated along with the resource itself
+# (run with '--check_pins' from a checkout to verify them against the 'resources' directory).
+# Resources that are not versioned in this repository are not pinned (None).
 remote_resources = [
     {
         "name": "Packages list",
         "file_name": "imcv2_apt_packages.txt",
+        "sha256": "88466bc44562a3db231824cc23c58cd825895b686f187dbc18d4267900eb3f40",
     },
     {
         "name": "Git configuration template",
         "file_name": "imcv2_git_config.template",
+        "sha256": "9525d10884468e63ba731c9ac8b31a89da56a934b978ce70493c3088eced7905",
     },
     {
         "name": "SDK Icon",
         "file_name": "imcv2_sdk.ico",
+        "sha256": "f3a95d9308f8eb5b36731f2564189cd530c30ac21c5c2e6dbd7e15630b6c6ad3",
     },
     {
         "name": "SDK Runner script",
         "file_name": "imcv2_sdk_runner.sh",
+        "sha256": "f01ae445514d488cccff0dcffc7c878eb3140c7b9cebf8153b8af6919ac2dcae",
     },
     {
         "name": "Kerberos configuration",
         "file_name": ".krb5.conf",
+        "sha256": "b50be7d72df8d0d0ab343321917249b4b3f0057a78aba915f008da47f7bd39fe",
+    }
+]
+
+# List of third-party resources fetched from their upstream location.
+# These track upstream branches and therefore can't be pinned.
+external_resources = [
+    {
+        "name": "Git completion script",
+        "file_name": "git-completion.bash",
+        "url": "https://raw.githubusercontent.com/git/git/master/contrib/completion/git-completion.bash",
+        "sha256": None,
+    },
+    {
+        "name": "Git prompt script",
+        "file_name": "git-prompt.sh",
+        "url": "https://raw.githubusercontent.com/git/git/master/contrib/completion/git-prompt.sh",
+        "sha256": None,
     },
     {
-        "name": "DT tool",
-        "file_name": "dt",
+        "name": "Pyenv installer",
+        "file_name": "pyenv-installer",
+        "url": "https://raw.githubusercontent.com/pyenv/pyenv-installer/master/bin/pyenv-installer",
+        "sha256": None,
     }
 ]
 
-# Spinning characters for progress indication
-spinner_active = False
-spinner_disabled = False
+# Shared asynchronous engine (see wsl_runner_get_async_engine())
+async_engine = None
+async_engine_lock = threading.Lock()
+
+# Timed connection classes by scheme (see wsl_runner_get_connection_class())
+connection_classes = None
 
-# Intel Proxy availability
-intel_proxy_detected = True
+# Startup milestones, in seconds since startup
+startup_timings = {}
+
+# Serializes updates of the resources index when resources are downloaded concurrently
+resources_index_lock = threading.Lock()
 
 
 class StepError(Exception):
@@ -137,6 +419,549 @@ class InfoType(int, Enum):
     DONE = 10002
 
 
+class HostFacts:
+    """
+    Snapshot of the Windows host properties used throughout a run, collected once per run (see ProvisionContext).
+
+    Attributes:
+        desktop_path (str | None): The current user's desktop directory.
+        process_chain (list): Names of the ancestor processes, nearest parent first.
+        wsl_version_status (int): Exit status of 'wsl --version'.
+        wsl_version_lines (list): Output lines of 'wsl --version'.
+        ram_gb (float): Installed physical RAM in GB.
+        cpu_cores (int): Number of logical CPU cores.
+        cpu_type (str): Processor description.
+        corp_name (str | None): Full name taken from the Office identity.
+        corp_email (str | None): Corporate email taken from the Office identity.
+        network_route (str | None): Route picked by the network probe, "proxy", "direct" or None.
+        proxy_available (bool | None): True when the proxy route won the probe, None when it was not probed.
+        time_zone (str | None): The Windows time zone key name (e.g. "Israel Standard Time").
+
+    Usage:
+        Obtain the cached instance using wsl_runner_get_host_facts().
+    """
+
+    def __init__(self, **facts):
+        self.desktop_path = facts.get("desktop_path")
+        self.process_chain = list(facts.get("process_chain") or [])
+        self.wsl_version_status = facts.get("wsl_version_status", 1)
+        self.wsl_version_lines = list(facts.get("wsl_version_lines") or [])
+        self.ram_gb = facts.get("ram_gb", 0)
+        self.cpu_cores = facts.get("cpu_cores", 1)
+        self.cpu_type = facts.get("cpu_type", "")
+        self.corp_name = facts.get("corp_name")
+        self.corp_email = facts.get("corp_email")
+        self.network_route = facts.get("network_route")
+        self.proxy_available = facts.get("proxy_available")
+        self.time_zone = facts.get("time_zone")
+
+
+class StepPolicy:
+    """
+    Describes how a step is executed: its time limits, and whether and how it is retried.
+
+    Attributes:
+        timeout (float): Wall-clock limit in seconds, before scaling by machine class and history. 0 for none.
+        stall (float): Seconds without any output after which the step is considered hung. 0 to disable.
+        retries (int): Additional attempts after a failure, used only when the step is retry-safe.
+        backoff (float): Seconds to wait before the first retry, doubled before each following one.
+        retry_safe (bool): The step is idempotent and can be safely re-run after a failure or a timeout.
+        nominal (float): Typical duration in seconds on a fast machine, used by '--plan' for steps
+                         without recorded timings.
+
+    Usage:
+        Pass as the fifth element of a step tuple given to wsl_runner_run_steps().
+    """
+
+    def __init__(self, timeout: float = 120, stall: float = 60, retries: int = 0, backoff: float = 5,
+                 retry_safe: bool = False, nominal: float = 2):
+        self.timeout = timeout
+        self.stall = stall
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_safe = retry_safe
+        self.nominal = nominal
+
+
+# Short configuration commands
+IMCV2_WSL_STEP_POLICY_DEFAULT = StepPolicy()
+
+# Commands depending on the network only (index updates, downloads)
+IMCV2_WSL_STEP_POLICY_NETWORK = StepPolicy(timeout=600, stall=120, retries=2, backoff=5, retry_safe=True,
+                                           nominal=30)
+
+# Package installations, APT resumes cleanly after an interruption
+IMCV2_WSL_STEP_POLICY_INSTALL = StepPolicy(timeout=3600, stall=300, retries=1, backoff=10, retry_safe=True,
+                                           nominal=600)
+
+# Silent long-running builds, only the wall-clock limit applies
+IMCV2_WSL_STEP_POLICY_BUILD = StepPolicy(timeout=3600, stall=0, nominal=900)
+
+
+class TimedConnectionMixin:
+    """
+    Records how long each phase of establishing a connection took, in seconds.
+
+    Attributes:
+        timings (dict): 'dns', 'connect', 'tunnel' (proxy CONNECT exchange) and 'tls'.
+    """
+    timings = None
+
+    def _timed_create_connection(self, address, timeout=None, source_address=None):
+        host, port = address
+
+        start = time.monotonic()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        self.timings["dns"] = time.monotonic() - start
+
+        start = time.monotonic()
+        error = OSError(f"No address found for '{host}'")
+        for family, socket_type, proto, canonical_name, socket_address in addresses:
+            sock = socket.socket(family, socket_type, proto)
+            try:
+                sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(socket_address)
+            except OSError as e:
+                sock.close()
+                error = e
+                continue
+            self.timings["connect"] = time.monotonic() - start
+            return sock
+
+        raise error
+
+    def connect(self):
+        self.timings = {"dns": 0.0, "connect": 0.0, "tunnel": 0.0, "tls": 0.0}
+        self._create_connection = self._timed_create_connection
+
+        start = time.monotonic()
+        super().connect()
+        if isinstance(self, http.client.HTTPSConnection):
+            self.timings["tls"] = max(0.0, time.monotonic() - start - self.timings["dns"] -
+                                      self.timings["connect"] - self.timings["tunnel"])
+
+    def _tunnel(self):
+        start = time.monotonic()
+        super()._tunnel()
+        self.timings["tunnel"] = time.monotonic() - start
+
+
+def wsl_runner_get_connection_class(scheme: str) -> type:
+    """
+    Returns the timed connection class for a URL scheme.
+    The classes derive from http.client, they are created on first use so that http.client and ssl are only
+    imported when something is fetched.
+
+    Args:
+        scheme (str): 'http' or 'https'.
+
+    Returns:
+        type: The connection class.
+    """
+    global connection_classes
+
+    if connection_classes is None:
+        connection_classes = {
+            "http": type("PooledHTTPConnection", (TimedConnectionMixin, http.client.HTTPConnection), {}),
+            "https": type("PooledHTTPSConnection", (TimedConnectionMixin, http.client.HTTPSConnection), {}),
+        }
+    return connection_classes[scheme]
+
+
+class HttpResponse:
+    """
+    Readable response of HttpClient.open(). Closing it returns the connection to the pool
+    when the body was fully read and the server keeps the connection alive.
+
+    Attributes:
+        status (int): The HTTP status code.
+        headers: The response headers.
+        url (str): The final URL, after redirects.
+        timings (dict): 'dns', 'connect', 'tunnel', 'tls', 'ttfb' and 'total' in seconds,
+                        'reused' (bool) and 'bytes' (int).
+    """
+
+    def __init__(self, client, origin, connection, response, url, timings):
+        self.client = client
+        self.origin = origin
+        self.connection = connection
+        self.response = response
+        self.status = response.status
+        self.headers = response.headers
+        self.url = url
+        self.timings = timings
+        self.start = time.monotonic() - timings["ttfb"]
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.response.read(None if size is None or size < 0 else size)
+        self.timings["bytes"] += len(data)
+        return data
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        reusable = self.response.isclosed() and not self.response.will_close
+        if not reusable:
+            self.response.close()
+        self.client.release(self.origin, self.connection, reusable)
+        self.connection = None
+
+        self.timings["total"] = time.monotonic() - self.start
+        self.client.record(self.url, self.timings)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HttpClient:
+    """
+    Minimal HTTP/1.1 client shared by all host-side fetches.
+    Keeps a pool of keep-alive connections per origin so that repeated fetches from the same host skip the TCP,
+    proxy CONNECT and TLS handshakes, and several fetches can run concurrently (one connection each).
+
+    Attributes:
+        proxy_server (str | None): The proxy all requests go through, None for direct connections.
+        max_idle (int): Idle connections kept per origin.
+        history (list): (url, timings) of every completed request, see HttpResponse.timings.
+
+    Usage:
+        Obtain the shared instance using wsl_runner_get_http_client().
+    """
+
+    redirect_codes = (301, 302, 303, 307, 308)
+
+    def __init__(self, proxy_server: Optional[str] = None, max_idle: int = 4):
+        self.proxy_server = proxy_server
+        self.max_idle = max_idle
+        self.history = []
+        self.pools = {}
+        self.lock = threading.Lock()
+        self.ssl_context = ssl.create_default_context()
+
+        self.proxy = None
+        if proxy_server:
+            self.proxy = urlparse(proxy_server if "://" in proxy_server else f"http://{proxy_server}")
+
+    def new_connection(self, scheme: str, host: str, port: int, timeout: float):
+        connection_class = wsl_runner_get_connection_class(scheme)
+        if self.proxy is None:
+            if scheme == "https":
+                return connection_class(host, port, timeout=timeout, context=self.ssl_context)
+            return connection_class(host, port, timeout=timeout)
+
+        proxy_port = self.proxy.port or 80
+        if scheme == "https":
+            connection = connection_class(self.proxy.hostname, proxy_port, timeout=timeout, context=self.ssl_context)
+            connection.set_tunnel(host, port)
+            return connection
+
+        # Plain HTTP is sent to the proxy with an absolute URL
+        return connection_class(self.proxy.hostname, proxy_port, timeout=timeout)
+
+    def acquire(self, origin: tuple, timeout: float, pooled: bool = True):
+        with self.lock:
+            idle = self.pools.get(origin) if pooled else None
+            if idle:
+                connection = idle.pop()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+
+        return self.new_connection(*origin, timeout), False
+
+    def release(self, origin: tuple, connection, reusable: bool):
+        with self.lock:
+            idle = self.pools.setdefault(origin, [])
+            if reusable and len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def record(self, url: str, timings: dict):
+        with self.lock:
+            self.history.append((url, timings))
+
+    def open(self, url: str, headers: Optional[dict] = None, timeout: float = 30, redirects: int = 5) -> HttpResponse:
+        """
+        Sends a GET request and returns its response once the headers were received.
+
+        Args:
+            url (str): The URL to fetch.
+            headers (dict, optional): Extra request headers.
+            timeout (float, optional): Socket timeout in seconds.
+            redirects (int, optional): Number of redirects to follow.
+
+        Returns:
+            HttpResponse: The response, to be closed by the caller.
+
+        Raises:
+            urllib.error.HTTPError: If the server answered with a non-success status (including 304).
+            OSError: On connection errors.
+        """
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL '{url}'")
+
+        origin = (parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+        target = parsed.path or "/"
+        target = f"{target}?{parsed.query}" if parsed.query else target
+        if self.proxy is not None and parsed.scheme == "http":
+            target = url
+
+        request_headers = {"Host": parsed.netloc, "User-Agent": f"{IMCV2_SCRIPT_NAME}/{IMCV2_SCRIPT_VERSION}",
+                           "Accept-Encoding": "identity"}
+        request_headers.update(headers if headers else {})
+
+        # A pooled connection may have been closed by the server while idle, retry once on a new one
+        for attempt in range(2):
+            connection, reused = self.acquire(origin, timeout, pooled=attempt == 0)
+            start = time.monotonic()
+            try:
+                connection.request("GET", target, headers=request_headers)
+                response = connection.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest):
+                connection.close()
+                if not reused:
+                    raise
+            except Exception:
+                connection.close()
+                raise
+
+        timings = dict(connection.timings) if not reused else {"dns": 0.0, "connect": 0.0, "tunnel": 0.0,
+                                                                 "tls": 0.0}
+        timings.update({"ttfb": time.monotonic() - start - sum(timings.values()), "total": 0.0,
+                        "reused": reused, "bytes": 0})
+        result = HttpResponse(self, origin, connection, response, url, timings)
+
+        if response.status in self.redirect_codes and response.getheader("Location") and redirects > 0:
+            location = urljoin(url, response.getheader("Location"))
+            response.read()
+            result.close()
+            return self.open(location, headers, timeout, redirects - 1)
+
+        if response.status >= 300:
+            response.read()
+            result.close()
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+
+        return result
+
+    def close(self):
+        """
+        Closes all idle connections.
+        """
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for idle in pools.values():
+            for connection in idle:
+                connection.close()
+
+
+class AsyncEngine:
+    """
+    Runs external processes and Python callables as asyncio tasks on a dedicated event loop thread, so that
+    downloads, host probes and guest commands can overlap while callers keep a synchronous view.
+    Each task may belong to a resource class ("guest", "network" or "disk") whose concurrency is bounded
+    by a semaphore, and has its own time limits. A task raising an exception cancels the tasks started along
+    with it, external processes are killed when their task is cancelled.
+
+    Usage:
+        Obtain the shared instance using wsl_runner_get_async_engine(). Synchronous code calls run() or
+        run_all() with the coroutines of exec_process() and run_function().
+    """
+
+    def __init__(self, limits: Optional[dict] = None):
+        self.limits = dict(limits if limits else IMCV2_WSL_ASYNC_LIMITS)
+        self.semaphores = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="imcv2-async", daemon=True)
+        self.thread.start()
+
+    def semaphore(self, resource: Optional[str]):
+        # Created on the loop thread when first used, unknown classes are not limited
+        if resource not in self.semaphores:
+            self.semaphores[resource] = asyncio.Semaphore(self.limits.get(resource, 1 << 16))
+        return self.semaphores[resource]
+
+    def run(self, coroutine, timeout: Optional[float] = None):
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("The asynchronous engine can't wait for itself")
+
+        future = asyncio.run_coroutine_threadsafe(self.with_context(coroutine, wsl_runner_get_context()), self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()  # Interrupted (e.g. Ctrl+C) or timed out, stop the task as well
+            raise
+
+    def run_all(self, coroutines: list, timeout: Optional[float] = None) -> list:
+        return self.run(self.gather(coroutines), timeout)
+
+    @staticmethod
+    async def with_context(coroutine, context: "ProvisionContext"):
+        # Tasks run in their own copy of the context variables, the tasks they start inherit it
+        current_context.set(context)
+        return await coroutine
+
+    async def gather(self, coroutines: list) -> list:
+        tasks = [self.loop.create_task(coroutine) for coroutine in coroutines]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+
+    async def run_function(self, function, args=(), timeout: float = 0, resource: Optional[str] = None):
+        # The function runs on a worker thread, a timed out function is abandoned rather than stopped
+        async with self.semaphore(resource):
+            result = self.loop.run_in_executor(None, wsl_runner_get_context().bind(function, *args))
+            return await (asyncio.wait_for(result, timeout) if timeout else result)
+
+    async def exec_process(self, process: str, args: list, hidden: bool = True, timeout: float = 30,
+                           stall: float = 0, resource: Optional[str] = None) -> tuple:
+        log_lines = []
+        ext_status = 0
+
+        def append_lines(line: str):
+            decoded_lines = wsl_runner_console_decoder(line)
+            log_lines.extend(decoded_lines)
+            if decoded_lines and not hidden:
+                wsl_runner_print_log(decoded_lines)
+
+        async with self.semaphore(resource):
+            try:
+                proc = await asyncio.create_subprocess_exec(process, *args, stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE)
+            except (OSError, ValueError):
+                return 1, 0, []
+
+            start = last_output = time.monotonic()
+
+            # Output is split on any line ending, raw bytes are passed on as Latin-1 (see wsl_runner_console_decoder())
+            async def read_stream(stream):
+                nonlocal last_output
+                pending_line = ""
+                with suppress(OSError, ValueError):
+                    while True:
+                        chunk = await stream.read(64 * 1024)
+                        if not chunk:
+                            break
+                        last_output = time.monotonic()
+                        *lines, pending_line = re.split(r"\r\n|\r|\n", pending_line + chunk.decode("latin-1"))
+                        for line in lines:
+                            append_lines(line)
+                append_lines(pending_line)
+
+            readers = asyncio.gather(read_stream(proc.stdout), read_stream(proc.stderr))
+            try:
+                while not readers.done():
+                    now = time.monotonic()
+                    limits = ([start + timeout - now] if timeout else []) + ([last_output + stall - now] if stall
+                                                                             else [])
+                    if limits and min(limits) <= 0:
+                        return 124, ext_status, log_lines  # Timeout-specific exit code
+                    await asyncio.wait([readers], timeout=min(limits) if limits else None)
+
+                # Wait for process completion
+                try:
+                    remaining = max(0.1, start + timeout - time.monotonic()) if timeout else None
+                    return await asyncio.wait_for(proc.wait(), remaining), ext_status, log_lines
+                except asyncio.TimeoutError:
+                    return 124, ext_status, log_lines
+
+            finally:
+                # Timed out, stalled or cancelled, a killed process may leave a child holding the pipes open
+                if proc.returncode is None:
+                    with suppress(OSError):
+                        proc.kill()
+                readers.cancel()
+                readers.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+
+class ProvisionContext:
+    """
+    State of one provisioning run: its configuration, the network route, where its progress is reported
+    and its caches. Functions read it through wsl_runner_get_context(), so that several instances can be
+    provisioned at the same time from one process, each from its own thread under its own context.
+
+    Attributes:
+        plan (dict): Execution plan built by '--plan' instead of running the steps (see wsl_runner_plan_step()).
+        local_resources_path (str): Local copy of the resources directory, e.g. kept by the launcher.
+        intel_proxy_detected (bool): The Intel proxy is reachable, downloads go through it.
+        output: Text stream receiving the status lines, the spinner and the commands output.
+        spinner_active (bool): The progress spinner is running.
+        spinner_disabled (bool): No spinner, each status is printed on its own line (debug sessions).
+        http_client (HttpClient): HTTP client of this run (see wsl_runner_get_http_client()).
+        active_bundle (dict): Offline bundle in use (see wsl_runner_open_bundle()).
+        journal (dict): Journal of the completed sub-steps of the instance (see wsl_runner_open_journal()).
+        step_timings (dict): Recent durations of successful steps (see wsl_runner_load_step_timings()).
+        step_timings_file (str): File the step durations are saved to.
+        run_metrics (dict): Recent values of measurements taken once per run, e.g. the startup time.
+        run_metrics_file (str): File the run measurements are saved to.
+        host_facts (HostFacts): Host facts and network route of this run (see wsl_runner_get_host_facts()).
+
+    Usage:
+        The command line uses the default context. Library callers create one context per instance and run
+        the step functions under it, e.g. from a thread of their own:
+
+            context = ProvisionContext(output=log_file)
+            context.run(run_user_creation_steps, instance_name, username, password)
+    """
+
+    def __init__(self, plan: Optional[dict] = None, local_resources_path: Optional[str] = None,
+                 intel_proxy_detected: bool = True, output=None, spinner_disabled: bool = False):
+        self.plan = plan
+        self.local_resources_path = local_resources_path
+        self.intel_proxy_detected = intel_proxy_detected
+        self.output = output if output else sys.stdout
+        self.spinner_active = False
+        self.spinner_disabled = spinner_disabled
+        self.http_client = None
+        self.active_bundle = None
+        self.journal = None
+        self.step_timings = {}
+        self.step_timings_file = None
+        self.run_metrics = {}
+        self.run_metrics_file = None
+        self.host_facts = None
+
+    def run(self, function, *args, **kwargs):
+        token = current_context.set(self)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            current_context.reset(token)
+
+    def bind(self, function, *args):
+        # For functions run on other threads, which don't inherit the context of the caller
+        return lambda *more_args, **kwargs: self.run(function, *args, *more_args, **kwargs)
+
+
+# Provisioning context of the current thread or task (see wsl_runner_get_context())
+current_context = contextvars.ContextVar("imcv2_context")
+
+# Context of the command line and of callers not running under one of their own
+default_context = ProvisionContext()
+
+
 class TextType(Enum):
     """
     Enum to specify the type of text display for status messages.
@@ -168,46 +993,111 @@ def wsl_runner_print_log(list_of_lines: Optional[list]) -> Optional[str]:
     if not list_of_lines:
         return None
 
+    output = wsl_runner_get_context().output
     for index, line in enumerate(list_of_lines, start=1):
-        print(f"{line}")
+        print(f"{line}", file=output)
+
+
+def wsl_runner_get_wsl_resources(ram_gb: float, cpu_cores: int) -> dict:
+    """
+    Derives the WSL virtual machine sizing from the host hardware.
+    The VM gets most of the RAM while Windows keeps at least 4GB (half the RAM on small machines),
+    and all logical cores except one on machines with 8 or more.
+
+    Args:
+        ram_gb (float): Installed physical RAM in GB.
+        cpu_cores (int): Number of logical CPU cores.
+
+    Returns:
+        dict: 'memory' and 'swap' in GB, 'processors' count.
+    """
+    ram_gb = ram_gb if ram_gb and ram_gb > 0 else 8
+    cpu_cores = cpu_cores if cpu_cores and cpu_cores > 0 else 1
+
+    if ram_gb < 8:
+        memory = max(2, int(ram_gb * 0.5))
+    else:
+        memory = max(2, int(min(ram_gb * 0.75, ram_gb - 4)))
+
+    return {
+        "memory": memory,
+        "processors": cpu_cores - 1 if cpu_cores >= 8 else cpu_cores,
+        "swap": max(2, min(8, memory // 2)),
+    }
 
 
 def wsl_runner_create_config(force_create: bool = False):
     """
-    Creates or overwrites a `.wslconfig` file in the user's home directory using configparser.
+    Creates or updates the `.wslconfig` file in the user's home directory using configparser.
+    Settings derived from the host hardware (see wsl_runner_get_wsl_resources()) are merged into an existing file,
+    any other section or setting already in it is preserved.
+    While planning, the file is left untouched and the pending changes are added to the plan.
     Returns 1 on error and 0 on success.
 
     Args:
-        force_create (bool): If True, overwrite the file if it exists. Default is False.
+        force_create (bool): If True, overwrite settings already present in the file with the derived ones.
+                             Default is False, settings already present are kept.
 
     Returns:
         int: 0 on success, 1 on error.
     """
+    context = wsl_runner_get_context()
+
     # Define the home directory and file path
     home_dir = os.path.expanduser("~")
     wslconfig_path = os.path.join(home_dir, ".wslconfig")
 
-    with suppress(FileExistsError, IOError):
-        # Check if the file exists and handle according to `force_create`
-        if os.path.exists(wslconfig_path) and not force_create:
-            raise FileExistsError()
-
-        # Initialize the configuration object
-        config = configparser.ConfigParser()
-
-        # Add the [wsl2] section (empty in this case)
-        config.add_section("wsl2")
+    facts = wsl_runner_get_host_facts()
+    resources = wsl_runner_get_wsl_resources(facts.ram_gb, facts.cpu_cores)
+
+    settings = {
+        "wsl2": {
+            "memory": f"{resources['memory']}GB",
+            "processors": str(resources["processors"]),
+            "swap": f"{resources['swap']}GB",
+        },
+        "experimental": {
+            "networkingMode": "mirrored",
+            "dnsTunneling": "true",
+            "firewall": "true",
+            "autoProxy": "true",
+            "sparseVhd": "true",
+            "autoMemoryReclaim": "gradual",
+        },
+    }
 
-        # Add the [experimental] section with the required settings
-        config.add_section("experimental")
-        config.set("experimental", "networkingMode", "mirrored")
-        config.set("experimental", "dnsTunneling", "true")
-        config.set("experimental", "firewall", "true")
-        config.set("experimental", "autoProxy", "true")
+    with suppress(configparser.Error, IOError):
+        # Keys are case-sensitive for WSL, and duplicated entries written by hand are tolerated
+        config = configparser.ConfigParser(strict=False, interpolation=None)
+        config.optionxform = str
+        config.read(wslconfig_path, encoding="utf-8")
+
+        changed = []
+        for section, values in settings.items():
+            if not config.has_section(section):
+                config.add_section(section)
+            for key, value in values.items():
+                if force_create or not config.has_option(section, key):
+                    if config.get(section, key, fallback=None) != value:
+                        changed.append(f"{section}.{key}={value}")
+                    config.set(section, key, value)
+
+        if context.plan is not None:
+            if changed:
+                context.plan["host_changes"].append(f"'{wslconfig_path}': {', '.join(changed)}")
+            return 0
 
         # Write the configuration to the file
-        with open(wslconfig_path, "w") as file:
-            config.write(file)
+        if changed:
+            with open(wslconfig_path, "w") as file:
+                config.write(file)
+
+            # A running WSL virtual machine keeps its current sizing until it is restarted
+            status, ext_status, running = wsl_runner_exec_process("wsl", ["--list", "--running", "--quiet"],
+                                                                  True, 0)
+            if status == 0 and any(line.strip() for line in running):
+                wsl_runner_print_status(TextType.BOTH, "WSL settings apply after 'wsl --shutdown'", True,
+                                        InfoType.WARNING)
 
         return 0  # Success
     return 1  # Error occurred
@@ -232,8 +1122,8 @@ def wsl_runner_ask_yes_no(message: str, title: str = "Confirm"):
 
     # Load the user32.dll library
     user32 = ctypes.windll.user32
-    user32.MessageBoxW.restype = wintypes.INT
-    user32.MessageBoxW.argtypes = [wintypes.HWND, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.UINT]
+    user32.MessageBoxW.restype = ctypes.wintypes.INT
+    user32.MessageBoxW.argtypes = [ctypes.wintypes.HWND, ctypes.wintypes.LPCWSTR, ctypes.wintypes.LPCWSTR, ctypes.wintypes.UINT]
 
     # Display the message box
     result = user32.MessageBoxW(None, message, title, MB_YESNO | MB_ICONQUESTION)
@@ -274,14 +1164,26 @@ def wsl_runner_classify_machine():
         4: "Intergalactic Quantum Mega Brain 🚀🧠✨"
     }
 
+    return score_to_classification[wsl_runner_get_machine_score()]
+
+
+def wsl_runner_get_machine_score() -> int:
+    """
+    Scores the host machine from 0 (slowest) to 4 (fastest) based on its RAM, cores and processor type.
+
+    Returns:
+        int: The machine score.
+    """
+    facts = wsl_runner_get_host_facts()
+
     # Get physical hardware RAM
-    ram_gb = wsl_runner_get_physical_ram()
+    ram_gb = facts.ram_gb
 
     # Get number of CPU cores
-    core_count = wsl_runner_get_cpu_cores()
+    core_count = facts.cpu_cores
 
     # Get CPU type
-    cpu_type = platform.processor().lower()
+    cpu_type = facts.cpu_type.lower()
 
     # Determine RAM score (0 to 4)
     if ram_gb < 8:
@@ -329,16 +1231,22 @@ def wsl_runner_classify_machine():
     else:
         final_score = 4
 
-    return score_to_classification[final_score]
+    return final_score
 
 
 def wsl_set_win_term_default() -> int:
     """
     Sets the default terminal application to Windows Terminal silently.
+    While planning, the change is only added to the plan.
 
     Returns:
         int: 0 if successful, 1 otherwise.
     """
+    context = wsl_runner_get_context()
+    if context.plan is not None:
+        context.plan["host_changes"].append("Windows Terminal as the default terminal application")
+        return 0
+
     # Command to set Windows Terminal as the default terminal on Windows 11
     reg_args = [
         "add",
@@ -473,7 +1381,7 @@ def wsl_runner_get_resource_tuple_by_name(resource_name):
     """
     Retrieves the file name and constructed URL for a given resource name.
 
-    Searches through the predefined list of remote resources and, if a match is found for the
+    Searches through the predefined lists of remote and external resources and, if a match is found for the
     specified resource name, returns a tuple containing the file name and the corresponding URL. If the resource
     name is not found, an exception is raised.
 
@@ -490,9 +1398,71 @@ def wsl_runner_get_resource_tuple_by_name(resource_name):
             file_name = resource["file_name"]
             url = f"{IMCV2_WSL_DEFAULT_RESOURCES_URL}/{file_name}"
             return file_name, url
+    for resource in external_resources:
+        if resource["name"] == resource_name:
+            return resource["file_name"], resource["url"]
     raise ValueError(f"Resource '{resource_name}' not found.")
 
 
+def wsl_runner_get_resource_sha256(file_name: str) -> Optional[str]:
+    """
+    Retrieves the pinned SHA-256 digest of a remote resource.
+
+    Args:
+        file_name (str): The resource file name (e.g., "imcv2_apt_packages.txt").
+
+    Returns:
+        str: The expected hex digest, or None if the resource is unknown or not pinned.
+    """
+    for resource in remote_resources + external_resources:
+        if resource["file_name"] == file_name:
+            return resource.get("sha256")
+    return None
+
+
+def wsl_runner_get_image_sha256(image_url: str, proxy_server: Optional[str] = None) -> Optional[str]:
+    """
+    Retrieves the expected SHA-256 digest of an Ubuntu image from the 'SHA256SUMS' file
+    published next to it.
+
+    Args:
+        image_url (str): URL of the Ubuntu image.
+        proxy_server (str, optional): Proxy server to use.
+
+    Returns:
+        str: The expected hex digest, or None if it could not be retrieved.
+    """
+    image_name = os.path.basename(urlparse(image_url).path)
+    sums_url = f"{image_url.rsplit('/', 1)[0]}/SHA256SUMS"
+
+    with suppress(OSError, ValueError, UnicodeDecodeError):
+        with wsl_runner_open_source(sums_url, proxy_server, 10) as stream:
+            for line in stream.read().decode("utf-8").splitlines():
+                fields = line.split()
+                if len(fields) == 2 and fields[1].lstrip("*") == image_name:
+                    return fields[0].lower()
+    return None
+
+
+def wsl_runner_file_sha256(path: str) -> Optional[str]:
+    """
+    Computes the SHA-256 digest of a local file.
+
+    Args:
+        path (str): The file to hash.
+
+    Returns:
+        str: The hex digest, or None if the file could not be read.
+    """
+    digest = hashlib.sha256()
+    with suppress(OSError):
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    return None
+
+
 def wsl_runner_get_free_disk_space(path):
     """
     Gets the free disk space in bytes for the drive where the given path is located.
@@ -516,120 +1486,587 @@ def wsl_runner_get_free_disk_space(path):
         return -1
 
 
-def wsl_runner_map_instance(drive_letter: str, instance_name: str = None, delete: bool = True) -> int:
+def wsl_runner_get_allocated_size(path: str) -> int:
     """
-    Simplifies mapping or deleting a WSL instance as a network drive.
+    Gets the number of bytes a file actually occupies on disk, which for a sparse or compressed file
+    (such as a sparse VHDX) is less than its size.
 
     Args:
-        drive_letter (str): The drive letter to use (e.g., "W").
-        instance_name (str): The name of the WSL instance to map. Required if 'delete' is False.
-        delete (bool): If True, delete the mapped drive. Otherwise, map the instance.
+        path (str): The file path.
 
     Returns:
-        int: 0 on success, 1 on failure.
+        int: Allocated size in bytes, or -1 on error.
     """
-    if delete:
-        # Command to delete the network drive
-        args = ["use", drive_letter + ":", "/del"]
-    else:
-        if not instance_name:
-            return 1  # Mandatory argument missing
+    with suppress(AttributeError, OSError):
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.GetCompressedFileSizeW.restype = ctypes.wintypes.DWORD
+        kernel32.GetCompressedFileSizeW.argtypes = [ctypes.wintypes.LPCWSTR, ctypes.POINTER(ctypes.wintypes.DWORD)]
 
-        # Command to map the WSL instance
-        args = ["use", drive_letter + ":", f"\\\\wsl$\\{instance_name}"]
+        high = ctypes.wintypes.DWORD(0)
+        low = kernel32.GetCompressedFileSizeW(path, ctypes.byref(high))
+        if low != 0xFFFFFFFF or ctypes.get_last_error() == 0:
+            return (high.value << 32) + low
 
-    # Run the command and capture the output
-    result = wsl_runner_exec_process("net", args, True, 0)
-    if result is not None:
-        status, ext_status, log_lines = result  # Unpack the tuple
-        return status
-    else:
-        return 1  # Error while executing command
+    # Not on Windows, use the allocated blocks
+    with suppress(OSError):
+        stat = os.stat(path)
+        return stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+    return -1
 
 
-def wsl_runner_is_cmd_in_windows_terminal() -> int:
+def wsl_runner_get_fixed_drives() -> list:
     """
-    Checks if the script is running in Command Prompt inside Windows Terminal.
+    Lists the local fixed drives of the host.
 
     Returns:
-        int: 0 if running in Command Prompt inside Windows Terminal, 1 otherwise.
+        list: Drive roots (e.g. "D:\\"), empty if they could not be listed.
     """
+    drives = []
+    with suppress(AttributeError, OSError):
+        kernel32 = ctypes.windll.kernel32
+        mask = kernel32.GetLogicalDrives()
+        for index in range(26):
+            root = f"{chr(ord('A') + index)}:\\"
+            if mask & (1 << index) and kernel32.GetDriveTypeW(root) == 3:  # DRIVE_FIXED
+                drives.append(root)
+    return drives
+
+
+def wsl_runner_fetch_package_index(component: str, indexes_path: str, proxy_server: Optional[str] = None,
+                                   mirror: str = IMCV2_WSL_DEFAULT_UBUNTU_MIRROR,
+                                   suite: str = IMCV2_WSL_DEFAULT_UBUNTU_SUITE, arch: str = "amd64") -> Optional[str]:
+    """
+    Keeps a local copy of an Ubuntu 'Packages.gz' index, refreshed using a conditional request.
 
-    current_pid = os.getppid()
-    found_cmd = False
-    found_terminal = False
+    Args:
+        component (str): The archive component (e.g. "main").
+        indexes_path (str): Local directory holding the indexes.
+        proxy_server (str, optional): The proxy server to use.
+        mirror (str, optional): The Ubuntu mirror.
+        suite (str, optional): The Ubuntu suite.
+        arch (str, optional): The architecture.
 
-    while current_pid:
-        # Query the process name using WMIC
-        args = ['process', 'where', f'ProcessId={current_pid}', 'get', 'name']
-        result = wsl_runner_exec_process("wmic", args, True, 0)
-        if result is not None:
-            status, ext_status, clean_lines = result  # Unpack the tuple
-
-            # Get the last relevant line (process name)
-            if len(clean_lines) > 1:
-                process_name = clean_lines[-1]
-                if process_name.lower() == "cmd.exe":
-                    found_cmd = True
-                elif process_name.lower() == "windowsterminal.exe":
-                    found_terminal = True
-                    break  # Stop when WindowsTerminal.exe is found
-                elif process_name.lower() in ["powershell.exe", "pwsh.exe"]:
-                    # If PowerShell is detected, reject
-                    return 1
+    Returns:
+        str: Path of the local index, None if it is not available.
+    """
+    url = f"{mirror}/dists/{suite}/{component}/binary-{arch}/Packages.gz"
+    mirror_key = hashlib.sha1(mirror.encode("utf-8")).hexdigest()[:8]
+    destination = os.path.join(indexes_path, f"{mirror_key}_{suite}_{component}_{arch}_Packages.gz")
 
-            # Get the parent process ID to continue traversing
-            args = ['process', 'where', f'ProcessId={current_pid}', 'get', 'ParentProcessId']
-            result = wsl_runner_exec_process("wmic", args, True, 0)
-            if result is not None:
-                status, ext_status, ppid_clean = result  # Unpack the tuple
-                if len(ppid_clean) > 1:
-                    current_pid = int(ppid_clean[-1])
-                else:
-                    break
+    if wsl_runner_ensure_directory_exists([indexes_path]) != 0:
+        return None
 
-    # Ensure both cmd.exe and WindowsTerminal.exe were found
-    if found_cmd and found_terminal:
-        return 0
+    metadata = dict(wsl_runner_load_resources_index(indexes_path).get(url, {}))
+    if metadata.get("sha256") and wsl_runner_file_sha256(destination) != metadata["sha256"]:
+        metadata = {}
 
-    return 1  # Default to rejection
+    if wsl_runner_fetch_verified(url, destination, proxy_server, None, 30, metadata=metadata) != 0:
+        return destination if os.path.isfile(destination) else None
 
+    with resources_index_lock:
+        index = wsl_runner_load_resources_index(indexes_path)
+        index[url] = metadata
+        wsl_runner_save_resources_index(indexes_path, index)
 
-def wsl_runner_get_office_user_identity():
+    return destination
+
+
+def wsl_runner_load_package_index(index_files: list) -> Optional[tuple]:
     """
-    Extract ADUserDisplayName and ADUserName from the Windows Registry.
-    Tries Office 16.0 and 15.0 first, then falls back to Common UserInfo.
+    Reads the 'Packages' indexes, keeping what is needed to resolve dependencies and sizes.
+    Relations keep the first alternative of each entry, without version constraints and architecture qualifiers.
+
+    Args:
+        index_files (list): Paths of 'Packages.gz' indexes.
 
     Returns:
-        tuple: (Full name, Corporate email) if found, otherwise None.
+        tuple: (available, provides), available mapping package names to (download_bytes, installed_bytes,
+               depends, recommends) and provides mapping virtual package names to a real package.
+               None if the indexes could not be read.
     """
-    registry_paths = [
-        r"Software\Microsoft\Office\16.0\Common\Identity",
-        r"Software\Microsoft\Office\15.0\Common\Identity"
-    ]
+    available = {}
+    provides = {}
 
-    # Try to extract from Identity registry paths
-    for path in registry_paths:
-        try:
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, path) as key:
-                display_name = winreg.QueryValueEx(key, "ADUserDisplayName")[0]
-                email = winreg.QueryValueEx(key, "ADUserName")[0]
-                return display_name, email
-        except FileNotFoundError:
-            # Try the next path if the current one doesn't exist
-            continue
-        except Exception as e:
-            print(f"Error reading registry path {path}: {e}")
-            return None, None
+    def parse_relations(value: str) -> list:
+        return [alternative.split("|")[0].split("(")[0].split(":")[0].strip()
+                for alternative in value.split(",") if alternative.strip()]
 
-    # Fallback to Common UserInfo if no identity is found
-    fallback_path = r"Software\Microsoft\Office\Common\UserInfo"
     try:
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, fallback_path) as key:
-            display_name = winreg.QueryValueEx(key, "UserName")[0]
-            return display_name, None  # No email in this case
-    except FileNotFoundError:
-        print(f"Registry path {fallback_path} not found.")
+        for index_file in index_files:
+            with gzip.open(index_file, "rt", encoding="utf-8", errors="replace") as file:
+                fields = {}
+                for line in itertools.chain(file, [""]):
+                    if line.strip():
+                        key, separator, value = line.partition(":")
+                        if separator and key in ("Package", "Size", "Installed-Size", "Depends", "Pre-Depends",
+                                                 "Recommends", "Provides"):
+                            fields[key] = value.strip()
+                        continue
+
+                    name = fields.get("Package")
+                    if name and name not in available:
+                        depends = parse_relations(fields.get("Pre-Depends", "")) + parse_relations(
+                            fields.get("Depends", ""))
+                        available[name] = (int(fields.get("Size", 0)), int(fields.get("Installed-Size", 0)) * 1024,
+                                           depends, parse_relations(fields.get("Recommends", "")))
+                        for virtual in parse_relations(fields.get("Provides", "")):
+                            provides.setdefault(virtual, name)
+                    fields = {}
+    except (OSError, ValueError, EOFError) as e:
+        print(f"Error reading package index: {e}")
+        return None
+
+    return available, provides
+
+
+def wsl_runner_get_package_closure(packages, available: dict, provides: dict, recommends: bool = False) -> set:
+    """
+    Resolves packages and everything they pull in.
+
+    Args:
+        packages: Package names, optionally architecture qualified (e.g. "bash:amd64").
+        available (dict): Packages of the index, see wsl_runner_load_package_index().
+        provides (dict): Virtual packages of the index, see wsl_runner_load_package_index().
+        recommends (bool): If True, recommended packages are followed too, as APT does by default.
+
+    Returns:
+        set: Names of the packages in the closure, packages missing from the index are left out.
+    """
+    closure = set()
+    pending = [name.split(":")[0] for name in packages]
+    while pending:
+        name = pending.pop()
+        name = name if name in available else provides.get(name)
+        if name is None or name in closure:
+            continue
+        closure.add(name)
+        size, installed_size, depends, recommended = available[name]
+        pending.extend(depends + (recommended if recommends else []))
+
+    return closure
+
+
+def wsl_runner_estimate_packages(packages: list, index_files: list) -> Optional[tuple]:
+    """
+    Estimates the download and installed sizes of a package list, including the dependencies it pulls in.
+    Dependencies are resolved from the 'Packages' indexes using the first alternative of each
+    'Depends' / 'Pre-Depends' entry and 'Provides' for virtual packages, packages already in the base
+    image are counted too so the estimate errs on the safe side.
+
+    Args:
+        packages (list): The package names to install.
+        index_files (list): Paths of 'Packages.gz' indexes.
+
+    Returns:
+        tuple: (download_bytes, installed_bytes, package_count), None if the indexes could not be read.
+    """
+    index = wsl_runner_load_package_index(index_files)
+    if index is None:
+        return None
+
+    available, provides = index
+    wanted = wsl_runner_get_package_closure(packages, available, provides)
+    return (sum(available[name][0] for name in wanted), sum(available[name][1] for name in wanted),
+            len(wanted))
+
+
+def wsl_runner_get_image_packages(image_source: str, proxy_server: Optional[str] = None) -> Optional[set]:
+    """
+    Lists the packages installed in a base image, read from the dpkg status file inside the image tarball.
+
+    Args:
+        image_source (str): Local path or URL of the image (.tar.gz).
+        proxy_server (str, optional): The proxy server to use for URLs.
+
+    Returns:
+        set: The installed package names, None if the image could not be read.
+    """
+    try:
+        with wsl_runner_open_source(image_source, proxy_server, 60) as stream, \
+                tarfile.open(fileobj=stream, mode="r|*") as archive:
+            for member in archive:
+                if member.name.lstrip("./") != "var/lib/dpkg/status":
+                    continue
+
+                packages = set()
+                name = None
+                for line in archive.extractfile(member).read().decode("utf-8", "replace").splitlines():
+                    if line.startswith("Package:"):
+                        name = line.partition(":")[2].strip()
+                    elif line.startswith("Status:") and line.split()[-1] == "installed" and name:
+                        packages.add(name)
+                return packages
+    except (OSError, tarfile.TarError, urllib.error.URLError) as e:
+        print(f"Error reading base image '{image_source}': {e}")
+
+    return None
+
+
+def wsl_runner_minimize_packages(output_file: str, packages_file: str, image_source: str, cache_path: str,
+                                 proxy_server: Optional[str] = None) -> int:
+    """
+    Reduces the packages list to its minimal top-level set: packages already in the base image and packages
+    pulled in as a dependency of another listed package are dropped, packages missing from the index are kept.
+    Writes the sorted set to the output file and its dependency closure next to it ('.closure.txt'),
+    and reports the download and installed sizes saved.
+
+    The minimal set covers the listed packages through their hard dependencies only, so it is meant to be
+    installed with '--no-install-recommends', reproducing the listed set without what Recommends pull in.
+
+    Args:
+        output_file (str): The minimal packages list to write.
+        packages_file (str): The packages list.
+        image_source (str): Local path or URL of the base image.
+        cache_path (str): The cache directory, package indexes are kept there.
+        proxy_server (str, optional): The proxy server to use.
+
+    Returns:
+        int: 0 on success, 1 otherwise.
+    """
+    try:
+        with open(packages_file, "r") as file:
+            listed = sorted({line.strip().split(":")[0] for line in file
+                             if line.strip() and not line.startswith("#")})
+    except OSError as e:
+        print(f"Error reading '{packages_file}': {e}")
+        return 1
+
+    indexes_path = os.path.join(cache_path, IMCV2_WSL_DEFAULT_INDEXES_CACHE_PATH)
+    index_files = [wsl_runner_fetch_package_index(component, indexes_path, proxy_server)
+                   for component in IMCV2_WSL_DEFAULT_UBUNTU_COMPONENTS]
+    index = wsl_runner_load_package_index(index_files) if all(index_files) else None
+    base = wsl_runner_get_image_packages(image_source, proxy_server)
+    if index is None or base is None:
+        return 1
+
+    available, provides = index
+    unknown = [name for name in listed if name not in available and name not in provides]
+    candidates = [name for name in listed if name not in base and name not in unknown]
+    closures = {name: wsl_runner_get_package_closure([name], available, provides) for name in candidates}
+
+    # Packages pulling in the most are kept first, anything they cover is dropped (this also breaks cycles)
+    covered = set(base)
+    minimal = []
+    for name in sorted(candidates, key=lambda candidate: (-len(closures[candidate]), candidate)):
+        if name in covered:
+            continue
+        minimal.append(name)
+        covered |= closures[name]
+    minimal = sorted(minimal + unknown)
+
+    listed_closure = wsl_runner_get_package_closure(listed, available, provides, recommends=True) - base
+    minimal_closure = wsl_runner_get_package_closure(minimal, available, provides) - base
+
+    try:
+        with open(output_file, "w", newline="\n") as file:
+            file.writelines(f"{name}\n" for name in minimal)
+        with open(os.path.splitext(output_file)[0] + ".closure.txt", "w", newline="\n") as file:
+            file.writelines(f"{name}\n" for name in sorted(minimal_closure))
+    except OSError as e:
+        print(f"Error writing '{output_file}': {e}")
+        return 1
+
+    def sizes(names: set) -> tuple:
+        return (sum(available[name][0] for name in names) / 1024 ** 2,
+                sum(available[name][1] for name in names) / 1024 ** 2, len(names))
+
+    print(f"\nPackages list: {len(listed)} packages, {len(listed) - len(candidates) - len(unknown)} already in the "
+          f"base image, {len(unknown)} not in the index")
+    print(f"Minimal set: {len(minimal)} top-level packages written to '{output_file}'\n")
+    print(f"{'':<40} {'Download MB':>12} {'Installed MB':>13} {'Packages':>9}")
+    for title, values in (("As listed (with Recommends)", sizes(listed_closure)),
+                          ("Minimal set (--no-install-recommends)", sizes(minimal_closure))):
+        print(f"{title:<40} {values[0]:12.1f} {values[1]:13.1f} {values[2]:9d}")
+    saved = [a - b for a, b in zip(sizes(listed_closure), sizes(minimal_closure))]
+    print(f"{'Saved':<40} {saved[0]:12.1f} {saved[1]:13.1f} {saved[2]:9d}")
+
+    return 0
+
+
+def wsl_runner_estimate_space(packages_file: Optional[str], cache_path: str, proxy_server: Optional[str] = None,
+                              pyenv: bool = True, make_bundle: bool = False, artifact_sizes: Optional[list] = None,
+                              offline: bool = False) -> dict:
+    """
+    Estimates the peak disk footprint of a run, split between the instance disk and the cache.
+    The instance disk never shrinks during provisioning (see run_compact_steps()), so its peak is the sum
+    of everything written to it: base image, package archives and installed packages, and the pyenv build.
+
+    Args:
+        packages_file (str, optional): Local copy of the packages list.
+        cache_path (str): The cache directory, package indexes are kept there.
+        proxy_server (str, optional): The proxy server to use for the package indexes.
+        pyenv (bool): If True, count the pyenv Python build.
+        make_bundle (bool): If True, a bundle is created instead of an instance.
+        artifact_sizes (list, optional): Sizes of large artifacts updated in the cache, each needs a second copy.
+        offline (bool): If True, the package indexes are not fetched.
+
+    Returns:
+        dict: 'instance' and 'cache' peak bytes, 'download' bytes of the packages, 'packages' count and 'exact'
+              (False when the package sizes are averaged because no index was available).
+    """
+    packages = []
+    with suppress(OSError):
+        with open(packages_file, "r") as file:
+            packages = [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+    estimate = None
+    indexes_path = os.path.join(cache_path, IMCV2_WSL_DEFAULT_INDEXES_CACHE_PATH)
+    if packages and not offline:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(IMCV2_WSL_DEFAULT_UBUNTU_COMPONENTS)) as executor:
+            index_files = list(executor.map(wsl_runner_get_context().bind(
+                lambda component: wsl_runner_fetch_package_index(component, indexes_path, proxy_server)),
+                IMCV2_WSL_DEFAULT_UBUNTU_COMPONENTS))
+        if all(index_files):
+            # Parsing the indexes takes seconds, the result is reused while the list and the indexes are unchanged
+            estimates_file = os.path.join(indexes_path, "estimates.json")
+            key_source = "\n".join(packages + [f"{path}:{os.path.getsize(path)}:{os.path.getmtime(path)}"
+                                                for path in index_files])
+            key = hashlib.sha1(key_source.encode("utf-8")).hexdigest()
+
+            estimates = {}
+            with suppress(OSError, ValueError):
+                with open(estimates_file, "r") as file:
+                    estimates = json.load(file)
+
+            estimate = tuple(estimates[key]) if key in estimates else wsl_runner_estimate_packages(packages,
+                                                                                                    index_files)
+            if estimate is not None and key not in estimates:
+                with suppress(OSError):
+                    with open(estimates_file, "w") as file:
+                        json.dump({key: estimate}, file)
+
+    if estimate is None:
+        count = max(len(packages), 1)
+        estimate = (count * IMCV2_WSL_ESTIMATE_PACKAGE_SIZE // 2, count * IMCV2_WSL_ESTIMATE_PACKAGE_SIZE // 2,
+                    count)
+        exact = False
+    else:
+        exact = True
+
+    download, installed, count = estimate
+    instance = IMCV2_WSL_ESTIMATE_BASE_SIZE + download + installed
+    instance += IMCV2_WSL_ESTIMATE_PYENV_SIZE if pyenv else 0
+    instance = int(instance * 1.1) + IMCV2_WSL_ESTIMATE_MARGIN
+
+    # Without a package list there is nothing to base the estimate on, fall back to the fixed minimum
+    if not packages:
+        instance = max(instance, IMCV2_WSL_DEFAULT_MIN_FREE_SPACE)
+
+    # The bundle holds the image, the packages and the pyenv tree, while its partial file is being written
+    cache = sum(artifact_sizes if artifact_sizes else [])
+    if make_bundle:
+        instance = 0
+        cache += IMCV2_WSL_ESTIMATE_BASE_SIZE + download + IMCV2_WSL_ESTIMATE_PYENV_SIZE // 2
+
+    return {"instance": instance, "cache": cache, "download": download, "packages": count, "exact": exact}
+
+
+def wsl_runner_evict_cache(cache_path: str, needed: int, keep: Optional[list] = None, dry_run: bool = False) -> int:
+    """
+    Frees space in the cache by removing the least recently used large artifacts, kept resource versions,
+    package indexes and APT lists snapshots, until the requested amount is freed.
+
+    Args:
+        cache_path (str): The cache directory.
+        needed (int): Bytes to free.
+        keep (list, optional): Paths that must not be removed (artifacts used by this run).
+        dry_run (bool): If True, nothing is removed, only the bytes that would be freed are counted.
+
+    Returns:
+        int: Bytes freed.
+    """
+    keep = {os.path.abspath(path) for path in (keep if keep else [])}
+    candidates = []
+
+    for directory in (os.path.join(cache_path, IMCV2_WSL_DEFAULT_ARTIFACTS_CACHE_PATH),
+                      os.path.join(cache_path, IMCV2_WSL_DEFAULT_RESOURCES_CACHE_PATH, "versions"),
+                      os.path.join(cache_path, IMCV2_WSL_DEFAULT_INDEXES_CACHE_PATH),
+                      os.path.join(cache_path, IMCV2_WSL_DEFAULT_APT_LISTS_CACHE_PATH)):
+        with suppress(OSError):
+            for entry in os.scandir(directory):
+                if entry.is_file() and os.path.abspath(entry.path) not in keep:
+                    stat = entry.stat()
+                    candidates.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+
+    freed = 0
+    for last_used, size, path in sorted(candidates):
+        if freed >= needed:
+            break
+        with suppress(OSError):
+            if not dry_run:
+                os.remove(path)
+            freed += size
+
+    return freed
+
+
+def wsl_runner_plan_space(estimate: dict, instance_path: str, cache_path: str, relocate: bool = True,
+                          keep: Optional[list] = None) -> Optional[str]:
+    """
+    Makes sure the estimated peak footprint fits, evicting cache content when that is enough and otherwise
+    moving the instances to another fixed drive with enough free space.
+
+    Args:
+        estimate (dict): The estimate from wsl_runner_estimate_space().
+        instance_path (str): Directory holding the WSL instances.
+        cache_path (str): The cache directory.
+        relocate (bool): If True, the instances may be moved to another drive.
+        keep (list, optional): Cache paths that must not be evicted.
+
+    Returns:
+        str: The instances directory to use, None if the run can't fit anywhere.
+    """
+    instance_drive = os.path.splitdrive(os.path.abspath(instance_path))[0].upper()
+    cache_drive = os.path.splitdrive(os.path.abspath(cache_path))[0].upper()
+    same_drive = instance_drive == cache_drive
+
+    def shortfall(path: str, needed: int) -> int:
+        free = wsl_runner_get_free_disk_space(path)
+        return needed - free if free >= 0 else 0  # Unknown free space is not blocking
+
+    # Evict old cache content only when that alone makes everything fit
+    needed = estimate["cache"] + (estimate["instance"] if same_drive else 0)
+    missing = shortfall(cache_path, needed)
+    if 0 < missing <= wsl_runner_evict_cache(cache_path, missing, keep, dry_run=True):
+        missing -= wsl_runner_evict_cache(cache_path, missing, keep)
+
+    if missing <= 0 and shortfall(instance_path, estimate["instance"]) <= 0:
+        return instance_path
+
+    if not relocate:
+        return None
+
+    # With the instances elsewhere, only the cache has to fit here
+    missing = shortfall(cache_path, estimate["cache"])
+    if 0 < missing <= wsl_runner_evict_cache(cache_path, missing, keep, dry_run=True):
+        missing -= wsl_runner_evict_cache(cache_path, missing, keep)
+    if missing > 0:
+        return None
+
+    # Move the instances to the fixed drive with the most free space that fits
+    free_space = {drive: wsl_runner_get_free_disk_space(drive) for drive in wsl_runner_get_fixed_drives()
+                  if drive[:2].upper() != instance_drive}
+    for drive, free in sorted(free_space.items(), key=lambda item: item[1], reverse=True):
+        if free >= estimate["instance"]:
+            return os.path.join(drive, os.path.basename(IMCV2_WSL_DEFAULT_BASE_PATH),
+                                IMCV2_WSL_DEFAULT_SDK_INSTANCES_PATH)
+
+    return None
+
+
+def wsl_runner_map_instance(drive_letter: str, instance_name: str = None, delete: bool = True) -> int:
+    """
+    Simplifies mapping or deleting a WSL instance as a network drive.
+
+    Args:
+        drive_letter (str): The drive letter to use (e.g., "W").
+        instance_name (str): The name of the WSL instance to map. Required if 'delete' is False.
+        delete (bool): If True, delete the mapped drive. Otherwise, map the instance.
+
+    Returns:
+        int: 0 on success, 1 on failure.
+    """
+    if delete:
+        # Command to delete the network drive
+        args = ["use", drive_letter + ":", "/del"]
+    else:
+        if not instance_name:
+            return 1  # Mandatory argument missing
+
+        # Command to map the WSL instance
+        args = ["use", drive_letter + ":", f"\\\\wsl$\\{instance_name}"]
+
+    # Run the command and capture the output
+    result = wsl_runner_exec_process("net", args, True, 0)
+    if result is not None:
+        status, ext_status, log_lines = result  # Unpack the tuple
+        return status
+    else:
+        return 1  # Error while executing command
+
+
+def wsl_runner_is_cmd_in_windows_terminal() -> int:
+    """
+    Checks if the script is running in Command Prompt inside Windows Terminal.
+
+    Returns:
+        int: 0 if running in Command Prompt inside Windows Terminal, 1 otherwise.
+    """
+
+    found_cmd = False
+    found_terminal = False
+
+    # Prefer the ancestry collected at startup, walk it using WMIC otherwise
+    facts = wsl_runner_get_context().host_facts
+    process_chain = list(facts.process_chain) if facts is not None else []
+    if not process_chain:
+        current_pid = os.getppid()
+        while current_pid and len(process_chain) < 32:
+            # Query the process name and its parent using WMIC
+            args = ['process', 'where', f'ProcessId={current_pid}', 'get', 'Name,ParentProcessId', '/format:csv']
+            status, ext_status, clean_lines = wsl_runner_exec_process("wmic", args, True, 0)
+            if status != 0 or len(clean_lines) < 2:
+                break
+
+            # CSV layout: Node,Name,ParentProcessId
+            fields = clean_lines[-1].split(",")
+            if len(fields) < 3 or not fields[-1].isdigit():
+                break
+            process_chain.append(fields[-2])
+            current_pid = int(fields[-1])
+
+    for process_name in process_chain:
+        if process_name.lower() == "cmd.exe":
+            found_cmd = True
+        elif process_name.lower() == "windowsterminal.exe":
+            found_terminal = True
+            break  # Stop when WindowsTerminal.exe is found
+        elif process_name.lower() in ["powershell.exe", "pwsh.exe"]:
+            # If PowerShell is detected, reject
+            return 1
+
+    # Ensure both cmd.exe and WindowsTerminal.exe were found
+    if found_cmd and found_terminal:
+        return 0
+
+    return 1  # Default to rejection
+
+
+def wsl_runner_get_office_user_identity():
+    """
+    Extract ADUserDisplayName and ADUserName from the Windows Registry.
+    Tries Office 16.0 and 15.0 first, then falls back to Common UserInfo.
+
+    Returns:
+        tuple: (Full name, Corporate email) if found, otherwise None.
+    """
+    registry_paths = [
+        r"Software\Microsoft\Office\16.0\Common\Identity",
+        r"Software\Microsoft\Office\15.0\Common\Identity"
+    ]
+
+    # Try to extract from Identity registry paths
+    for path in registry_paths:
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, path) as key:
+                display_name = winreg.QueryValueEx(key, "ADUserDisplayName")[0]
+                email = winreg.QueryValueEx(key, "ADUserName")[0]
+                return display_name, email
+        except FileNotFoundError:
+            # Try the next path if the current one doesn't exist
+            continue
+        except Exception as e:
+            print(f"Error reading registry path {path}: {e}")
+            return None, None
+
+    # Fallback to Common UserInfo if no identity is found
+    fallback_path = r"Software\Microsoft\Office\Common\UserInfo"
+    try:
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, fallback_path) as key:
+            display_name = winreg.QueryValueEx(key, "UserName")[0]
+            return display_name, None  # No email in this case
+    except FileNotFoundError:
+        print(f"Registry path {fallback_path} not found.")
     except Exception as e:
         print(f"Error reading fallback registry path {fallback_path}: {e}")
 
@@ -637,6 +2074,41 @@ def wsl_runner_get_office_user_identity():
     return None, None
 
 
+def wsl_runner_get_windows_time_zone() -> Optional[str]:
+    """
+    Reads the Windows time zone key name from the registry.
+
+    Returns:
+        str: The time zone key name (e.g. "Israel Standard Time"), None if it could not be read.
+    """
+    with suppress(OSError):
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE,
+                            r"SYSTEM\CurrentControlSet\Control\TimeZoneInformation") as key:
+            return winreg.QueryValueEx(key, "TimeZoneKeyName")[0].strip("\x00 ") or None
+    return None
+
+
+def wsl_runner_get_time_zone(time_zone: Optional[str] = None) -> str:
+    """
+    Returns the IANA time zone for the instance: the given one, or the equivalent of the host time zone.
+
+    Args:
+        time_zone (str, optional): IANA time zone name (e.g. "Europe/Berlin") overriding the host time zone.
+
+    Returns:
+        str: The IANA time zone name, IMCV2_WSL_DEFAULT_TIME_ZONE when the host time zone is unknown.
+
+    Raises:
+        ValueError: If the given time zone is not a valid IANA name.
+    """
+    if time_zone:
+        if not re.fullmatch(r"[A-Za-z0-9_+-]+(/[A-Za-z0-9_+-]+)*", time_zone):
+            raise ValueError(f"Invalid time zone '{time_zone}'")
+        return time_zone
+
+    return IMCV2_WSL_WINDOWS_TIME_ZONES.get(wsl_runner_get_host_facts().time_zone, IMCV2_WSL_DEFAULT_TIME_ZONE)
+
+
 def wsl_runner_show_info():
     """
         Provides detailed information about the steps performed by
@@ -663,7 +2135,8 @@ def wsl_runner_show_info():
 
 def wsl_runner_get_desktop_path() -> Optional[str]:
     """
-    Retrieves the desktop path for the current user dynamically using PowerShell.
+    Retrieves the desktop path for the current user, from the host facts when already collected
+    or dynamically using PowerShell otherwise.
 
     Returns:
         str: The path to the desktop directory.
@@ -671,6 +2144,10 @@ def wsl_runner_get_desktop_path() -> Optional[str]:
     Raises:
         FileNotFoundError: If the desktop path cannot be retrieved.
     """
+    facts = wsl_runner_get_context().host_facts
+    if facts is not None and facts.desktop_path and os.path.exists(facts.desktop_path):
+        return facts.desktop_path
+
     try:
 
         args = [
@@ -690,191 +2167,1396 @@ def wsl_runner_get_desktop_path() -> Optional[str]:
         raise FileNotFoundError(f"Failed to retrieve desktop path: {e}")
 
 
-def wsl_runner_is_proxy_available(proxy_server: str, timeout: int = 5) -> bool:
+def wsl_runner_get_network_key() -> str:
+    """
+    Identifies the network the host is currently attached to, using the default gateways and
+    DNS suffixes from the registry. Used to cache per-network decisions such as the network route.
+
+    Returns:
+        str: A short stable identifier of the current network.
+    """
+    gateways = set()
+    suffixes = set()
+    tcpip_path = r"SYSTEM\CurrentControlSet\Services\Tcpip\Parameters"
+
+    with suppress(Exception):
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, tcpip_path) as key:
+            for value_name in ("Domain", "DhcpDomain", "SearchList"):
+                with suppress(OSError):
+                    value = winreg.QueryValueEx(key, value_name)[0]
+                    suffixes.update(item for item in re.split(r"[,\s]+", value) if item)
+
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, tcpip_path + r"\Interfaces") as interfaces:
+            for index in itertools.count():
+                try:
+                    interface_name = winreg.EnumKey(interfaces, index)
+                except OSError:
+                    break
+                with suppress(OSError):
+                    with winreg.OpenKey(interfaces, interface_name) as interface:
+                        for value_name in ("DhcpDefaultGateway", "DefaultGateway"):
+                            with suppress(OSError):
+                                gateways.update(item for item in winreg.QueryValueEx(interface, value_name)[0]
+                                                if item)
+                        with suppress(OSError):
+                            value = winreg.QueryValueEx(interface, "DhcpDomain")[0]
+                            if value:
+                                suffixes.add(value)
+
+    # Not on Windows or nothing found, the host domain is the best remaining hint
+    if not gateways and not suffixes:
+        suffixes.add(socket.getfqdn().partition(".")[2])
+
+    network = f"gw={','.join(sorted(gateways))};dns={','.join(sorted(suffixes))}"
+    return hashlib.sha1(network.encode("utf-8")).hexdigest()[:16]
+
+
+def wsl_runner_probe_network_route(proxy_server: Optional[str], resource_url: str,
+                                   timeout: float = IMCV2_WSL_DEFAULT_PROBE_TIMEOUT,
+                                   cache_path: Optional[str] = None,
+                                   cache_ttl: int = IMCV2_WSL_DEFAULT_ROUTE_CACHE_TTL) -> Optional[str]:
     """
-    Checks if the specified proxy server is reachable using urllib.
+    Picks the network route to use for downloads by racing a TCP connect to the proxy against a direct
+    TCP connect to the resources host. The first connection to succeed wins.
+    The result is cached per network (see wsl_runner_get_network_key()) so later runs skip the probe.
 
     Args:
-        proxy_server (str): The proxy server to test in the format 'https://proxyserver:port'.
-        timeout (int, optional): Timeout in seconds for the test. Default is 5 seconds.
+        proxy_server (str, optional): Proxy server in the format 'http://proxyserver:port'.
+        resource_url (str): Any URL on the resources host.
+        timeout (float, optional): Seconds to wait for either connection to succeed.
+        cache_path (str, optional): Directory holding the route cache. The cache is not used when None.
+        cache_ttl (int, optional): Seconds a cached route is trusted.
 
     Returns:
-        bool: True if the proxy server is reachable, False otherwise.
+        str: "proxy" or "direct", None if neither route could connect in time.
+    """
+    cache_file = os.path.join(cache_path, "network_routes.json") if cache_path else None
+    cache_key = f"{wsl_runner_get_network_key()}|{proxy_server or ''}"
+    routes = {}
+
+    if cache_file:
+        with suppress(OSError, ValueError):
+            with open(cache_file, "r") as file:
+                routes = json.load(file)
+        cached = routes.get(cache_key)
+        if cached and time.time() - cached.get("time", 0) < cache_ttl:
+            return cached.get("route")
+
+    resource = urlparse(resource_url)
+    targets = {"direct": (resource.hostname, resource.port or (443 if resource.scheme == "https" else 80))}
+    if proxy_server:
+        proxy = urlparse(proxy_server if "://" in proxy_server else f"http://{proxy_server}")
+        targets["proxy"] = (proxy.hostname, proxy.port or 80)
+
+    def try_connect(address: tuple) -> bool:
+        with socket.create_connection(address, timeout=timeout):
+            return True
+
+    route = None
+    deadline = time.monotonic() + timeout
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(targets))
+    try:
+        pending = {executor.submit(try_connect, address): name for name, address in targets.items()}
+        while pending and route is None:
+            done, not_done = concurrent.futures.wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                                     return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break  # Deadline reached
+            for future in done:
+                name = pending.pop(future)
+                if route is None and future.exception() is None:
+                    route = name
+    finally:
+        # Don't wait for the losing connection attempt
+        executor.shutdown(wait=False)
+
+    if cache_file and route is not None:
+        routes[cache_key] = {"route": route, "time": int(time.time())}
+        with suppress(OSError):
+            os.makedirs(cache_path, exist_ok=True)
+            with open(cache_file, "w") as file:
+                json.dump(routes, file, indent=2)
+
+    return route
+
+
+def wsl_runner_benchmark_mirror(mirror: str, proxy_server: Optional[str] = None,
+                                suite: str = IMCV2_WSL_DEFAULT_UBUNTU_SUITE,
+                                timeout: float = IMCV2_WSL_DEFAULT_MIRROR_TIMEOUT) -> Optional[dict]:
     """
-    test_url = "https://www.google.com"  # Use a reliable public URL for connectivity testing
+    Measures an Ubuntu mirror by fetching the beginning of its main 'Packages.gz' index for the suite,
+    which also checks that the mirror carries the suite.
+
+    Args:
+        mirror (str): The mirror URL (e.g. "http://archive.ubuntu.com/ubuntu").
+        proxy_server (str, optional): The proxy server to use.
+        suite (str, optional): The Ubuntu suite.
+        timeout (float, optional): Socket timeout in seconds.
 
-    # Configure proxy
-    proxy_handler = urllib.request.ProxyHandler({'http': proxy_server, 'https': proxy_server})
-    opener = urllib.request.build_opener(proxy_handler)
-    urllib.request.install_opener(opener)
+    Returns:
+        dict: "latency" (seconds to the response), "throughput" (bytes per second) and "seconds" (total time),
+              None if the mirror could not be used or sent too little data to be measured.
+    """
+    url = f"{mirror.rstrip('/')}/dists/{suite}/main/binary-amd64/Packages.gz"
+    received = 0
+    start = time.monotonic()
 
     try:
-        with urllib.request.urlopen(test_url, timeout=timeout) as response:
-            # If we get a 200-HTTP response, the proxy is working
-            return response.status == 200
-    except (urllib.error.URLError, urllib.error.HTTPError) as e:
-        print(f"Proxy test failed: {e}")
-        return False
+        with wsl_runner_open_source(url, proxy_server, timeout,
+                                    {"Range": f"bytes=0-{IMCV2_WSL_MIRROR_SAMPLE_SIZE - 1}"}) as stream:
+            latency = time.monotonic() - start
+            while received < IMCV2_WSL_MIRROR_SAMPLE_SIZE:
+                chunk = stream.read(64 * 1024)
+                if not chunk:
+                    break
+                received += len(chunk)
+    except (OSError, urllib.error.URLError, http.client.HTTPException):
+        return None
 
+    # An empty or truncated body would otherwise win the benchmark
+    if received < IMCV2_WSL_MIRROR_MIN_SAMPLE_SIZE:
+        return None
 
-def open_admin_command_prompt_in_terminal():
+    elapsed = time.monotonic() - start
+    return {"latency": round(latency, 3), "throughput": int(received / max(elapsed - latency, 0.001)),
+            "seconds": round(elapsed, 3)}
+
+
+def wsl_runner_get_cached_mirror(proxy_server: Optional[str] = None, cache_path: Optional[str] = None,
+                                 local_mirror: Optional[str] = None,
+                                 cache_ttl: int = IMCV2_WSL_DEFAULT_MIRROR_CACHE_TTL) -> Optional[str]:
     """
-    Opens a new Windows Terminal session with administrator privileges.
-    Note:
-        - The user will receive a UAC (User Account Control) prompt to confirm the action.
-        - No additional commands are executed in the terminal; the default profile is used.
+    Returns the mirror picked by a previous benchmark on this network, without measuring anything.
+
+    Args:
+        proxy_server (str, optional): The proxy server the benchmark went through.
+        cache_path (str, optional): Directory holding the mirrors cache.
+        local_mirror (str, optional): The additional mirror the benchmark included.
+        cache_ttl (int, optional): Seconds a cached choice is trusted.
+
+    Returns:
+        str: The cached mirror URL, None when there is no recent choice.
     """
-    elevate_cmd = (
-        r'powershell -Command "& {Start-Process -FilePath wt.exe -Verb RunAs}"'
-    )
+    if not cache_path:
+        return None
 
-    try:
-        subprocess.run(elevate_cmd, shell=True)
-    except Exception as e:
-        print(f"Failed to open terminal as admin: {e}")
+    mirrors = {}
+    with suppress(OSError, ValueError):
+        with open(os.path.join(cache_path, "mirrors.json"), "r") as file:
+            mirrors = json.load(file)
 
+    cached = mirrors.get(f"{wsl_runner_get_network_key()}|{proxy_server or ''}|{local_mirror or ''}")
+    if cached and time.time() - cached.get("time", 0) < cache_ttl:
+        return cached.get("mirror", IMCV2_WSL_DEFAULT_UBUNTU_MIRROR)
+    return None
 
-def wsl_runner_start_wsl_shell(distribution=None):
+
+def wsl_runner_select_mirror(proxy_server: Optional[str] = None, cache_path: Optional[str] = None,
+                             local_mirror: Optional[str] = None, benchmark: bool = True,
+                             cache_ttl: int = IMCV2_WSL_DEFAULT_MIRROR_CACHE_TTL) -> str:
     """
-    Launches WSL in Windows Terminal, optionally specifying a distribution.
-    Tries to open in the same window if possible.
+    Picks the Ubuntu mirror that fetches a typical package the fastest, benchmarking the candidates concurrently.
+    The result is cached per network (see wsl_runner_get_network_key()) so later runs skip the benchmark.
 
     Args:
-        distribution (str): The name of the WSL distribution (e.g., "IMCv2").
-                            If None, the default WSL profile is used.
+        proxy_server (str, optional): The proxy server to use.
+        cache_path (str, optional): Directory holding the mirrors cache. The cache is not used when None.
+        local_mirror (str, optional): An additional mirror to benchmark (e.g. a site-local one).
+        benchmark (bool, optional): If False, only a cached choice is used.
+        cache_ttl (int, optional): Seconds a cached choice is trusted.
 
     Returns:
-        int: Exit code of the Windows Terminal command or 1 on failure.
+        str: The mirror URL, IMCV2_WSL_DEFAULT_UBUNTU_MIRROR when no mirror could be measured.
+
+    Raises:
+        ValueError: If the local mirror is not a valid HTTP(S) URL.
     """
-    try:
-        # Base command for Windows Terminal
-        command = ["wt", "-w", "last"]
+    if local_mirror and not re.fullmatch(r"https?://[A-Za-z0-9.-]+(:\d+)?(/[A-Za-z0-9._~/-]*)?", local_mirror):
+        raise ValueError(f"Invalid mirror URL '{local_mirror}'")
+
+    cached = wsl_runner_get_cached_mirror(proxy_server, cache_path, local_mirror, cache_ttl)
+    if cached:
+        return cached
+
+    if not benchmark:
+        return IMCV2_WSL_DEFAULT_UBUNTU_MIRROR
+
+    candidates = list(IMCV2_WSL_UBUNTU_MIRRORS) + ([local_mirror.rstrip("/")] if local_mirror else [])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        results = dict(zip(candidates, executor.map(wsl_runner_get_context().bind(
+            lambda candidate: wsl_runner_benchmark_mirror(candidate, proxy_server)), candidates)))
+
+    measured = {candidate: result for candidate, result in results.items() if result is not None}
+    if not measured:
+        return IMCV2_WSL_DEFAULT_UBUNTU_MIRROR
+
+    mirror = min(measured, key=lambda candidate: measured[candidate]["seconds"])
+    if cache_path:
+        cache_file = os.path.join(cache_path, "mirrors.json")
+        mirrors = {}
+        with suppress(OSError, ValueError):
+            with open(cache_file, "r") as file:
+                mirrors = json.load(file)
+        mirrors[f"{wsl_runner_get_network_key()}|{proxy_server or ''}|{local_mirror or ''}"] = {
+            "mirror": mirror, "results": measured, "time": int(time.time())}
+        with suppress(OSError):
+            os.makedirs(cache_path, exist_ok=True)
+            with open(cache_file, "w") as file:
+                json.dump(mirrors, file, indent=2)
+
+    return mirror
+
+
+def wsl_runner_query_host_facts() -> dict:
+    """
+    Default host facts provider.
+    Reads everything that is available in-process through ctypes and winreg, and gathers the rest
+    (desktop path, process ancestry) using a single PowerShell invocation.
 
-        # Add the profile or default WSL launch command
-        if distribution:
-            command.extend(["-p", distribution])  # Add profile name as a string
-        else:
-            command.append("wsl")  # Launch default WSL distribution
+    Returns:
+        dict: Keyword arguments for HostFacts, missing keys fall back to the HostFacts defaults.
+    """
+    facts = {
+        "cpu_cores": wsl_runner_get_cpu_cores(),
+        "cpu_type": platform.processor(),
+    }
 
-        # Run the command and return its exit code
-        result = subprocess.run(command, check=False)  # Don't rise on error
-        return result.returncode
+    with suppress(Exception):
+        facts["ram_gb"] = wsl_runner_get_physical_ram()
+
+    with suppress(Exception):
+        facts["corp_name"], facts["corp_email"] = wsl_runner_get_office_user_identity()
+
+    with suppress(Exception):
+        facts["time_zone"] = wsl_runner_get_windows_time_zone()
+
+    # Walk the ancestry from the process that started us using a single process snapshot
+    facts_script = f"""
+    $ErrorActionPreference = 'SilentlyContinue'
+    $procs = @{{}}
+    Get-CimInstance Win32_Process -Property ProcessId,ParentProcessId,Name |
+        ForEach-Object {{ $procs[[int]$_.ProcessId] = $_ }}
+    $chain = @()
+    $id = {os.getppid()}
+    while ($id -and $procs.ContainsKey($id) -and $chain.Count -lt 32) {{
+        $chain += $procs[$id].Name
+        $id = [int]$procs[$id].ParentProcessId
+    }}
+    [pscustomobject]@{{
+        desktop_path = [Environment]::GetFolderPath('Desktop')
+        process_chain = $chain
+    }} | ConvertTo-Json -Compress
+    """
+
+    status, ext_status, log_lines = wsl_runner_exec_process("powershell", ["-NoProfile", "-Command", facts_script],
+                                                            True, 0)
+    if status == 0 and log_lines:
+        with suppress(ValueError):
+            facts.update(json.loads("".join(log_lines)))
+
+    return facts
+
+
+def wsl_runner_collect_host_facts(proxy_server: Optional[str] = None, provider=None,
+                                  probe_timeout: float = IMCV2_WSL_DEFAULT_PROBE_TIMEOUT,
+                                  cache_path: Optional[str] = None) -> HostFacts:
+    """
+    Collects the host facts, running the facts provider, 'wsl --version' and the network route probe concurrently.
+
+    Args:
+        proxy_server (str, optional): Proxy server to probe. The probe is skipped when None.
+        provider (callable, optional): Returns a dict of facts, defaults to wsl_runner_query_host_facts().
+                                       Tests can pass a stub returning canned values.
+        probe_timeout (float, optional): Seconds allowed for the network route probe.
+        cache_path (str, optional): Directory holding the network route cache.
+
+    Returns:
+        HostFacts: The collected facts.
+    """
+    provider = provider if provider is not None else wsl_runner_query_host_facts
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        provider_future = executor.submit(wsl_runner_get_context().bind(provider))
+        wsl_future = executor.submit(wsl_runner_get_context().bind(wsl_runner_exec_process), "wsl", ["--version"],
+                                     True, 0)
+        route_future = executor.submit(wsl_runner_probe_network_route, proxy_server,
+                                       IMCV2_WSL_DEFAULT_RESOURCES_URL, probe_timeout,
+                                       cache_path) if proxy_server else None
+
+        facts = dict(provider_future.result())
+        if "wsl_version_status" not in facts:
+            facts["wsl_version_status"], ext_status, facts["wsl_version_lines"] = wsl_future.result()
+        if route_future is not None:
+            facts["network_route"] = route_future.result()
+            facts["proxy_available"] = facts["network_route"] == "proxy"
+
+    return HostFacts(**facts)
+
+
+def wsl_runner_get_host_facts(proxy_server: Optional[str] = None, provider=None, refresh: bool = False,
+                              probe_timeout: float = IMCV2_WSL_DEFAULT_PROBE_TIMEOUT,
+                              cache_path: Optional[str] = None) -> HostFacts:
+    """
+    Returns the host facts of the current context, collecting them on first use.
+    The network route is probed for the proxy of that run, other contexts collect their own.
+
+    Args:
+        proxy_server (str, optional): Proxy server to probe when the facts are collected.
+        provider (callable, optional): Facts provider, see wsl_runner_collect_host_facts().
+        refresh (bool): If True, collect the facts again even if already cached.
+        probe_timeout (float, optional): Seconds allowed for the network route probe.
+        cache_path (str, optional): Directory holding the network route cache.
+
+    Returns:
+        HostFacts: The cached facts.
+    """
+    context = wsl_runner_get_context()
+
+    if context.host_facts is None or refresh:
+        context.host_facts = wsl_runner_collect_host_facts(proxy_server, provider, probe_timeout, cache_path)
+
+    return context.host_facts
+
+
+def open_admin_command_prompt_in_terminal():
+    """
+    Opens a new Windows Terminal session with administrator privileges.
+    Note:
+        - The user will receive a UAC (User Account Control) prompt to confirm the action.
+        - No additional commands are executed in the terminal; the default profile is used.
+    """
+    elevate_cmd = (
+        r'powershell -Command "& {Start-Process -FilePath wt.exe -Verb RunAs}"'
+    )
+
+    try:
+        subprocess.run(elevate_cmd, shell=True)
+    except Exception as e:
+        print(f"Failed to open terminal as admin: {e}")
+
+
+def wsl_runner_start_wsl_shell(distribution=None):
+    """
+    Launches WSL in Windows Terminal, optionally specifying a distribution.
+    Tries to open in the same window if possible.
+
+    Args:
+        distribution (str): The name of the WSL distribution (e.g., "IMCv2").
+                            If None, the default WSL profile is used.
+
+    Returns:
+        int: Exit code of the Windows Terminal command or 1 on failure.
+    """
+    try:
+        # Base command for Windows Terminal
+        command = ["wt", "-w", "last"]
+
+        # Add the profile or default WSL launch command
+        if distribution:
+            command.extend(["-p", distribution])  # Add profile name as a string
+        else:
+            command.append("wsl")  # Launch default WSL distribution
+
+        # Run the command and return its exit code
+        result = subprocess.run(command, check=False)  # Don't rise on error
+        return result.returncode
+
+    except (FileNotFoundError, subprocess.CalledProcessError, Exception):
+        return 1
+
+
+def wsl_runner_spinner_thread():
+    """
+    Display a spinning progress indicator in the terminal.
+    """
+    context = wsl_runner_get_context()
+
+    # Exit if the spinner is globally disabled
+    if context.spinner_disabled:
+        return
+
+    bright_blue = "\033[94m"
+    reset = "\033[0m"
+    spinner_cycle = itertools.cycle(["|", "/", "-", "\\"])
+
+    while context.spinner_active:
+        context.output.write(f"{bright_blue}{next(spinner_cycle)}{reset}")  # Print the next character
+        context.output.flush()
+        context.output.write("\b")  # Erase the character
+        time.sleep(0.1)
+
+
+def wsl_runner_set_spinner(state):
+    """
+    Manage the progress spinner thread.
+    Args:
+        state (bool): True to start the spinner, False to stop.
+    """
+    context = wsl_runner_get_context()
+
+    # Exit if the spinner is globally disabled
+    if context.spinner_disabled:
+        return
+
+    if state:
+        context.spinner_active = True
+        progress_thread = threading.Thread(target=context.bind(wsl_runner_spinner_thread), daemon=True)
+        progress_thread.start()
+        return progress_thread
+    else:
+        context.spinner_active = False
+        time.sleep(0.1)
+        context.output.write("\b")
+        context.output.flush()
+
+
+def wsl_runner_ensure_directory_exists(args: list) -> int:
+    """
+    Simulates a command that ensures directories exist.
+
+    Args:
+        args (list): List of directory paths to check and create if necessary.
+
+    Returns:
+        int: 0 if all directories exist or are created successfully, 1 on failure.
+    """
+    try:
+        for path in args:
+            if not os.path.exists(path):
+                os.makedirs(path)
+        return 0  # Success
+    except Exception as e:
+        print(f"Error ensuring directory exists: {e}", file=sys.stderr)
+        return 1  # Failure
+
+
+def wsl_runner_fetch_verified(url: str, destination: str, proxy_server: Optional[str] = None,
+                              expected_sha256: Optional[str] = None, timeout: int = 30, retries: int = 1,
+                              metadata: Optional[dict] = None) -> int:
+    """
+    Downloads a URL to a file, hashing the bytes as they are written so no second read pass is needed.
+    On a digest mismatch or a transfer error, the partial file is discarded and the download is retried right away.
+
+    When metadata describing the current destination is given, the request is conditional ('If-None-Match',
+    'If-Modified-Since') and a '304 Not Modified' answer keeps the destination as-is. The metadata is
+    updated in place with the validators and digest of the new content.
+
+    Args:
+        url (str): The URL to download.
+        destination (str): The destination file path.
+        proxy_server (str, optional): The proxy server to use for the download.
+        expected_sha256 (str, optional): Expected hex digest, the content is not verified when None.
+        timeout (int, optional): Socket timeout in seconds.
+        retries (int, optional): Number of additional attempts after a failed one.
+        metadata (dict, optional): 'etag', 'last_modified' and 'sha256' of the current destination.
+
+    Returns:
+        int: 0 if the file was downloaded (or not modified) and verified, 1 otherwise.
+    """
+    partial = destination + ".part"
+    headers = {}
+
+    if metadata is not None and metadata.get("sha256") and os.path.isfile(destination):
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    for attempt in range(retries + 1):
+        digest = hashlib.sha256()
+        try:
+            with wsl_runner_open_source(url, proxy_server, timeout, headers) as stream, \
+                    open(partial, "wb") as file:
+                for chunk in iter(lambda: stream.read(256 * 1024), b""):
+                    digest.update(chunk)
+                    file.write(chunk)
+                response_headers = getattr(stream, "headers", {})
+
+        except urllib.error.HTTPError as e:
+            with suppress(OSError):
+                os.remove(partial)
+            if e.code == 304 and headers:
+                if expected_sha256 and metadata["sha256"] != expected_sha256.lower():
+                    print(f"Checksum mismatch for '{url}' (not modified).")
+                    return 1
+                return 0
+            print(f"Error downloading '{url}': {e}")
+            continue
+
+        except (OSError, ValueError) as e:
+            print(f"Error downloading '{url}': {e}")
+            with suppress(OSError):
+                os.remove(partial)
+            continue
+
+        if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+            print(f"Checksum mismatch for '{url}'.")
+            with suppress(OSError):
+                os.remove(partial)
+            continue
+
+        os.replace(partial, destination)
+        if metadata is not None:
+            metadata.update({"etag": response_headers.get("ETag"),
+                             "last_modified": response_headers.get("Last-Modified"),
+                             "sha256": digest.hexdigest()})
+        return 0
+
+    return 1
+
+
+def wsl_runner_make_block_index(path: str, block_size: int = IMCV2_WSL_DEFAULT_DELTA_BLOCK_SIZE) -> Optional[dict]:
+    """
+    Computes the block index of a file: the digest of each fixed size block and of the whole file.
+    Publishing the index next to a large artifact lets clients holding an older copy fetch only the changed
+    blocks (see wsl_runner_fetch_delta()).
+
+    Args:
+        path (str): The file to index.
+        block_size (int, optional): Block size in bytes.
+
+    Returns:
+        dict: The block index, or None if the file could not be read.
+    """
+    digest = hashlib.sha256()
+    blocks = []
+    size = 0
+
+    try:
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+                blocks.append(hashlib.sha256(block).hexdigest()[:32])
+                size += len(block)
+    except OSError as e:
+        print(f"Error indexing '{path}': {e}")
+        return None
+
+    return {"version": 1, "block_size": block_size, "size": size, "sha256": digest.hexdigest(), "blocks": blocks}
+
+
+def wsl_runner_write_block_index(path: str, block_size: int = IMCV2_WSL_DEFAULT_DELTA_BLOCK_SIZE) -> int:
+    """
+    Writes the block index of a file next to it, as '<path>.blocks.json'.
+
+    Args:
+        path (str): The file to index.
+        block_size (int, optional): Block size in bytes.
+
+    Returns:
+        int: 0 on success, 1 otherwise.
+    """
+    index = wsl_runner_make_block_index(path, block_size)
+    if index is None:
+        return 1
+
+    try:
+        with open(path + IMCV2_WSL_BLOCK_INDEX_SUFFIX, "w") as file:
+            json.dump(index, file)
+    except OSError as e:
+        print(f"Error writing block index for '{path}': {e}")
+        return 1
+
+    return 0
+
+
+def wsl_runner_check_resource_pins(resources_dir: Optional[str] = None) -> int:
+    """
+    Recomputes the digests of the pinned remote resources from a local 'resources' directory, e.g. the one
+    of this checkout, and reports the pins that no longer match.
+
+    Args:
+        resources_dir (str, optional): Directory holding the resources, defaults to the one next to this script.
+
+    Returns:
+        int: 0 if all pins match, 1 otherwise.
+    """
+    resources_dir = resources_dir if resources_dir else os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                     "resources")
+    status = 0
+    for resource in remote_resources:
+        if resource.get("sha256") is None:
+            continue
+
+        actual = wsl_runner_file_sha256(os.path.join(resources_dir, resource["file_name"]))
+        if actual != resource["sha256"]:
+            print(f"'{resource['file_name']}': pinned {resource['sha256']}, found {actual}")
+            status = 1
+
+    return status
+
+
+def wsl_runner_copy_range(source, destination, length: int, digest, chunk_size: int = 1024 * 1024):
+    """
+    Copies exactly 'length' bytes between two file-like objects in bounded chunks, updating a digest on the way.
+    Short reads are retried until the source runs dry.
+
+    Args:
+        source: The object to read from.
+        destination: The object to write to.
+        length (int): Number of bytes to copy.
+        digest: A hashlib object updated with the copied bytes.
+        chunk_size (int, optional): Maximum number of bytes held in memory.
+
+    Raises:
+        ValueError: If the source ended before 'length' bytes were read.
+    """
+    while length > 0:
+        data = source.read(min(chunk_size, length))
+        if not data:
+            raise ValueError("short read")
+        digest.update(data)
+        destination.write(data)
+        length -= len(data)
+
+
+def wsl_runner_fetch_delta(url: str, destination: str, proxy_server: Optional[str] = None,
+                           expected_sha256: Optional[str] = None, timeout: int = 30) -> int:
+    """
+    Updates a local copy of a large artifact, transferring only the blocks that changed.
+    The block index published next to the artifact ('<url>.blocks.json') is compared with the blocks of the
+    current local copy. Blocks found locally, at any block aligned offset, are copied and the missing ones are
+    fetched using HTTP range requests, one request per run of consecutive blocks.
+    Falls back to a full download when there is no local copy, no published index, or the server ignores ranges.
+
+    Args:
+        url (str): The URL of the artifact.
+        destination (str): The local copy to update.
+        proxy_server (str, optional): The proxy server to use.
+        expected_sha256 (str, optional): Expected hex digest of the artifact.
+        timeout (int, optional): Socket timeout in seconds.
+
+    Returns:
+        int: 0 if the local copy is up-to-date and verified, 1 otherwise.
+    """
+    index = None
+    if os.path.isfile(destination):
+        with suppress(OSError, ValueError, UnicodeDecodeError):
+            with wsl_runner_open_source(url + IMCV2_WSL_BLOCK_INDEX_SUFFIX, proxy_server, timeout) as stream:
+                index = json.loads(stream.read().decode("utf-8"))
+
+    if (not index or index.get("version") != 1 or
+            (expected_sha256 and index["sha256"] != expected_sha256.lower())):
+        return wsl_runner_fetch_verified(url, destination, proxy_server, expected_sha256, timeout)
+
+    block_size = index["block_size"]
+    local_index = wsl_runner_make_block_index(destination, block_size)
+    if local_index is None:
+        return wsl_runner_fetch_verified(url, destination, proxy_server, expected_sha256, timeout)
+    if local_index["sha256"] == index["sha256"]:
+        return 0  # Already up-to-date
+
+    local_blocks = {}
+    for number, block_hash in enumerate(local_index["blocks"]):
+        local_blocks.setdefault(block_hash, number * block_size)
+
+    # Plan: ("local", offset, length) for reused blocks, ("remote", offset, length) for runs of missing blocks
+    plan = []
+    for number, block_hash in enumerate(index["blocks"]):
+        offset = number * block_size
+        length = min(block_size, index["size"] - offset)
+        if block_hash in local_blocks:
+            plan.append(("local", local_blocks[block_hash], length))
+        elif plan and plan[-1][0] == "remote":
+            plan[-1] = ("remote", plan[-1][1], plan[-1][2] + length)
+        else:
+            plan.append(("remote", offset, length))
+
+    partial = destination + ".part"
+    digest = hashlib.sha256()
+    try:
+        with open(destination, "rb") as local, open(partial, "wb") as file:
+            for source, offset, length in plan:
+                if source == "local":
+                    local.seek(offset)
+                    wsl_runner_copy_range(local, file, length, digest)
+                else:
+                    headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+                    with wsl_runner_open_source(url, proxy_server, timeout, headers) as stream:
+                        if getattr(stream, "status", None) != 206:
+                            raise ValueError("range requests are not supported")
+                        wsl_runner_copy_range(stream, file, length, digest)
+
+    except (OSError, ValueError) as e:
+        print(f"Delta update of '{url}' failed ({e}), downloading in full.")
+        with suppress(OSError):
+            os.remove(partial)
+        return wsl_runner_fetch_verified(url, destination, proxy_server, expected_sha256, timeout)
+
+    if digest.hexdigest() != index["sha256"]:
+        with suppress(OSError):
+            os.remove(partial)
+        return wsl_runner_fetch_verified(url, destination, proxy_server, expected_sha256, timeout)
+
+    os.replace(partial, destination)
+    return 0
+
+
+def wsl_runner_sync_artifact(url: str, cache_path: str, proxy_server: Optional[str] = None) -> str:
+    """
+    Keeps a local copy of a large remote artifact (offline bundle, prepared VHDX) in the cache,
+    updating it using block level deltas on re-runs.
+
+    Args:
+        url (str): The URL of the artifact.
+        cache_path (str): The cache directory.
+        proxy_server (str, optional): The proxy server to use.
+
+    Returns:
+        str: Path of the up-to-date local copy.
+
+    Raises:
+        StepError: If the artifact could not be fetched.
+    """
+    artifacts_path = os.path.join(cache_path, IMCV2_WSL_DEFAULT_ARTIFACTS_CACHE_PATH)
+    destination = os.path.join(artifacts_path, os.path.basename(urlparse(url).path))
+
+    if (wsl_runner_ensure_directory_exists([artifacts_path]) != 0 or
+            ws_runner_run_function(f"Syncing '{os.path.basename(destination)}'", wsl_runner_fetch_delta,
+                                   [url, destination, proxy_server]) != 0):
+        raise StepError(f"Failed to fetch '{url}'")
+
+    return destination
+
+
+def wsl_runner_load_resources_index(resources_path: str) -> dict:
+    """
+    Loads the validators (ETag, Last-Modified) and digests recorded for the local resources.
+
+    Args:
+        resources_path (str): Local directory holding the resources.
+
+    Returns:
+        dict: Metadata per resource URL, empty if none was recorded.
+    """
+    with suppress(OSError, ValueError):
+        with open(os.path.join(resources_path, IMCV2_WSL_RESOURCES_INDEX), "r") as file:
+            return json.load(file)
+    return {}
+
+
+def wsl_runner_save_resources_index(resources_path: str, index: dict):
+    """
+    Saves the validators and digests recorded for the local resources.
+
+    Args:
+        resources_path (str): Local directory holding the resources.
+        index (dict): Metadata per resource URL.
+    """
+    with suppress(OSError):
+        with open(os.path.join(resources_path, IMCV2_WSL_RESOURCES_INDEX), "w") as file:
+            json.dump(index, file, indent=2)
+
+
+def wsl_runner_keep_resource_version(resources_path: str, file_name: str, sha256: str,
+                                     keep: int = IMCV2_WSL_DEFAULT_RESOURCE_VERSIONS):
+    """
+    Keeps a copy of the current version of a resource, named by its digest, and prunes the oldest ones.
+
+    Args:
+        resources_path (str): Local directory holding the resources.
+        file_name (str): The resource file name.
+        sha256 (str): Digest of the current version.
+        keep (int, optional): Number of versions to keep per resource.
+    """
+    versions_path = os.path.join(resources_path, "versions")
+    version_file = os.path.join(versions_path, f"{file_name}.{sha256[:16]}")
+
+    with suppress(OSError):
+        os.makedirs(versions_path, exist_ok=True)
+        if not os.path.isfile(version_file):
+            shutil.copyfile(os.path.join(resources_path, file_name), version_file)
+        os.utime(version_file)
+
+        versions = sorted((entry for entry in os.scandir(versions_path)
+                           if entry.name.startswith(f"{file_name}.") and
+                           len(entry.name) == len(file_name) + 17),
+                          key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in versions[keep:]:
+            os.remove(entry.path)
+
+
+def wsl_runner_restore_resource_version(resources_path: str, file_name: str, sha256: str) -> int:
+    """
+    Restores a previously kept version of a resource, so switching between pinned versions needs no download.
+
+    Args:
+        resources_path (str): Local directory holding the resources.
+        file_name (str): The resource file name.
+        sha256 (str): Digest of the wanted version.
+
+    Returns:
+        int: 0 if the version was restored and verified, 1 otherwise.
+    """
+    version_file = os.path.join(resources_path, "versions", f"{file_name}.{sha256[:16]}")
+    if wsl_runner_file_sha256(version_file) != sha256:
+        return 1
+
+    with suppress(OSError):
+        shutil.copyfile(version_file, os.path.join(resources_path, file_name))
+        return 0
+    return 1
+
+
+def wsl_runner_download_resources(url, destination_path, proxy_server: str = None, timeout: int = 30,
+                                  versioned: bool = True) -> int:
+    """
+    Downloads a file from the specified URL, with optional proxy configuration, and verifies it
+    against its pinned digest when it has one.
+    The downloaded file is saved to the specified destination path. An already present file
+    matching its pinned digest is not downloaded again, a previously kept version matching it is restored,
+    and otherwise the request is conditional on the validators recorded for the present copy.
+
+    Args:
+        url (str): The URL of the resource to download.
+        destination_path (str): The path where the downloaded file should be saved.
+        proxy_server (str, optional): The proxy server to use for the download. Default is None.
+        timeout (int, optional): The time in seconds to wait before the request times out. Default is 30 seconds.
+        versioned (bool, optional): If False, the destination is not a resources directory, no validators and
+                                    versions are kept.
+
+    Returns:
+        int: 0 if the download succeeded and the content is valid, 1 otherwise.
+    """
+    # Parse the URL and get the file name from the URL path
+    file_name = os.path.basename(urlparse(url).path)
+    destination = os.path.join(destination_path, file_name)
+    expected_sha256 = wsl_runner_get_resource_sha256(file_name)
+
+    current_sha256 = wsl_runner_file_sha256(destination)
+    if expected_sha256 and current_sha256 == expected_sha256:
+        return 0
+
+    if not versioned:
+        return wsl_runner_fetch_verified(url, destination, proxy_server, expected_sha256, timeout)
+
+    if expected_sha256 and wsl_runner_restore_resource_version(destination_path, file_name, expected_sha256) == 0:
+        return 0
+
+    # Validators are only meaningful for the exact copy they were recorded with
+    metadata = dict(wsl_runner_load_resources_index(destination_path).get(url, {}))
+    if not current_sha256 or metadata.get("sha256") != current_sha256:
+        metadata = {}
+
+    if wsl_runner_fetch_verified(url, destination, proxy_server, expected_sha256, timeout, metadata=metadata) != 0:
+        return 1
+
+    with resources_index_lock:
+        index = wsl_runner_load_resources_index(destination_path)
+        index[url] = metadata
+        wsl_runner_save_resources_index(destination_path, index)
+    wsl_runner_keep_resource_version(destination_path, file_name, metadata["sha256"])
+    return 0
+
+
+def wsl_runner_get_resources_path(base_path: Optional[str] = None) -> str:
+    """
+    Returns the local directory holding the verified remote resources.
+
+    Args:
+        base_path (str, optional): The base local path, defaults to IMCV2_WSL_DEFAULT_BASE_PATH.
+
+    Returns:
+        str: The resources directory.
+    """
+    base_path = base_path if base_path else IMCV2_WSL_DEFAULT_BASE_PATH
+    return os.path.join(base_path, IMCV2_WSL_DEFAULT_CACHE_PATH, IMCV2_WSL_DEFAULT_RESOURCES_CACHE_PATH)
+
+
+def wsl_runner_stage_resource(resource_name: str, resources_path: str, proxy_server: Optional[str] = None) -> str:
+    """
+    Ensures a verified local copy of a remote resource exists and returns its path as seen from WSL,
+    so that steps running inside the instance copy it instead of downloading it.
+
+    Args:
+        resource_name (str): The name of the resource (e.g., "Packages list").
+        resources_path (str): Local directory holding the resources.
+        proxy_server (str, optional): The proxy server to use if the resource must be downloaded.
+
+    Returns:
+        str: The WSL path of the local copy.
+
+    Raises:
+        StepError: If the resource could not be downloaded or verified.
+    """
+    context = wsl_runner_get_context()
+    file_name, url = wsl_runner_get_resource_tuple_by_name(resource_name)
+    local_path = os.path.join(resources_path, file_name)
+
+    if context.plan is not None:
+        if not wsl_runner_is_resource_cached(url, resources_path):
+            wsl_runner_plan_download(resource_name, url, proxy_server)
+        return wsl_runner_win_to_wsl_path(local_path)
+
+    # Unpinned resources are refreshed by the pre-prerequisites step, reuse that copy
+    if wsl_runner_get_resource_sha256(file_name) is None and os.path.isfile(local_path):
+        return wsl_runner_win_to_wsl_path(local_path)
+
+    if (wsl_runner_ensure_directory_exists([resources_path]) != 0 or
+            wsl_runner_download_resources(url, resources_path, proxy_server) != 0):
+        raise StepError(f"Failed to download '{resource_name}'")
+
+    return wsl_runner_win_to_wsl_path(local_path)
+
+
+def wsl_runner_download_all_resources(resources_path: str, proxy_server: Optional[str] = None) -> int:
+    """
+    Downloads and verifies all remote and external resources into the local resources directory.
+    The downloads run concurrently over the pooled connections of the shared HTTP client.
+
+    Args:
+        resources_path (str): Local directory holding the resources.
+        proxy_server (str, optional): The proxy server to use for the downloads.
+
+    Returns:
+        int: 0 if all resources are available and valid, 1 otherwise.
+    """
+    if wsl_runner_ensure_directory_exists([resources_path]) != 0:
+        return 1
+
+    resources = remote_resources + external_resources
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(wsl_runner_get_context().bind(wsl_runner_download_resources),
+                                   wsl_runner_get_resource_tuple_by_name(resource["name"])[1],
+                                   resources_path, proxy_server) for resource in resources]
+
+        status = 0
+        for resource, future in zip(resources, futures):
+            if future.result() != 0:
+                print(f"Error: Failed to download '{resource['name']}'.")
+                status = 1
+
+    return status
+
+
+def wsl_runner_open_bundle(bundle_path: str) -> int:
+    """
+    Opens an offline bundle created by run_make_bundle_steps().
+    While it is open, every URL it contains is served from it by wsl_runner_open_source(), and its
+    guest artifacts replace the corresponding network installs.
+
+    Args:
+        bundle_path (str): Path to the bundle file.
+
+    Returns:
+        int: 0 on success, 1 otherwise.
+    """
+    context = wsl_runner_get_context()
+
+    try:
+        archive = zipfile.ZipFile(bundle_path, "r")
+        index = json.loads(archive.read(IMCV2_WSL_BUNDLE_INDEX).decode("utf-8"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        print(f"Error opening bundle '{bundle_path}': {e}")
+        return 1
+
+    context.active_bundle = {
+        "archive": archive,
+        "index": index,
+        "urls": {entry["url"]: entry for entry in index.get("files", [])},
+    }
+    return 0
+
+
+def wsl_runner_bundle_has(artifact: str) -> bool:
+    """
+    Checks whether the active offline bundle holds a guest artifact.
+
+    Args:
+        artifact (str): The artifact name ("pyenv", "apt_lists" or "debs").
+
+    Returns:
+        bool: True if a bundle is active and holds the artifact.
+    """
+    context = wsl_runner_get_context()
+    return context.active_bundle is not None and artifact in context.active_bundle["index"].get("guest", {})
+
+
+def wsl_runner_restore_from_bundle(instance_name: str, artifact: str, command: str,
+                                   username: Optional[str] = None) -> int:
+    """
+    Pipes a guest artifact (a tar stream) from the active offline bundle into a command running in the instance.
+
+    Args:
+        instance_name (str): The name of the WSL instance.
+        artifact (str): The artifact name ("pyenv", "apt_lists" or "debs").
+        command (str): Bash command reading the tar stream from its standard input.
+        username (str, optional): Run the command as this user instead of the instance default user.
+
+    Returns:
+        int: Exit code of the command, 1 if the artifact is not available.
+    """
+    context = wsl_runner_get_context()
+    if not wsl_runner_bundle_has(artifact):
+        return 1
+
+    cmd = ["wsl", "-d", instance_name] + (["--user", username] if username else []) + ["--", "bash", "-c", command]
+    with context.active_bundle["archive"].open(context.active_bundle["index"]["guest"][artifact]["member"]) as stream:
+        return wsl_runner_pipe_to_process(cmd, stream)
+
+
+def wsl_runner_bundle_add(archive: "zipfile.ZipFile", index: dict, url: str, source: Optional[str] = None,
+                          proxy_server: Optional[str] = None, expected_sha256: Optional[str] = None) -> int:
+    """
+    Adds a downloadable file to a bundle being created, hashing it while it is written.
+
+    Args:
+        archive (zipfile.ZipFile): The bundle archive open for writing.
+        index (dict): The bundle index being built.
+        url (str): The URL the file is served for when the bundle is used.
+        source (str, optional): Local path or URL to read the file from, defaults to 'url'.
+        proxy_server (str, optional): Proxy server to use when reading from a URL.
+        expected_sha256 (str, optional): Expected hex digest, not verified when None.
+
+    Returns:
+        int: 0 on success, 1 otherwise.
+    """
+    member = f"files/{len(index['files']):03d}_{os.path.basename(urlparse(url).path)}"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with wsl_runner_open_source(source if source else url, proxy_server, 30) as stream, \
+                archive.open(member, "w", force_zip64=True) as out:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except (OSError, ValueError) as e:
+        print(f"Error adding '{url}' to the bundle: {e}")
+        return 1
+
+    if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+        print(f"Checksum mismatch for '{url}'.")
+        return 1
+
+    index["files"].append({"url": url, "member": member, "sha256": digest.hexdigest(), "size": size})
+    return 0
+
+
+def wsl_runner_bundle_add_image(archive: "zipfile.ZipFile", index: dict, image_url: str,
+                                proxy_server: Optional[str] = None) -> int:
+    """
+    Adds the Ubuntu image to a bundle being created, verified against the digest published next to it.
+
+    Args:
+        archive (zipfile.ZipFile): The bundle archive open for writing.
+        index (dict): The bundle index being built.
+        image_url (str): URL of the Ubuntu image.
+        proxy_server (str, optional): Proxy server to use.
+
+    Returns:
+        int: 0 on success, 1 otherwise.
+    """
+    return wsl_runner_bundle_add(archive, index, image_url, None, proxy_server,
+                                 wsl_runner_get_image_sha256(image_url, proxy_server))
+
+
+def wsl_runner_bundle_add_guest(archive: "zipfile.ZipFile", index: dict, artifact: str, instance_name: str,
+                                command: str, username: Optional[str] = None) -> int:
+    """
+    Adds a guest artifact to a bundle being created, from the tar stream written by a command
+    running in an existing instance.
+
+    Args:
+        archive (zipfile.ZipFile): The bundle archive open for writing.
+        index (dict): The bundle index being built.
+        artifact (str): The artifact name ("pyenv", "apt_lists" or "debs").
+        instance_name (str): The name of the WSL instance to collect from.
+        command (str): Bash command writing a tar stream to its standard output.
+        username (str, optional): Run the command as this user instead of the instance default user.
+
+    Returns:
+        int: 0 on success, the command exit code otherwise.
+    """
+    member = f"guest/{artifact}.tar"
+    info = zipfile.ZipInfo(member, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    digest = hashlib.sha256()
+    size = 0
+
+    cmd = ["wsl", "-d", instance_name] + (["--user", username] if username else []) + ["--", "bash", "-c", command]
+    try:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc, \
+                archive.open(info, "w", force_zip64=True) as out:
+            for chunk in iter(lambda: proc.stdout.read(1024 * 1024), b""):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            status = proc.wait()
+    except OSError as e:
+        print(f"Error collecting '{artifact}' from '{instance_name}': {e}")
+        return 1
+
+    if status == 0:
+        index["guest"][artifact] = {"member": member, "sha256": digest.hexdigest(), "size": size}
+    return status
+
+
+def wsl_runner_open_source(source: str, proxy_server: Optional[str] = None, timeout: int = 30,
+                           headers: Optional[dict] = None):
+    """
+    Opens a local file or a remote URL as a binary stream.
+    URLs contained in the active offline bundle are served from it, and resources from their local copy when
+    one was given.
+
+    Args:
+        source (str): Local file path or URL.
+        proxy_server (str, optional): Proxy server to use for URLs, ignored when the Intel proxy was not detected.
+        timeout (int, optional): Socket timeout in seconds for URLs.
+        headers (dict, optional): Extra request headers for URLs (conditional or range requests).
+
+    Returns:
+        A readable binary file-like object, to be closed by the caller.
+    """
+    context = wsl_runner_get_context()
+    if os.path.isfile(source):
+        return open(source, "rb")
+
+    if context.active_bundle is not None and source in context.active_bundle["urls"]:
+        return context.active_bundle["archive"].open(context.active_bundle["urls"][source]["member"])
+
+    if context.local_resources_path and source.startswith(IMCV2_WSL_DEFAULT_RESOURCES_URL + "/"):
+        local_path = os.path.join(context.local_resources_path, source[len(IMCV2_WSL_DEFAULT_RESOURCES_URL) + 1:])
+        if os.path.isfile(local_path):
+            return open(local_path, "rb")
+
+    client = wsl_runner_get_http_client(proxy_server if proxy_server and context.intel_proxy_detected else None)
+    return client.open(source, headers, timeout)
+
+
+def wsl_runner_get_context() -> ProvisionContext:
+    """
+    Returns the provisioning context of the calling thread or task (see ProvisionContext.run()).
+
+    Returns:
+        ProvisionContext: The current context, the default one when none was set.
+    """
+    return current_context.get(default_context)
+
+
+def wsl_runner_get_async_engine() -> AsyncEngine:
+    """
+    Returns the shared asynchronous engine, starting its event loop thread on first use.
+
+    Returns:
+        AsyncEngine: The shared engine.
+    """
+    global async_engine
+
+    with async_engine_lock:
+        if async_engine is None:
+            async_engine = AsyncEngine()
 
-    except (FileNotFoundError, subprocess.CalledProcessError, Exception):
-        return 1
+    return async_engine
 
 
-def wsl_runner_spinner_thread():
+def wsl_runner_get_http_client(proxy_server: Optional[str] = None) -> HttpClient:
     """
-    Display a spinning progress indicator in the terminal.
+    Returns the shared HTTP client, creating it on first use or when the proxy configuration changes.
+
+    Args:
+        proxy_server (str, optional): The proxy all requests should go through, None for direct connections.
+
+    Returns:
+        HttpClient: The shared client.
     """
-    global spinner_active
-    global spinner_disabled
+    context = wsl_runner_get_context()
 
-    # Exit if the spinner is globally disabled
-    if spinner_disabled:
+    if context.http_client is None or context.http_client.proxy_server != proxy_server:
+        if context.http_client is not None:
+            context.http_client.close()
+        context.http_client = HttpClient(proxy_server)
+
+    return context.http_client
+
+
+def wsl_runner_print_http_timings():
+    """
+    Prints the per-request timings of the shared HTTP client, in milliseconds.
+    """
+    context = wsl_runner_get_context()
+    if context.http_client is None or not context.http_client.history:
         return
 
-    bright_blue = "\033[94m"
-    reset = "\033[0m"
-    spinner_cycle = itertools.cycle(["|", "/", "-", "\\"])
+    print(f"\n{'dns':>6} {'connect':>8} {'tunnel':>7} {'tls':>6} {'ttfb':>6} {'total':>7} {'KiB':>8}  url")
+    for url, timings in context.http_client.history:
+        print(f"{timings['dns'] * 1000:6.0f} {timings['connect'] * 1000:8.0f} {timings['tunnel'] * 1000:7.0f} "
+              f"{timings['tls'] * 1000:6.0f} {timings['ttfb'] * 1000:6.0f} {timings['total'] * 1000:7.0f} "
+              f"{timings['bytes'] / 1024:8.1f}  {url}{' (reused)' if timings['reused'] else ''}")
 
-    while spinner_active:
-        sys.stdout.write(f"{bright_blue}{next(spinner_cycle)}{reset}")  # Print the next character
-        sys.stdout.flush()
-        sys.stdout.write("\b")  # Erase the character
-        time.sleep(0.1)
 
+def wsl_runner_print_startup_profile():
+    """
+    Prints the startup milestones and the deferred imports, in milliseconds since startup.
+    """
+    context = wsl_runner_get_context()
+    print(f"\n{'at':>8} {'took':>7}  event")
+    events = [(at, duration, f"import {name}") for name, at, duration in import_timings]
+    events += [(at, 0.0, name) for name, at in startup_timings.items()]
+    for at, duration, event in sorted(events):
+        print(f"{at * 1000:8.1f} {duration * 1000:7.1f}  {event}")
+
+    previous = context.run_metrics.get("Startup", [])[:-1]
+    if previous:
+        print(f"\nFirst status line in previous runs: {', '.join(f'{value * 1000:.0f}' for value in previous)} ms")
 
-def wsl_runner_set_spinner(state):
+
+def wsl_runner_pipe_to_process(cmd: list, stream, decompressor=None, digest=None) -> int:
     """
-    Manage the progress spinner thread.
+    Pipes a binary stream into the standard input of a process.
+
     Args:
-        state (bool): True to start the spinner, False to stop.
+        cmd (list): The command and its arguments.
+        stream: Readable binary file-like object.
+        decompressor (optional): zlib / lzma decompressor applied to the data before it is written.
+        digest (optional): hashlib object updated with the data as read from the stream.
+
+    Returns:
+        int: Exit code of the process, 1 on any local error.
     """
-    global spinner_active
-    global spinner_disabled
+    try:
+        with subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) as proc:
+            try:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                    if digest is not None:
+                        digest.update(chunk)
+                    proc.stdin.write(decompressor.decompress(chunk) if decompressor else chunk)
 
-    # Exit if the spinner is globally disabled
-    if spinner_disabled:
-        return
+                if hasattr(decompressor, "flush"):
+                    proc.stdin.write(decompressor.flush())
+                proc.stdin.close()
 
-    if state:
-        spinner_active = True
-        progress_thread = threading.Thread(target=wsl_runner_spinner_thread, daemon=True)
-        progress_thread.start()
-        return progress_thread
-    else:
-        spinner_active = False
-        time.sleep(0.1)
-        sys.stdout.write("\b")
-        sys.stdout.flush()
+            except (OSError, zlib.error, lzma.LZMAError) as e:
+                print(f"Error streaming into '{cmd[0]}': {e}")
+                proc.kill()
+                return 1
 
+            return proc.wait()
 
-def wsl_runner_ensure_directory_exists(args: list) -> int:
+    except OSError as e:
+        print(f"Error executing '{cmd[0]}': {e}")
+        return 1
+
+
+def wsl_runner_update_apt_lists(instance_name: str, cache_path: Optional[str] = None,
+                                max_age: int = IMCV2_WSL_DEFAULT_APT_LISTS_MAX_AGE) -> int:
     """
-    Simulates a command that ensures directories exist.
+    Updates the APT package lists of an instance, seeding them from a host-side snapshot shared by all
+    instances and runs. Snapshots are keyed by the APT sources of the instance (mirrors and suites): a fresh one
+    is used as-is, an older one is refreshed by 'apt update', which then only fetches the index diffs.
+    Translations are never downloaded. Lists refreshed by 'apt update' are saved back as the new snapshot.
 
     Args:
-        args (list): List of directory paths to check and create if necessary.
+        instance_name (str): The name of the WSL instance.
+        cache_path (str, optional): The cache directory, the lists are updated without a snapshot when None.
+        max_age (int, optional): Age in seconds under which a snapshot is not refreshed.
 
     Returns:
-        int: 0 if all directories exist or are created successfully, 1 on failure.
+        int: 0 on success, the 'apt update' exit code otherwise.
     """
-    try:
-        for path in args:
-            if not os.path.exists(path):
-                os.makedirs(path)
-        return 0  # Success
-    except Exception as e:
-        print(f"Error ensuring directory exists: {e}", file=sys.stderr)
-        return 1  # Failure
+    wsl_args = ["-d", instance_name, "--user", "root", "--", "bash", "-c"]
+    config = "\n".join(IMCV2_WSL_APT_LISTS_CONFIG)
+    timeout, stall = wsl_runner_get_step_limits("Updating APT package lists", IMCV2_WSL_STEP_POLICY_NETWORK)
+
+    status, ext_status, sources = wsl_runner_exec_process("wsl", wsl_args + [
+        f"printf '%s\\n' '{config}' > {IMCV2_WSL_APT_LISTS_CONFIG_FILE} && "
+        f"{{ grep -hsE '^[[:space:]]*(deb|URIs:|Suites:|Components:)' /etc/apt/sources.list "
+        f"/etc/apt/sources.list.d/*; true; }}"], True, 0)
+    if status != 0:
+        return status
 
+    snapshot = None
+    if cache_path and sources:
+        key = hashlib.sha1("\n".join(sorted(line.strip() for line in sources)).encode("utf-8")).hexdigest()[:12]
+        snapshot = os.path.join(cache_path, IMCV2_WSL_DEFAULT_APT_LISTS_CACHE_PATH, f"{key}.tar")
+
+    if snapshot and os.path.isfile(snapshot):
+        with suppress(OSError), open(snapshot, "rb") as stream:
+            status = wsl_runner_pipe_to_process(
+                ["wsl"] + wsl_args + ["rm -rf /var/lib/apt/lists/* && tar -C /var/lib/apt/lists -xf -"], stream)
+            if status == 0 and time.time() - os.path.getmtime(snapshot) < max_age:
+                return 0
+
+    status, ext_status, log_lines = wsl_runner_exec_process("wsl", wsl_args + ["apt update -qq"], True,
+                                                            timeout, stall)
+    if status != 0 or not snapshot:
+        return status
 
-def wsl_runner_download_resources(url, destination_path, proxy_server: str = None, timeout: int = 30) -> int:
+    # The snapshot is only a cache, failing to save it is not an error
+    partial = snapshot + ".part"
+    with suppress(OSError):
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        with subprocess.Popen(["wsl"] + wsl_args + ["tar -C /var/lib/apt/lists --exclude=./lock "
+                                                    "--exclude=./partial -cf - ."],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc, open(partial, "wb") as out:
+            for chunk in iter(lambda: proc.stdout.read(1024 * 1024), b""):
+                out.write(chunk)
+        if proc.returncode == 0:
+            os.replace(partial, snapshot)
+    with suppress(OSError):
+        os.remove(partial)
+
+    return 0
+
+
+def wsl_runner_stream_import(instance_name: str, install_location: str, source: str,
+                             proxy_server: Optional[str] = None, vhd: bool = False, timeout: int = 30,
+                             expected_sha256: Optional[str] = None, retries: int = 1) -> int:
     """
-    Downloads a file from the specified URL using curl, with optional proxy configuration.
-    The downloaded file is saved to the specified destination path.
+    Imports a Linux image as a new WSL instance without staging it on disk.
+    The image is read from a URL or a local file, hashed and decompressed on the fly and piped into 'wsl --import'.
+    If the streamed bytes do not match the expected digest, the instance is unregistered and the import is
+    retried right away.
 
     Args:
-        url (str): The URL of the resource to download.
-        destination_path (str): The path where the downloaded file should be saved.
-        proxy_server (str, optional): The proxy server to use for the download. Default is None.
-        timeout (int, optional): The time in seconds to wait before the request times out. Default is 30 seconds.
+        instance_name (str): Name of the WSL instance to create.
+        install_location (str): Directory where the instance virtual disk will be stored.
+        source (str): URL or local path of the image (.tar, .tar.gz, .tar.xz), or a local ext4 VHDX when 'vhd' is set.
+        proxy_server (str, optional): Proxy server to use when the source is a URL.
+        vhd (bool, optional): If True, import the source as a prepared VHDX, skipping tar extraction altogether.
+        timeout (int, optional): Socket timeout in seconds when the source is a URL.
+        expected_sha256 (str, optional): Expected hex digest of the source, not verified when None.
+        retries (int, optional): Number of additional attempts after a digest mismatch.
 
     Returns:
-        int: 0 if the download succeeded (status code 200), 1 otherwise.
+        int: Exit code of 'wsl --import', 1 on any local error or digest mismatch.
     """
-    # Parse the URL and get the file name from the URL path
-    parsed_url = urlparse(url)
-    destination = os.path.join(destination_path, os.path.basename(parsed_url.path))
+    args = ["--import", instance_name, install_location]
 
-    global intel_proxy_detected
+    if vhd:
+        status, ext_status, log_lines = wsl_runner_exec_process("wsl", args + [source, "--vhd"], True, 0)
+        return status
 
-    # Define curl arguments based on proxy availability
-    if not proxy_server or intel_proxy_detected is False:
-        args = [
-            "-s", "-S", "-w", "%{http_code}",  # silent mode, show errors, output HTTP status code
-            "--output", destination,  # Specify the output file destination
-            url  # URL of the resource to download
-        ]
-    else:
-        args = [
-            "-s", "-S", "-w", "%{http_code}",  # silent mode, show errors, output HTTP status code
-            "--proxy", proxy_server,  # Use specified proxy server
-            "--output", destination,  # Specify the output file destination
-            url  # URL of the resource to download
-        ]
+    image_name = urlparse(source).path.lower() if not os.path.isfile(source) else source.lower()
 
-    # Execute the curl command and capture the output
-    result = wsl_runner_exec_process("curl", args, hidden=True, timeout=timeout)
-    status, http_status, log_lines = result  # Unpack the tuple
+    for attempt in range(retries + 1):
+        # Decompress here so 'wsl --import' always receives a plain tar stream
+        if image_name.endswith((".gz", ".tgz")):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif image_name.endswith(".xz"):
+            decompressor = lzma.LZMADecompressor()
+        else:
+            decompressor = None
 
-    # Check if the download was successful
-    if status is not None and http_status is not None and status == 0 and http_status == 200:
-        return 0
+        try:
+            stream = wsl_runner_open_source(source, proxy_server, timeout)
+        except (OSError, ValueError) as e:
+            print(f"Error opening '{source}': {e}")
+            return 1
+
+        digest = hashlib.sha256()
+        with stream:
+            status = wsl_runner_pipe_to_process(["wsl"] + args + ["-"], stream, decompressor, digest)
+
+        if status != 0 or not expected_sha256 or digest.hexdigest() == expected_sha256.lower():
+            return status
+
+        # The instance was created from corrupted bytes, drop it before trying again
+        print(f"Checksum mismatch for '{source}'.")
+        wsl_runner_exec_process("wsl", ["--unregister", instance_name], True, 0)
 
-    # If any check fails, return False
     return 1
 
 
@@ -904,72 +3586,33 @@ def wsl_runner_console_decoder(input_string: str) -> list[str]:
         return []
 
 
-def wsl_runner_exec_process(process: str, args: list, hidden: bool = True, timeout: int = 30) -> tuple:
+def wsl_runner_exec_process(process: str, args: list, hidden: bool = True, timeout: float = 30,
+                            stall: float = 0) -> tuple:
     """
     Executes an external process with the given arguments and streams its output in real-time.
+    Standard output and standard error are read concurrently, so the process is never blocked
+    on a full pipe and the limits below are enforced while output is being streamed.
+    The process runs on the asynchronous engine (see AsyncEngine), in its resource class.
 
     Args:
         process (str): The executable or command to run.
         args (list): List of arguments for the command.
         hidden (bool): If True, suppresses the output.
-        timeout (int): Time in seconds to wait for the command to complete.
+        timeout (float): Time in seconds to wait for the command to complete, 0 for no limit.
+        stall (float): Time in seconds the command may run without producing any output, 0 for no limit.
 
     Returns:
         tuple:
-            - int: The exit status code of the process.
-            - int: An extended status code (e.g., HTTP status for `curl`, or 0 otherwise).
+            - int: The exit status code of the process, 124 on timeout or stall.
+            - int: An extended status code, currently always 0.
             - list: Command log
 
     Raises:
         ValueError: If the process or arguments are invalid.
     """
-    cmd = [process] + args
-    log_lines = []
-    ext_status = 0
-
-    def append_to_log(main_list: list, new_items: Optional[list]):
-        """Appends items to the main list, ensuring no nested lists."""
-        if new_items:
-            main_list.extend(new_items)  # Flatten the list by extending
-
-    try:
-        with subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                bufsize=4096,
-                encoding="cp65001",  # Force UTF-8
-        ) as proc:
-            try:
-                # Helper function to process a stream (stdout/stderr)
-                def process_stream(stream, lines, hide):
-                    for line in stream:
-                        decoded_lines = wsl_runner_console_decoder(line)
-                        append_to_log(lines, decoded_lines)  # Correctly append decoded lines
-                        if decoded_lines and not hide:
-                            wsl_runner_print_log(decoded_lines)
-
-                # Process both stdout and stderr
-                process_stream(proc.stdout, log_lines, hidden)
-                process_stream(proc.stderr, log_lines, hidden)
-
-                # Extract HTTP status for `curl`
-                if process == "curl" and log_lines:
-                    try:
-                        ext_status = int(log_lines[0])
-                    except ValueError:
-                        ext_status = 0  # Gracefully handle non-integer values
-
-                # Wait for process completion
-                proc_exit_code = proc.wait(timeout=timeout if timeout else None)
-                return proc_exit_code, ext_status, log_lines
-
-            except subprocess.TimeoutExpired:
-                proc.kill()
-                return 124, ext_status, log_lines  # Timeout-specific exit code
-
-    except (FileNotFoundError, ValueError, Exception):
-        return 1, 0, []
+    engine = wsl_runner_get_async_engine()
+    return engine.run(engine.exec_process(process, args, hidden, timeout, stall,
+                                          IMCV2_WSL_PROCESS_RESOURCES.get(process)))
 
 
 def wsl_runner_print_status(
@@ -987,10 +3630,16 @@ def wsl_runner_print_status(
         new_line (bool): If True, prints a new line after the status; otherwise overwrites the same line.
         ret_val (InfoType or int): The status code to display. 0 = OK, 124 = TIMEOUT, others = ERROR.
     """
+    context = wsl_runner_get_context()
 
-    if text_type not in TextType:
+    if text_type not in TextType or context.plan is not None:
         return
 
+    # Time to the first status line, tracked across runs
+    if "First status line" not in startup_timings:
+        startup_timings["First status line"] = time.perf_counter() - startup_time
+        wsl_runner_record_run_metric("Startup", startup_timings["First status line"])
+
     # ANSI color codes
     green = "\033[32m"
     yellow = "\033[33m"
@@ -999,7 +3648,6 @@ def wsl_runner_print_status(
     reset = "\033[0m"
 
     max_length = 60
-    global spinner_disabled
 
     if isinstance(ret_val, InfoType):
         ret_val = int(ret_val)
@@ -1010,12 +3658,12 @@ def wsl_runner_print_status(
         dots_count = max_length - len(description) - 2
         dots = "." * dots_count
         # Print the description with one space before and after the dots
-        if not spinner_disabled:
-            sys.stdout.write(f"\r\033[K{description} {dots} ")
-            sys.stdout.flush()
+        if not context.spinner_disabled:
+            context.output.write(f"\r\033[K{description} {dots} ")
+            context.output.flush()
         else:
             # No spinner means we're in a debug session
-            print(f"{description}\n")
+            print(f"{description}\n", file=context.output)
 
         # Show spinner
         if text_type is not TextType.BOTH:
@@ -1025,64 +3673,545 @@ def wsl_runner_print_status(
     if text_type in {TextType.BOTH, TextType.SUFFIX}:
 
         # Print the description with one space before and after the dots
-        if not spinner_disabled:
+        if not context.spinner_disabled:
             # Stop spinner
             wsl_runner_set_spinner(False)
 
-            if ret_val == InfoType.OK:
-                pass
-            elif ret_val == InfoType.DONE:  # Special code for step completed.
-                sys.stdout.write(f"{green} OK{reset}")
-            elif ret_val == InfoType.WARNING:  # Special code for step completed.
-                sys.stdout.write(f"{yellow} Warning{reset}")
-            else:
-                if ret_val == 124:
-                    sys.stdout.write(f"{bright_blue} Timeout{reset}")
-                else:
-                    ret_val = (ret_val - 2 ** 32) if ret_val >= 2 ** 31 else ret_val
-                    sys.stdout.write(f"{red} Error ({ret_val}){reset}")
+            if ret_val == InfoType.OK:
+                pass
+            elif ret_val == InfoType.DONE:  # Special code for step completed.
+                context.output.write(f"{green} OK{reset}")
+            elif ret_val == InfoType.WARNING:  # Special code for step completed.
+                context.output.write(f"{yellow} Warning{reset}")
+            else:
+                if ret_val == 124:
+                    context.output.write(f"{bright_blue} Timeout{reset}")
+                else:
+                    ret_val = (ret_val - 2 ** 32) if ret_val >= 2 ** 31 else ret_val
+                    context.output.write(f"{red} Error ({ret_val}){reset}")
+
+            context.output.flush()
+            time.sleep(0.3)  # Small delay for visual clarity
+
+    # Handle newline printing or overwriting the same line
+    if new_line:
+        context.output.write("\n")
+        context.output.flush()
+
+
+def ws_runner_run_function(description: str, process, args: list,
+                           ignore_errors: bool = False, new_line: bool = False):
+    """
+    Execute a process or a Python function and display a description with dots and OK/ERROR status.
+
+    Args:
+        description (str): Description of the step.
+        process (str or callable): The name of the function to run or the executable/command.
+        args (list): List of arguments for the function or command.
+        ignore_errors (bool): Ignore step error and return OK.
+        new_line (bool): If True, prints OK/ERROR on a new line; if False, overwrites the previous line.
+    """
+    # Prepare the dots
+
+    wsl_runner_print_status(TextType.PREFIX, description, new_line)
+
+    try:
+        if callable(process):  # Check if a process is a callable Python function
+            engine = wsl_runner_get_async_engine()
+            status = engine.run(engine.run_function(process, args))  # Call the Python function with arguments
+        else:
+            raise ValueError(f"Invalid process type: {type(process)}. Must be callable or a string.")
+    except Exception as general_error:
+        # If any exception is raised during the Python function or external command execution
+        print(f"Error executing {description}: {general_error}")
+        status = 1  # Indicate failure
+
+    # Ignore errors if specified
+    if ignore_errors:
+        status = 0
+
+    wsl_runner_print_status(TextType.SUFFIX, None, new_line, status)
+    return status
+
+
+def wsl_runner_load_step_timings(cache_path: str):
+    """
+    Loads the recorded durations of previously successful steps, used to tighten their time limits,
+    along with the measurements of previous runs.
+
+    Args:
+        cache_path (str): Directory holding the step timings and run metrics files.
+    """
+    context = wsl_runner_get_context()
+
+    context.step_timings_file = os.path.join(cache_path, "step_timings.json")
+    with suppress(OSError, ValueError):
+        with open(context.step_timings_file, "r") as file:
+            context.step_timings = json.load(file)
+
+    context.run_metrics_file = os.path.join(cache_path, "run_metrics.json")
+    with suppress(OSError, ValueError):
+        with open(context.run_metrics_file, "r") as file:
+            context.run_metrics = json.load(file)
+
+
+def wsl_runner_record_step_timing(description: str, duration: float):
+    """
+    Records the duration of a successful step, keeping only the most recent ones.
+
+    Args:
+        description (str): Description of the step.
+        duration (float): The step duration in seconds.
+    """
+    context = wsl_runner_get_context()
+    durations = context.step_timings.setdefault(description, [])
+    durations.append(round(duration, 2))
+    del durations[:-IMCV2_WSL_DEFAULT_STEP_HISTORY]
+
+    if context.step_timings_file:
+        with suppress(OSError):
+            os.makedirs(os.path.dirname(context.step_timings_file), exist_ok=True)
+            with open(context.step_timings_file, "w") as file:
+                json.dump(context.step_timings, file, indent=2)
+
+
+def wsl_runner_record_run_metric(name: str, value: float):
+    """
+    Records a measurement taken once per run (not a step duration), keeping only the most recent ones.
+
+    Args:
+        name (str): Name of the measurement.
+        value (float): The measured value.
+    """
+    context = wsl_runner_get_context()
+    values = context.run_metrics.setdefault(name, [])
+    values.append(round(value, 2))
+    del values[:-IMCV2_WSL_DEFAULT_STEP_HISTORY]
+
+    if context.run_metrics_file:
+        with suppress(OSError):
+            os.makedirs(os.path.dirname(context.run_metrics_file), exist_ok=True)
+            with open(context.run_metrics_file, "w") as file:
+                json.dump(context.run_metrics, file, indent=2)
+
+
+def wsl_runner_get_step_limits(description: str, policy: StepPolicy, use_history: bool = True) -> tuple:
+    """
+    Computes the effective time limits of a step.
+    Policy limits are scaled up for slower machines (see wsl_runner_get_machine_score()). When the step has
+    succeeded before, its wall-clock limit is tightened to a few times the longest recorded duration.
+
+    Args:
+        description (str): Description of the step.
+        policy (StepPolicy): The step policy.
+        use_history (bool): If False, the recorded durations are ignored (e.g. when retrying).
+
+    Returns:
+        tuple: (timeout, stall) in seconds, 0 meaning no limit.
+    """
+    context = wsl_runner_get_context()
+    factor = {0: 3.0, 1: 2.0, 2: 1.5}.get(wsl_runner_get_machine_score(), 1.0)
+    timeout = policy.timeout * factor
+    stall = policy.stall * factor
+
+    durations = context.step_timings.get(description)
+    if use_history and durations and timeout:
+        timeout = min(timeout, max(IMCV2_WSL_DEFAULT_MIN_STEP_TIMEOUT, 4 * max(durations)))
+
+    return timeout, stall
+
+
+def wsl_runner_get_step_hash(process, args: list) -> str:
+    """
+    Computes a content hash of a step definition, its command and arguments.
+    Python callables are described by their qualified name and bytecode, so editing them changes the hash.
+
+    Args:
+        process (str or callable): The executable name or the Python callable.
+        args (list): The step arguments.
+
+    Returns:
+        str: Hex digest of the definition.
+    """
+
+    def describe(value):
+        if callable(value):
+            code = getattr(value, "__code__", None)
+            return [getattr(value, "__qualname__", type(value).__name__), code.co_code.hex() if code else None]
+        if isinstance(value, (list, tuple)):
+            return [describe(item) for item in value]
+        if isinstance(value, dict):
+            return {str(key): describe(item) for key, item in value.items()}
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return type(value).__name__
+
+    return hashlib.sha1(json.dumps(describe([process, args]), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def wsl_runner_open_journal(journal_path: str, resume: bool = False, keep_groups: Optional[list] = None):
+    """
+    Opens the journal recording each completed sub-step (top-level step, description and definition hash)
+    as one JSON line.
+
+    When resuming, the recorded sub-steps are replayed in order: as long as they match the current steps they
+    are skipped, and the journal continues after the last one. The first sub-step that was not recorded,
+    or whose definition changed, runs again along with all of the following ones.
+
+    Args:
+        journal_path (str): The journal file.
+        resume (bool): If True, completed sub-steps are skipped, otherwise the journal starts over.
+        keep_groups (list, optional): Top-level steps whose records are kept when not resuming (skipped by '-t').
+    """
+    context = wsl_runner_get_context()
+
+    entries = []
+    with suppress(OSError):
+        with open(journal_path, "r", encoding="utf-8") as file:
+            for line in file:
+                with suppress(ValueError):
+                    entries.append(json.loads(line))
+
+    if not resume:
+        entries = [entry for entry in entries if entry.get("group") in (keep_groups or [])]
+
+    context.journal = {"path": journal_path, "entries": entries, "position": 0, "replaying": resume, "group": None}
+    if not resume:
+        wsl_runner_truncate_journal(len(entries))
+
+
+def wsl_runner_truncate_journal(length: int):
+    """
+    Keeps only the first records of the journal.
+
+    Args:
+        length (int): Number of records to keep.
+    """
+    context = wsl_runner_get_context()
+    del context.journal["entries"][length:]
+    if context.plan is not None:
+        return
+
+    with suppress(OSError):
+        os.makedirs(os.path.dirname(context.journal["path"]), exist_ok=True)
+        with open(context.journal["path"], "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in context.journal["entries"])
+
+
+def wsl_runner_journal_peek(description: str, step_hash: str) -> bool:
+    """
+    Tells whether the next sub-step is going to be skipped by the replay, without advancing it.
+
+    Args:
+        description (str): Description of the sub-step.
+        step_hash (str): Hash of its definition, see wsl_runner_get_step_hash().
+
+    Returns:
+        bool: True if the sub-step would be skipped.
+    """
+    context = wsl_runner_get_context()
+    if context.journal is None or not context.journal["replaying"]:
+        return False
+
+    position = context.journal["position"]
+    entries = context.journal["entries"]
+    return position < len(entries) and entries[position] == {"group": context.journal["group"],
+                                                              "step": description, "hash": step_hash}
+
+
+def wsl_runner_journal_skip(description: str, step_hash: str) -> bool:
+    """
+    Tells whether a sub-step completed in the run being resumed, ending the replay at the first one that did not.
+
+    Args:
+        description (str): Description of the sub-step.
+        step_hash (str): Hash of its definition, see wsl_runner_get_step_hash().
+
+    Returns:
+        bool: True if the sub-step is skipped.
+    """
+    context = wsl_runner_get_context()
+    if context.journal is None or not context.journal["replaying"]:
+        return False
+
+    if wsl_runner_journal_peek(description, step_hash):
+        context.journal["position"] += 1
+        return True
+
+    position = context.journal["position"]
+    entries = context.journal["entries"]
+
+    # Everything recorded after this point may depend on this step and is done again
+    context.journal["replaying"] = False
+    if position:
+        wsl_runner_print_status(TextType.BOTH, f"Resuming after '{entries[position - 1]['step']}'", True,
+                                InfoType.DONE)
+    wsl_runner_truncate_journal(position)
+    return False
+
+
+def wsl_runner_journal_record(description: str, step_hash: str):
+    """
+    Records a completed sub-step in the journal.
+
+    Args:
+        description (str): Description of the sub-step.
+        step_hash (str): Hash of its definition, see wsl_runner_get_step_hash().
+    """
+    context = wsl_runner_get_context()
+    if context.journal is None:
+        return
+
+    entry = {"group": context.journal["group"], "step": description, "hash": step_hash}
+    context.journal["entries"].append(entry)
+    with suppress(OSError):
+        with open(context.journal["path"], "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+def wsl_runner_predict_step_duration(description: str, policy: StepPolicy) -> tuple:
+    """
+    Predicts the duration of a step from its recorded durations, or from its policy's nominal duration
+    scaled by the machine class when it never ran on this machine.
+    Package installations are scaled by the size of the packages list compared to previous runs.
+
+    Args:
+        description (str): Description of the step.
+        policy (StepPolicy): The step policy.
+
+    Returns:
+        tuple: (seconds, measured), measured being False for nominal estimates.
+    """
+    context = wsl_runner_get_context()
+    durations = sorted(context.step_timings.get(description, []))
+    if not durations:
+        factor = {0: 3.0, 1: 2.0, 2: 1.5}.get(wsl_runner_get_machine_score(), 1.0)
+        return policy.nominal * factor, False
+
+    seconds = durations[len(durations) // 2]
+    counts = sorted(context.run_metrics.get("Packages", []))
+    if policy is IMCV2_WSL_STEP_POLICY_INSTALL and counts and counts[len(counts) // 2] and context.plan.get("packages"):
+        seconds *= context.plan["packages"] / counts[len(counts) // 2]
+
+    return seconds, True
+
+
+def wsl_runner_get_remote_size(url: str, proxy_server: Optional[str] = None) -> int:
+    """
+    Returns the size of a remote file from the headers of its response, without downloading it.
+
+    Args:
+        url (str): The URL.
+        proxy_server (str, optional): The proxy server to use.
+
+    Returns:
+        int: Size in bytes, 0 when served by the offline bundle, -1 when unknown.
+    """
+    context = wsl_runner_get_context()
+    if context.active_bundle is not None and url in context.active_bundle["urls"]:
+        return 0
+
+    with suppress(Exception):
+        with wsl_runner_open_source(url, proxy_server, 10) as response:
+            return int(response.headers.get("Content-Length", -1))
+    return -1
+
+
+def wsl_runner_plan_download(name: str, url: str, proxy_server: Optional[str] = None):
+    """
+    Adds a host-side download to the execution plan, once per URL.
+
+    Args:
+        name (str): What is downloaded.
+        url (str): The URL.
+        proxy_server (str, optional): The proxy server to use for the size query.
+    """
+    context = wsl_runner_get_context()
+    if url not in context.plan["downloads"]:
+        context.plan["downloads"][url] = {"name": name, "bytes": wsl_runner_get_remote_size(url, proxy_server)}
+
+
+def wsl_runner_is_resource_cached(url: str, destination_path: str) -> bool:
+    """
+    Tells whether a resource would be used without downloading it.
+
+    Args:
+        url (str): The resource URL.
+        destination_path (str): Directory receiving the resource.
 
-            sys.stdout.flush()
-            time.sleep(0.3)  # Small delay for visual clarity
+    Returns:
+        bool: True for a valid local copy, a copy in the offline bundle or in the local resources directory.
+    """
+    context = wsl_runner_get_context()
+    file_name = os.path.basename(urlparse(url).path)
+    expected_sha256 = wsl_runner_get_resource_sha256(file_name)
+    local_path = os.path.join(destination_path, file_name)
 
-    # Handle newline printing or overwriting the same line
-    if new_line:
-        sys.stdout.write("\n")
-        sys.stdout.flush()
+    if context.active_bundle is not None and url in context.active_bundle["urls"]:
+        return True
+    if context.local_resources_path and os.path.isfile(os.path.join(context.local_resources_path, file_name)):
+        return True
+    if expected_sha256 is None:
+        return os.path.isfile(local_path)
 
+    return expected_sha256 in (wsl_runner_file_sha256(local_path), wsl_runner_file_sha256(
+        os.path.join(destination_path, "versions", f"{file_name}.{expected_sha256[:16]}")))
 
-def ws_runner_run_function(description: str, process, args: list,
-                           ignore_errors: bool = False, new_line: bool = False):
+
+def wsl_runner_plan_step(description: str, process, args: list, policy: StepPolicy, skipped: bool = False):
     """
-    Execute a process or a Python function and display a description with dots and OK/ERROR status.
+    Adds a step to the execution plan instead of running it: what it would do, the downloads it needs
+    and its predicted duration.
 
     Args:
         description (str): Description of the step.
-        process (str or callable): The name of the function to run or the executable/command.
-        args (list): List of arguments for the function or command.
-        ignore_errors (bool): Ignore step error and return OK.
-        new_line (bool): If True, prints OK/ERROR on a new line; if False, overwrites the previous line.
+        process (str or callable): The executable name or the Python callable.
+        args (list): The step arguments.
+        policy (StepPolicy): The step policy.
+        skipped (bool): The step completed in the run being resumed.
     """
-    # Prepare the dots
+    context = wsl_runner_get_context()
+    action = "run"
+    proxy_server = context.plan.get("proxy_server")
+
+    if skipped:
+        action = "done"
+    elif process == "wsl" and args and args[0] in ("--terminate", "--shutdown"):
+        action = "restart"
+    elif process is wsl_runner_download_all_resources:
+        action = "cached"
+        for resource in remote_resources + external_resources:
+            url = wsl_runner_get_resource_tuple_by_name(resource["name"])[1]
+            if not wsl_runner_is_resource_cached(url, args[0]):
+                wsl_runner_plan_download(resource["name"], url, proxy_server)
+                action = "download"
+    elif process is wsl_runner_download_resources:
+        action = "cached"
+        if not wsl_runner_is_resource_cached(args[0], args[1]):
+            wsl_runner_plan_download(os.path.basename(urlparse(args[0]).path), args[0], proxy_server)
+            action = "download"
+    elif process is wsl_runner_stream_import:
+        action = "import"
+        if not os.path.isfile(args[2]):
+            wsl_runner_plan_download("Linux image", args[2], proxy_server)
+            action = "download"
+    elif process is wsl_runner_restore_from_bundle:
+        action = "bundle"
+
+    seconds, measured = wsl_runner_predict_step_duration(description, policy) if not skipped else (0.0, True)
+    context.plan["steps"].append({"group": context.journal["group"] if context.journal else None,
+                                  "step": description, "action": action, "seconds": round(seconds, 1),
+                                  "measured": measured})
+
+
+def wsl_runner_print_plan(output_file: Optional[str] = None):
+    """
+    Prints the execution plan, and optionally saves it as JSON to compare plans between versions.
 
-    wsl_runner_print_status(TextType.PREFIX, description, new_line)
+    Args:
+        output_file (str, optional): Path of the JSON file to write.
+    """
+    context = wsl_runner_get_context()
+    steps = context.plan["steps"]
+    downloads = context.plan["downloads"]
+    known = [download["bytes"] for download in downloads.values() if download["bytes"] > 0]
+    unknown = sum(1 for download in downloads.values() if download["bytes"] < 0)
+    total = sum(step["seconds"] for step in steps)
+
+    print(f"\nExecution plan (machine: {wsl_runner_classify_machine()})\n")
+    group = None
+    for step in steps:
+        if step["group"] != group:
+            group = step["group"]
+            print(f"{group}")
+        minutes, seconds = divmod(int(step["seconds"]), 60)
+        print(f"    {step['step'][:56]:<56} {step['action']:<9} {minutes:3d}:{seconds:02d}"
+              f"{'' if step['measured'] else ' ~'}")
+
+    print(f"\nSteps: {sum(1 for step in steps if step['action'] != 'done')} to run, "
+          f"{sum(1 for step in steps if step['action'] == 'done')} already done, "
+          f"{sum(1 for step in steps if step['action'] in ('cached', 'bundle'))} served locally")
+    print(f"Restarts: {sum(1 for step in steps if step['action'] == 'restart')}")
+    print(f"Downloads: {len(downloads)} files, {sum(known) / 1024 ** 2:.1f} MB"
+          f"{f' ({unknown} of unknown size)' if unknown else ''}, "
+          f"plus {context.plan.get('package_bytes', 0) / 1024 ** 2:.1f} MB of packages inside the instance")
+    for change in context.plan.get("host_changes", []):
+        print(f"Host change: {change}")
+    if context.plan.get("mirror"):
+        benchmark = context.plan["mirror"]["benchmark"]
+        print(f"Ubuntu mirror: {context.plan['mirror']['url']}"
+              f"{' (no previous choice, the mirrors are benchmarked first)' if benchmark else ''}")
+    if context.plan.get("space"):
+        print(f"Disk space: {context.plan['space']['needed'] / 1024 ** 3:.1f} GB needed, "
+              f"{context.plan['space']['free'] / 1024 ** 3:.1f} GB free")
+    nominal = sum(1 for step in steps if not step["measured"])
+    print(f"Estimated duration: {int(total) // 3600}:{int(total) % 3600 // 60:02d}:{int(total) % 60:02d}"
+          f"{f' ({nominal} steps marked ~ have no recorded timings, estimated from the machine class)' if nominal else ''}")
+
+    if output_file:
+        with suppress(OSError):
+            with open(output_file, "w") as file:
+                json.dump({key: value for key, value in dict(context.plan, total_seconds=round(total, 1),
+                                                             machine=wsl_runner_get_machine_score()).items()
+                           if key != "proxy_server"}, file, indent=2)
+
+
+def wsl_runner_run_steps(steps_commands: list, hidden: bool = True, new_line: bool = False,
+                         policy: Optional[StepPolicy] = None):
+    """
+    Executes a list of steps in order, applying each step's policy.
 
-    try:
-        if callable(process):  # Check if a process is a callable Python function
-            status = process(*args)  # Call the Python function with arguments
-        else:
-            raise ValueError(f"Invalid process type: {type(process)}. Must be callable or a string.")
-    except Exception as general_error:
-        # If any exception is raised during the Python function or external command execution
-        print(f"Error executing {description}: {general_error}")
-        status = 1  # Indicate failure
+    Each step is a tuple of (description, process, args[, ignore_errors[, policy]]), where process is either
+    an executable name or a Python callable. Retry-safe steps are retried with back-off after a failure or a
+    timeout, processes are stopped when they exceed their time limit or stop producing output.
+    Completed steps are recorded in the journal, and skipped when resuming (see wsl_runner_open_journal()).
+    While planning, the steps are only added to the execution plan (see wsl_runner_plan_step()).
 
-    # Ignore errors if specified
-    if ignore_errors:
-        status = 0
+    Args:
+        steps_commands (list): The steps to execute.
+        hidden (bool): If True, suppresses command output during execution.
+        new_line (bool): If True, displays status messages on a new line.
+        policy (StepPolicy, optional): Policy for steps not specifying one, defaults to IMCV2_WSL_STEP_POLICY_DEFAULT.
 
-    wsl_runner_print_status(TextType.SUFFIX, None, new_line, status)
-    return status
+    Raises:
+        StepError: If a step fails after all of its attempts.
+    """
+    context = wsl_runner_get_context()
+    default_policy = policy if policy else IMCV2_WSL_STEP_POLICY_DEFAULT
+
+    for description, process, args, *options in steps_commands:
+        ignore_errors = options[0] if options else False
+        step_policy = options[1] if len(options) > 1 and options[1] else default_policy
+        attempts = 1 + (step_policy.retries if step_policy.retry_safe else 0)
+
+        step_hash = wsl_runner_get_step_hash(process, args)
+        skipped = wsl_runner_journal_skip(description, step_hash)
+        if context.plan is not None:
+            wsl_runner_plan_step(description, process, args, step_policy, skipped)
+            continue
+        if skipped:
+            continue
+
+        status = 1
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(step_policy.backoff * 2 ** (attempt - 1))
+            text = description if not attempt else f"{description} (retry {attempt})"
+
+            start = time.monotonic()
+            if callable(process):
+                status = ws_runner_run_function(text, process, args, ignore_errors=ignore_errors, new_line=new_line)
+            else:
+                timeout, stall = wsl_runner_get_step_limits(description, step_policy, use_history=not attempt)
+                status = wsl_runner_run_process(text, process, args, hidden=hidden, timeout=timeout,
+                                                ignore_errors=ignore_errors, new_line=new_line, stall=stall)
+            if status == 0:
+                wsl_runner_record_step_timing(description, time.monotonic() - start)
+                break
+
+        if status != 0:
+            raise StepError(f"Failed during step: {description}")
+        wsl_runner_journal_record(description, step_hash)
 
 
 def wsl_runner_set_console_code_page(val: int) -> int:
@@ -1123,8 +4252,8 @@ def wsl_runner_get_console_code_page() -> tuple[int, int]:
     return 0, 0  # Failure
 
 
-def wsl_runner_run_process(description: str, process: str, args: list, hidden: bool = True, timeout: int = 30,
-                           ignore_errors: bool = False, new_line: bool = False):
+def wsl_runner_run_process(description: str, process: str, args: list, hidden: bool = True, timeout: float = 30,
+                           ignore_errors: bool = False, new_line: bool = False, stall: float = 0):
     """
     Run a process and display a description with dots and OK/ERROR status.
 
@@ -1133,24 +4262,21 @@ def wsl_runner_run_process(description: str, process: str, args: list, hidden: b
         process (str): The executable or command to run.
         args (list): List of arguments for the command.
         hidden (bool): If True, suppress output.
-        timeout (int): Time in seconds to wait for the command to complete.
+        timeout (float): Time in seconds to wait for the command to complete, 0 for no limit.
         ignore_errors (bool): Ignore step error and return OK
         new_line (bool): If True, prints OK/ERROR on a new line; if False, overwrites the previous line.
+        stall (float): Time in seconds the command may run without producing any output, 0 for no limit.
     """
 
     wsl_runner_print_status(TextType.PREFIX, description, new_line)
 
     # Execute the function or process
-    status, ext_status, log_lines = wsl_runner_exec_process(process, args, hidden, timeout)
+    status, ext_status, log_lines = wsl_runner_exec_process(process, args, hidden, timeout, stall)
 
     # Ignore errors id set to do so
     if ignore_errors:
         status = 0
 
-    # When the command is 'curl,' the extended status is the HTTP code
-    if process == "curl" and ext_status != 200:
-        status = ext_status
-
     wsl_runner_print_status(TextType.SUFFIX, None, new_line, status)
     return status
 
@@ -1247,7 +4373,8 @@ def wsl_runner_delete_shortcut(shortcut_name: str) -> int:
         return 1
 
 
-def run_post_install_steps(instance_name: str, username, proxy_server, hidden: bool = True, new_line: bool = False):
+def run_post_install_steps(instance_name: str, username, proxy_server, hidden: bool = True, new_line: bool = False,
+                           resources_path: Optional[str] = None):
     """
     Configures the WSL instance post-installation by setting it as the default instance.
 
@@ -1257,73 +4384,40 @@ def run_post_install_steps(instance_name: str, username, proxy_server, hidden: b
         proxy_server (str): HTTP/HTTPS proxy server address to set in .bashrc.
         hidden (bool): If True, suppresses command output during execution.
         new_line (bool): If True, displays status messages on a new line.
+        resources_path (str, optional): Local directory holding the verified remote resources.
 
     Raises:
         StepError: If the step fails to execute successfully.
     """
-    global intel_proxy_detected
+    resources_path = resources_path if resources_path else wsl_runner_get_resources_path()
 
     git_template_file_name, git_template_url = wsl_runner_get_resource_tuple_by_name("Git configuration template")
     sdk_runner_file_name, sdk_runner_url = wsl_runner_get_resource_tuple_by_name("SDK Runner script")
-    dt_file_name, dt_url = wsl_runner_get_resource_tuple_by_name("DT tool")
+
+    # Verified local copies, fetched only if the pre-prerequisites step did not already do so
+    git_template_source = wsl_runner_stage_resource("Git configuration template", resources_path, proxy_server)
+    sdk_runner_source = wsl_runner_stage_resource("SDK Runner script", resources_path, proxy_server)
 
     steps_commands = [
         # Set the WSL instance as the default
         ("Setting the WSL instance as the default",
          "wsl", ["--set-default", instance_name]),
 
-        # Download git configuration template
-        ("Downloading git configuration template",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 (
-                     f"curl -sS --proxy {proxy_server} "
-                     f"-o /home/{username}/.imcv2/{git_template_file_name} "
-                     f"{git_template_url}"
-                     if intel_proxy_detected else
-                     f"curl -sS "
-                     f"-o /home/{username}/.imcv2/{git_template_file_name} "
-                     f"{git_template_url}"
-                 )
-                 ]),
-
-        # Download an SDK runner script
-        ("Downloading SDK runner script",
+        # Copy git configuration template
+        ("Copying git configuration template",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 (
-                     f"curl -sS --proxy {proxy_server} "
-                     f"-o /home/{username}/.imcv2/bin/{sdk_runner_file_name} "
-                     f"{sdk_runner_url}"
-                     if intel_proxy_detected else
-                     f"curl -sS "
-                     f"-o /home/{username}/.imcv2/bin/{sdk_runner_file_name} "
-                     f"{sdk_runner_url}"
-                 )
-                 ]),
+                 f"cp '{git_template_source}' /home/{username}/.imcv2/{git_template_file_name}"]),
 
-        # Download DT tool
-        ("Downloading DT Tool",
+        # Copy the SDK runner script
+        ("Copying SDK runner script",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 (
-                     f"curl -sS --proxy {proxy_server} "
-                     f"-o /home/{username}/.imcv2/bin/{dt_file_name} "
-                     f"{dt_url}"
-                     if intel_proxy_detected else
-                     f"curl -sS "
-                     f"-o /home/{username}/.imcv2/bin/{dt_file_name} "
-                     f"{dt_url}"
-                 )
-                 ]),
+                 f"cp '{sdk_runner_source}' /home/{username}/.imcv2/bin/{sdk_runner_file_name}"]),
 
         # Make the SDK Runner executable
         ("Make the SDK runner script executable",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
                  f"chmod +x /home/{username}/.imcv2/bin/{sdk_runner_file_name}"]),
 
-        # Make the DT executable
-        ("Make DT tool executable",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"chmod +x /home/{username}/.imcv2/bin/{dt_file_name}"]),
-
         # Use the SDK Runner to patch bashrc
         ("Make 'sdk_runner' run at startup",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
@@ -1335,20 +4429,75 @@ def run_post_install_steps(instance_name: str, username, proxy_server, hidden: b
 
     ]
 
-    # Execute the command and handle errors
-    for description, process, args, *ignore_errors in steps_commands:
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     # Print success message
     wsl_runner_print_status(TextType.BOTH, "WSL post-installation steps completed", True, InfoType.DONE)
 
 
-def run_install_pyenv(instance_name, username, proxy_server, hidden=True, new_line=False):
+def run_compact_steps(instance_name: str, instance_path: str, username: str, hidden: bool = True,
+                      new_line: bool = False):
+    """
+    Shrinks the instance disk once provisioning is done: removes the APT archives, build leftovers and
+    installer files, makes the VHDX sparse and trims the guest file system so the freed blocks are
+    returned to Windows. Reports the reclaimed space.
+
+    Args:
+        instance_name (str): The name of the WSL instance.
+        instance_path (str): Directory holding the WSL instances.
+        username (str): WSL username
+        hidden (bool): If True, suppresses command output during execution.
+        new_line (bool): If True, displays status messages on a new line.
+
+    Raises:
+        StepError: If any step in the process fails.
+    """
+    vhdx_path = os.path.join(instance_path, instance_name, "ext4.vhdx")
+    size_before = wsl_runner_get_allocated_size(vhdx_path)
+
+    steps_commands = [
+        # Remove caches and leftovers of the installation steps
+        ("Removing package caches and build leftovers",
+         "wsl", ["-d", instance_name, "--user", "root", "--", "bash", "-c",
+                 f"apt-get clean; rm -rf /var/cache/apt/*.bin /tmp/python-build.* /tmp/imcv2_debs "
+                 f"/root/.cache /home/{username}/.cache/pip /home/{username}/.pyenv/cache "
+                 f"/home/{username}/downloads/pyenv-installer /home/{username}/downloads/*.txt; "
+                 f"journalctl --vacuum-size=1M >/dev/null 2>&1; true"]),
+
+        # The instance must be stopped before its disk can be managed
+        ("Stopping instance",
+         "wsl", ["--terminate", instance_name]),
+
+        # Sparse disks give trimmed blocks back to Windows, new disks already are when 'sparseVhd' is set
+        ("Making the instance disk sparse",
+         "wsl", ["--manage", instance_name, "--set-sparse", "true"], True),
+
+        # Discard the freed blocks
+        ("Trimming the instance file system",
+         "wsl", ["-d", instance_name, "--user", "root", "--", "bash", "-c", "fstrim -v /"], True),
+
+        # Restarting session for changes to take effect
+        ("Restarting session for changes to take effect",
+         "wsl", ["--terminate", instance_name]),
+    ]
+
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
+
+    size_after = wsl_runner_get_allocated_size(vhdx_path)
+    if size_before >= 0 and size_after >= 0:
+        reclaimed = max(0, size_before - size_after) / (1024 ** 2)
+        wsl_runner_print_status(TextType.BOTH, f"Instance disk compacted ({reclaimed:.0f} MB reclaimed)",
+                                True, InfoType.DONE)
+    else:
+        wsl_runner_print_status(TextType.BOTH, "Instance disk compacted", True, InfoType.DONE)
+
+
+def run_install_pyenv(instance_name, username, proxy_server, hidden=True, new_line=False, resources_path=None):
     """
     Use 'pyenv' to install specific Python 3.9 and set it as default Python runtime.
+    When an offline bundle holding a pyenv tree is active, the tree (with its prebuilt Python) is restored instead.
 
     Args:
         instance_name (str): The name of the WSL instance.
@@ -1356,41 +4505,55 @@ def run_install_pyenv(instance_name, username, proxy_server, hidden=True, new_li
         proxy_server (str): HTTP/HTTPS proxy server address to set in .bashrc.
         hidden (bool): Specifies whether to suppress the output of the executed command.
         new_line (bool): Specifies whether each step should be displayed on its own line.
+        resources_path (str, optional): Local directory holding the verified remote resources.
     """
+    context = wsl_runner_get_context()
+
+    resources_path = resources_path if resources_path else wsl_runner_get_resources_path()
+    pyenv_installer_source = wsl_runner_stage_resource("Pyenv installer", resources_path, proxy_server)
 
-    global intel_proxy_detected
+    # Offline bundle: restore the pyenv tree instead of running the installer and building Python
+    bundle_pyenv = wsl_runner_bundle_has("pyenv")
 
     # Define commands related to package installation
     steps_commands = [
 
-        # Download pyenv installer
-        ("Download 'pyenv' installer",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"curl -s -S "
-                 f"{'--proxy ' + proxy_server if intel_proxy_detected else ''} "
-                 f"-o /home/{username}/downloads/pyenv-installer "
-                 "https://raw.githubusercontent.com/pyenv/pyenv-installer/master/bin/pyenv-installer"]),
-
-        # Make the installer executable
-        ("Make 'pyenv' installer executable",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"chmod +x /home/{username}/downloads/pyenv-installer"]),
+        *(
+            [
+                # Copy pyenv installer
+                ("Copying 'pyenv' installer",
+                 "wsl", ["-d", instance_name, "--", "bash", "-c",
+                         f"cp '{pyenv_installer_source}' /home/{username}/downloads/pyenv-installer"]),
+
+                # Make the installer executable
+                ("Make 'pyenv' installer executable",
+                 "wsl", ["-d", instance_name, "--", "bash", "-c",
+                         f"chmod +x /home/{username}/downloads/pyenv-installer"]),
+            ]
+            if not bundle_pyenv else []
+        ),
 
         #  Clean up any previous pyenv installation
         ("Clean up any previous 'pyenv' installation",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
                  f"rm -rf /home/{username}/.pyenv"]),
 
-        # Run pyenv-installer
+        # Run pyenv-installer, or restore the tree from the offline bundle.
+        # The installer refuses an existing ~/.pyenv, so a retry first removes what a failed attempt left.
+        ("Restoring 'pyenv' and prebuilt Python", wsl_runner_restore_from_bundle,
+         [instance_name, "pyenv", f"tar -C /home/{username} -xf -", username])
+        if bundle_pyenv else
         ("Run pyenv-installer",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
                  (
+                     f"rm -rf /home/{username}/.pyenv && "
                      f"export http_proxy={proxy_server} && export https_proxy={proxy_server} && "
                      f"/home/{username}/downloads/pyenv-installer"
-                     if intel_proxy_detected else
-                     f"/home/{username}/downloads/pyenv-installer"
+                     if context.intel_proxy_detected else
+                     f"rm -rf /home/{username}/.pyenv && /home/{username}/downloads/pyenv-installer"
                  )
-                 ]),
+                 ],
+         False, IMCV2_WSL_STEP_POLICY_NETWORK),
 
         # Check for errors during installation
         ("Verify 'pyenv' installation success",
@@ -1415,17 +4578,21 @@ def run_install_pyenv(instance_name, username, proxy_server, hidden=True, new_li
         ("Restarting session for changes to take effect",
          "wsl", ["--terminate", instance_name]),
 
-        # Install Python 3.9.0 using pyenv with forced re-installation
-        ("Install Python 3.9.0 using 'pyenv'",
-         "wsl", ["-d", instance_name, "--user", username, "--", "bash", "-c",
-                 (
-                     f"export http_proxy={proxy_server} && "
-                     f"export https_proxy={proxy_server} && "
-                     f"$HOME/.pyenv/bin/pyenv install 3.9.0 -f"
-                     if intel_proxy_detected else
-                     f"$HOME/.pyenv/bin/pyenv install 3.9.0 -f"
-                 )
-                 ]),
+        # Install Python 3.9.0 using pyenv with forced re-installation, the bundle holds a prebuilt one
+        *(
+            [("Install Python 3.9.0 using 'pyenv'",
+              "wsl", ["-d", instance_name, "--user", username, "--", "bash", "-c",
+                      (
+                          f"export http_proxy={proxy_server} && "
+                          f"export https_proxy={proxy_server} && "
+                          f"MAKE_OPTS=-j$(nproc) $HOME/.pyenv/bin/pyenv install 3.9.0 -f"
+                          if context.intel_proxy_detected else
+                          f"MAKE_OPTS=-j$(nproc) $HOME/.pyenv/bin/pyenv install 3.9.0 -f"
+                      )
+                      ],
+              False, IMCV2_WSL_STEP_POLICY_BUILD)]
+            if not bundle_pyenv else []
+        ),
 
         # Set Python 3.9.0 as the global default version
         ("Set Python 3.9.0 as the global default version",
@@ -1437,18 +4604,14 @@ def run_install_pyenv(instance_name, username, proxy_server, hidden=True, new_li
          "wsl", ["--terminate", instance_name]),
     ]
 
-    # Execute each command in the step commands list
-    for description, process, args, *ignore_errors in steps_commands:
-        # If ignore_errors is not specified, default it to False
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     wsl_runner_print_status(TextType.BOTH, "Python 3.9 via 'pyenv' installation", True, InfoType.DONE)
 
 
-def run_install_git_config(instance_name, username, proxy_server, hidden=True, new_line=False):
+def run_install_git_config(instance_name, username, proxy_server, hidden=True, new_line=False,
+                           resources_path=None):
     """
      Instance git related configuration.
 
@@ -1458,9 +4621,12 @@ def run_install_git_config(instance_name, username, proxy_server, hidden=True, n
         proxy_server (str): HTTP/HTTPS proxy server address to set in .bashrc.
         hidden (bool): Specifies whether to suppress the output of the executed command.
         new_line (bool): Specifies whether each step should be displayed on its own line.
+        resources_path (str, optional): Local directory holding the verified remote resources.
     """
+    resources_path = resources_path if resources_path else wsl_runner_get_resources_path()
 
-    global intel_proxy_detected
+    git_completion_source = wsl_runner_stage_resource("Git completion script", resources_path, proxy_server)
+    git_prompt_source = wsl_runner_stage_resource("Git prompt script", resources_path, proxy_server)
 
     # Define commands related to package installation
     steps_commands = [
@@ -1470,21 +4636,15 @@ def run_install_git_config(instance_name, username, proxy_server, hidden=True, n
                  f"sudo mkdir -p /usr/share/git-core/contrib/completion && sudo chown {username}:{username} "
                  f"/usr/share/git-core/contrib/completion"]),
 
-        # Download git-completion.bash using curl
-        ("Downloading git-completion.bash",
+        # Copy git-completion.bash
+        ("Copying git-completion.bash",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"curl -s -S "
-                 f"{'--proxy ' + proxy_server if intel_proxy_detected else ''} "
-                 "-o /usr/share/git-core/contrib/completion/git-completion.bash "
-                 "https://raw.githubusercontent.com/git/git/master/contrib/completion/git-completion.bash"]),
+                 f"cp '{git_completion_source}' /usr/share/git-core/contrib/completion/git-completion.bash"]),
 
-        # Download git-prompt.sh using curl
-        ("Downloading git-prompt.sh",
+        # Copy git-prompt.sh
+        ("Copying git-prompt.sh",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"curl -s -S "
-                 f"{'--proxy ' + proxy_server if intel_proxy_detected else ''} "
-                 "-o /usr/share/git-core/contrib/completion/git-prompt.sh "
-                 "https://raw.githubusercontent.com/git/git/master/contrib/completion/git-prompt.sh"]),
+                 f"cp '{git_prompt_source}' /usr/share/git-core/contrib/completion/git-prompt.sh"]),
 
         # Set a proper colored Git-aware prompt in .bashrc
         (
@@ -1504,21 +4664,22 @@ def run_install_git_config(instance_name, username, proxy_server, hidden=True, n
 
     ]
 
-    # Execute each command in the step commands list
-    for description, process, args, *ignore_errors in steps_commands:
-        # If ignore_errors is not specified, default it to False
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     wsl_runner_print_status(TextType.BOTH, "User git configuration", True, InfoType.DONE)
 
 
 def run_install_system_packages(instance_name, username, proxy_server, hidden=True, new_line=False,
-                                timeout=120):
+                                resources_path=None, durable_io=False):
     """
-    Transfers a package file to the WSL instance and installs the packages listed in the file.
+    Transfers a package file to the WSL instance and installs the packages listed in the file, along with
+    the packages configured by run_preseed_steps(), in one APT transaction.
+
+    Unless durable I/O is requested, dpkg skips the per-file fsync and triggers (man-db, ldconfig, mime...)
+    are deferred to the end of each APT run rather than repeated per package, while documentation, man pages
+    and non-English locales are not unpacked. The fsync and trigger settings are removed and the disk synced
+    once the packages are installed, the path excludes are kept so that later upgrades stay consistent.
 
     Args:
         instance_name (str): The name of the WSL instance.
@@ -1526,75 +4687,106 @@ def run_install_system_packages(instance_name, username, proxy_server, hidden=Tr
         proxy_server (str): HTTP/HTTPS proxy server address to set in .bashrc.
         hidden (bool): Specifies whether to suppress the output of the executed command.
         new_line (bool): Specifies whether each step should be displayed on its own line.
-        timeout (int, optional): Time in seconds to wait for the process to complete. Default is 120 seconds.
+        resources_path (str, optional): Local directory holding the verified remote resources.
+        durable_io (bool, optional): If True, packages are installed with the default dpkg settings.
     """
-    global intel_proxy_detected
+    context = wsl_runner_get_context()
+    resources_path = resources_path if resources_path else wsl_runner_get_resources_path()
 
     packages_file_name, package_url = wsl_runner_get_resource_tuple_by_name("Packages list")
+    packages_source = wsl_runner_stage_resource("Packages list", resources_path, proxy_server)
+    preseed_packages = " ".join(IMCV2_WSL_PRESEED_PACKAGES)
+    install_step = IMCV2_WSL_INSTALL_STEP if durable_io else IMCV2_WSL_INSTALL_STEP_UNSAFE_IO
+    excludes = "\n".join(IMCV2_WSL_DPKG_EXCLUDES)
+    triggers = "\n".join(IMCV2_WSL_APT_TRIGGERS)
+
+    # Offline bundle: keep the restored archives for the install and skip the network sync
+    bundle_debs = wsl_runner_bundle_has("debs")
 
     # Define commands related to package installation
     steps_commands = [
-        # Download git configuration template
-        ("Downloading required packages list",
+        # Provisioning-only dpkg settings, restored before the last restart with a single sync
+        *(
+            [("Enabling unsafe I/O for provisioning",
+              "wsl", ["-d", instance_name, "--user", "root", "--", "bash", "-c",
+                      f"echo force-unsafe-io > {IMCV2_WSL_DPKG_UNSAFE_IO_FILE} && "
+                      f"printf '%s\\n' '{triggers}' > {IMCV2_WSL_APT_TRIGGERS_FILE} && "
+                      f"printf '%s\\n' '{excludes}' > {IMCV2_WSL_DPKG_EXCLUDES_FILE}"])]
+            if not durable_io else []
+        ),
+
+        # Copy the required packages list
+        ("Copying required packages list",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 (
-                     f"curl -sS --proxy {proxy_server} "
-                     f"-o /home/{username}/downloads/{packages_file_name} "
-                     f"{package_url}"
-                     if intel_proxy_detected else
-                     f"curl -sS "
-                     f"-o /home/{username}/downloads/{packages_file_name} "
-                     f"{package_url}"
-                 )
-                 ]),
+                 f"cp '{packages_source}' /home/{username}/downloads/{packages_file_name}"]),
 
         # Clearing local apt cache
-        ("Clearing local apt cache",
-         "wsl", ["-d", instance_name, "--", "bash", "-c", "sudo apt clean"]),
+        *(
+            [("Clearing local apt cache",
+              "wsl", ["-d", instance_name, "--", "bash", "-c", "sudo apt clean"])]
+            if not bundle_debs else []
+        ),
 
         # Restarting session for changes to take effect
         ("Restarting session for changes to take effect",
          "wsl", ["--terminate", instance_name]),
 
-        # Installing packages from a file (ignore errors on the first attempt)
-        (f"Installing (a lot of) packages",
+        # Installing packages from a file along with the pre-seeded ones (ignore errors on the first attempt)
+        (install_step,
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"xargs -a /home/{username}/downloads/{packages_file_name} -r sudo apt install -y "
-                 f"--ignore-missing"],
-         True),
+                 f"xargs -a /home/{username}/downloads/{packages_file_name} -r sudo DEBIAN_FRONTEND=noninteractive "
+                 f"apt install -y --ignore-missing {preseed_packages}"],
+         True, IMCV2_WSL_STEP_POLICY_INSTALL),
 
         # Installing packages from a file (retry without ignoring errors)
         ("Installing packages from file second round",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 f"xargs -a /home/{username}/downloads/{packages_file_name} -r sudo apt install -y "
-                 f"--ignore-missing -qq"]),
+                 f"xargs -a /home/{username}/downloads/{packages_file_name} -r sudo DEBIAN_FRONTEND=noninteractive "
+                 f"apt install -y --ignore-missing -qq {preseed_packages}"],
+         False, IMCV2_WSL_STEP_POLICY_INSTALL),
 
         # Restarting session for changes to take effect
         ("Restarting session for changes to take effect",
          "wsl", ["--terminate", instance_name]),
 
         # Clearing local apt cache
+        ("Final packages cleanup",
+         "wsl", ["-d", instance_name, "--", "bash", "-c", "sudo apt clean"])
+        if bundle_debs else
         ("Final packages sync",
-         "wsl", ["-d", instance_name, "--", "bash", "-c", "sudo apt update && sudo apt upgrade && sudo apt clean"]),
+         "wsl", ["-d", instance_name, "--", "bash", "-c",
+                 "sudo apt update && sudo apt upgrade -y && sudo apt clean"],
+         False, IMCV2_WSL_STEP_POLICY_INSTALL),
+
+        *(
+            [("Restoring durable I/O settings",
+              "wsl", ["-d", instance_name, "--user", "root", "--", "bash", "-c",
+                      f"rm -f {IMCV2_WSL_DPKG_UNSAFE_IO_FILE} {IMCV2_WSL_APT_TRIGGERS_FILE} && "
+                      f"dpkg --triggers-only --pending && sync"])]
+            if not durable_io else []
+        ),
 
         # Restarting session for changes to take effect
         ("Restarting session for changes to take effect",
          "wsl", ["--terminate", instance_name]),
     ]
 
-    # Execute each command in the step commands list
-    for description, process, args, *ignore_errors in steps_commands:
-        # If ignore_errors is not specified, default it to False
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  timeout=timeout, ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     wsl_runner_print_status(TextType.BOTH, "Ubuntu system package installation", True, InfoType.DONE)
 
+    # Compare against the median of the durable installs recorded by previous runs ('--durable_io')
+    baseline = sorted(context.step_timings.get(IMCV2_WSL_INSTALL_STEP, []))
+    current = context.step_timings.get(IMCV2_WSL_INSTALL_STEP_UNSAFE_IO, [])
+    if not durable_io and baseline and current:
+        saved = baseline[len(baseline) // 2] - current[-1]
+        wsl_runner_print_status(TextType.BOTH, f"Unsafe I/O install took {current[-1]:.0f}s, saving {saved:.0f}s "
+                                               f"against the durable baseline", True, InfoType.DONE)
+
 
 def run_user_shell_steps(instance_name: str, username: str, proxy_server: str, hidden: bool = True,
-                         new_line: bool = False):
+                         new_line: bool = False, resources_path: Optional[str] = None):
     """
     Configures the user's shell environment in a WSL instance.
 
@@ -1604,18 +4796,20 @@ def run_user_shell_steps(instance_name: str, username: str, proxy_server: str, h
         proxy_server (str): HTTP/HTTPS proxy server address to set in .bashrc.
         hidden (bool): If True, suppresses command output during execution.
         new_line (bool): If True, displays status messages on a new line.
+        resources_path (str, optional): Local directory holding the verified remote resources.
 
     Raises:
         StepError: If any step in the process fails.
     """
+    resources_path = resources_path if resources_path else wsl_runner_get_resources_path()
 
     # Get email and full name or empty strings
-    corp_name, corp_email = wsl_runner_get_office_user_identity()
+    facts = wsl_runner_get_host_facts()
+    corp_name, corp_email = facts.corp_name, facts.corp_email
 
     # Resource - kerberos configuration file.
     kerberos_file_name, kerberos_file_url = wsl_runner_get_resource_tuple_by_name("Kerberos configuration")
-
-    global intel_proxy_detected
+    kerberos_source = wsl_runner_stage_resource("Kerberos configuration", resources_path, proxy_server)
 
     # Define the steps to configure the shell environment
     steps_commands = [
@@ -1678,19 +4872,10 @@ def run_user_shell_steps(instance_name: str, username: str, proxy_server: str, h
                  f"sudo chown -R {username}:{username} "
                  f"/home/{username}/downloads /home/{username}/projects /home/{username}/.imcv2/bin"]),
 
-        # Download Kerberos configuration
-        ("Downloading  Kerberos configuration",
+        # Copy Kerberos configuration
+        ("Copying Kerberos configuration",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 (
-                     f"curl -sS --proxy {proxy_server} "
-                     f"-o /home/{username}/{kerberos_file_name} "
-                     f"{kerberos_file_url}"
-                     if intel_proxy_detected else
-                     f"curl -sS "
-                     f"-o /home/{username}/{kerberos_file_name} "
-                     f"{kerberos_file_url}"
-                 )
-                 ]),
+                 f"cp '{kerberos_source}' /home/{username}/{kerberos_file_name}"]),
 
         # Copy a Kerberos file to /etc/krb5.conf using sudo
         (
@@ -1712,147 +4897,60 @@ def run_user_shell_steps(instance_name: str, username: str, proxy_server: str, h
          "wsl", ["--terminate", instance_name])
     ]
 
-    # Execute each command and handle errors
-    for description, process, args, *ignore_errors in steps_commands:
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     # Print success message
     wsl_runner_print_status(TextType.BOTH, "Setting user shell defaults", True, InfoType.DONE)
 
 
-def run_kerberos_steps(instance_name: str, hidden: bool = True, new_line: bool = False):
+def run_preseed_steps(instance_name: str, time_zone: str, hidden: bool = True, new_line: bool = False):
     """
-    Configures Kerberos authentication for a WSL instance.
+    Loads the debconf answers of the time zone, console and Kerberos packages in a single call, and sets the
+    instance time zone. The packages themselves are installed by run_install_system_packages(), in the same
+    APT transaction as the packages list.
 
     Args:
         instance_name (str): Name of the WSL instance to configure.
+        time_zone (str): IANA time zone name (e.g. "Asia/Jerusalem").
         hidden (bool): If True, suppresses command output during execution.
         new_line (bool): If True, displays status messages on a new line.
 
     Raises:
         StepError: If any step in the process fails.
     """
-    # Define the steps for configuring Kerberos
-    steps_commands = [
-        # Setting Kerberos defaults
-        ("Setting Kerberos defaults",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "grep -q 'krb5-config/default_realm' /var/cache/debconf/config.dat || "
-                 "echo 'krb5-config krb5-config/default_realm string CLIENTS.INTEL.COM' "
-                 "| sudo debconf-set-selections"]),
-
-        # Pre-seed Kerberos server hostnames
-        ("Pre-seed Kerberos server hostnames",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "grep -q 'krb5-config/kerberos_servers' /var/cache/debconf/config.dat || "
-                 "echo 'krb5-config krb5-config/kerberos_servers string kdc1.clients.intel.com kdc2.clients.intel.com' "
-                 "| sudo debconf-set-selections"]),
-
-        # Pre-seed Kerberos administrative server
-        ("Pre-seed Kerberos administrative server",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "grep -q 'krb5-config/admin_server' /var/cache/debconf/config.dat || "
-                 "echo 'krb5-config krb5-config/admin_server string admin.clients.intel.com' "
-                 "| sudo debconf-set-selections"]),
-
-        # Install Kerberos packages non-interactively
-        ("Install Kerberos packages non-interactively",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "export DEBIAN_FRONTEND=noninteractive && "
-                 "dpkg -l | grep -q krb5-config || sudo apt install -y krb5-config krb5-user"]),
-
-        # Restart session for changes to take effect
-        ("Restarting session for changes to take effect",
-         "wsl", ["--terminate", instance_name])
+    area, _, zone = time_zone.partition("/")
+    preseed = [
+        # Time zone
+        f"tzdata tzdata/Areas select {area}",
+        f"tzdata tzdata/Zones/{area} select {zone if zone else area}",
+
+        # Console using a Latin character set
+        "console-setup console-setup/charmap47 select UTF-8",
+        "console-setup console-setup/codeset47 select Latin",
+        "console-setup console-setup/fontface47 select Fixed",
+        "console-setup console-setup/fontsize-text47 select 16",
+
+        # Kerberos realm and servers
+        "krb5-config krb5-config/default_realm string CLIENTS.INTEL.COM",
+        "krb5-config krb5-config/kerberos_servers string kdc1.clients.intel.com kdc2.clients.intel.com",
+        "krb5-config krb5-config/admin_server string admin.clients.intel.com",
     ]
-
-    # Execute each command in the step list
-    for description, process, args, *ignore_errors in steps_commands:
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
-
-
-def run_time_zone_steps(instance_name, hidden=True, new_line=False):
-    """
-    Configures timezone and console settings for a specified WSL instance.
-
-    This function automates a series of steps to:
-    1. Pre-seed timezone data (tzdata) for the Israel timezone in the WSL instance.
-    2. Set the system time zone to Asia/Jerusalem.
-    3. Ensure the tzdata package is installed.
-    4. Reconfigure tzdata non-interactively.
-    5. Configure the console to use Hebrew character sets and fonts.
-    6. Install the console-setup package in a non-interactive mode.
-    7. Restart the WSL session to apply changes.
-
-    Parameters:
-        instance_name (str): The name of the WSL instance to configure.
-        hidden (bool, optional): Whether to hide the command output. Default is True.
-        new_line (bool, optional): Whether to add a new line after each step's output. Default is False.
-    """
+    preseed_text = "\n".join(preseed)
 
     steps_commands = [
-        # Pre-seed tzdata configuration for Israel timezone
-        ("Pre-seed tzdata for Israel Area",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "echo 'tzdata tzdata/Areas select Asia' | sudo debconf-set-selections"]),
-
-        ("Pre-seed tzdata for Israel",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "echo 'tzdata tzdata/Zones/Asia select Jerusalem' | sudo debconf-set-selections"]),
-
-        # Set timezone in WSL instance
-        ("Set timezone in WSL instance",
-         "wsl",
-         ["-d", instance_name, "--", "bash", "-c", "sudo ln -fs /usr/share/zoneinfo/Asia/Jerusalem /etc/localtime"]),
-
-        # Check and install tzdata if not installed
-        ("Ensure tzdata package is installed",
-         "wsl", ["-d", instance_name, "--", "bash", "-c", "dpkg -l | grep tzdata || sudo apt-get install -y tzdata"]),
-
-        # Reconfigure tzdata
-        ("Reconfigure tzdata",
-         "wsl", ["-d", instance_name, "--", "bash", "-c", "sudo dpkg-reconfigure -f noninteractive tzdata"]),
-
-        # Pre-seed console-setup for a Latin character set
-        ("Pre-seed console Latin character set",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "echo 'console-setup console-setup/charmap47 select UTF-8' | sudo debconf-set-selections"]),
-
-        ("Pre-seed console Latin character set",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "echo 'console-setup console-setup/codeset47 select Latin' | sudo debconf-set-selections"]),
-
-        ("Pre-seed console Latin character Fixed font",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "echo 'console-setup console-setup/fontface47 select Fixed' | sudo debconf-set-selections"]),
-
-        ("Pre-seed console Latin character Font size",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "echo 'console-setup console-setup/fontsize-text47 select 16' | sudo debconf-set-selections"]),
-
-        # Install console-setup in non-interactive mode
-        ("Install console-setup in non-interactive mode",
-         "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "export DEBIAN_FRONTEND=noninteractive && sudo apt install -y console-setup"]),
-
-        # Restart session for changes to take effect
-        ("Restarting session for changes to take effect",
-         "wsl", ["--terminate", instance_name])
+        # A single debconf call, tzdata honors the time zone files when it is already installed
+        ("Pre-seeding time zone, console and Kerberos settings",
+         "wsl", ["-d", instance_name, "--user", "root", "--", "bash", "-c",
+                 f"debconf-set-selections <<'EOF' &&\n{preseed_text}\nEOF\n"
+                 f"ln -fs /usr/share/zoneinfo/{time_zone} /etc/localtime && echo '{time_zone}' > /etc/timezone"]),
     ]
 
-    # Execute each command in the step commands list
-    for description, process, args, *ignore_errors in steps_commands:
-        # If ignore_errors is not specified, default it to False
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError("Failed to complete step")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
+
+    wsl_runner_print_status(TextType.BOTH, f"System settings pre-seeded (time zone {time_zone})", True,
+                            InfoType.DONE)
 
 
 def run_user_creation_steps(instance_name: str, username: str, password: str, hidden: bool = True,
@@ -1881,7 +4979,8 @@ def run_user_creation_steps(instance_name: str, username: str, password: str, hi
         # Install required basic packages (sudo, passwd)
         ("Installing required basic packages (sudo, passwd)",
          "wsl", ["-d", instance_name, "--", "bash", "-c",
-                 "dpkg -l | grep -q sudo || apt install -y sudo passwd curl"]),
+                 "dpkg -l | grep -q sudo || apt install -y sudo passwd curl"],
+         False, IMCV2_WSL_STEP_POLICY_INSTALL),
 
         # Add 'sudo' group if it doesn't exist
         ("Adding 'sudo' group if it doesn't exist",
@@ -1967,35 +5066,45 @@ def run_user_creation_steps(instance_name: str, username: str, password: str, hi
             ]
         ))
 
-    # Execute each command and handle errors
-    for description, process, args, *ignore_errors in steps_commands:
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     # Print success message
     wsl_runner_print_status(TextType.BOTH, "Creating user account", True, InfoType.DONE)
 
 
-def run_initial_setup_steps(instance_name: str, instance_path: str, bare_linux_image_path: str,
-                            hidden: bool = True, new_line: bool = False):
+def run_initial_setup_steps(instance_name: str, instance_path: str, image_source: str,
+                            hidden: bool = True, new_line: bool = False, proxy_server: Optional[str] = None,
+                            vhd: bool = False, image_sha256: Optional[str] = None, cache_path: Optional[str] = None,
+                            mirror: Optional[str] = None):
     """
     Prepares the initial setup for a WSL instance by importing a Linux image and configuring the environment.
 
     Args:
         instance_name (str): Name of the WSL instance to create or reset.
         instance_path (str): Path to the directory where the WSL instance will be stored.
-        bare_linux_image_path (str): Path to the Linux image to be imported into the WSL instance.
+        image_source (str): URL or local path of the Linux image to be streamed into the WSL instance.
         hidden (bool): If True, suppresses command output during execution.
         new_line (bool): If True, displays status messages on a new line.
+        proxy_server (str, optional): Proxy server to use when the image is streamed from a URL.
+        vhd (bool, optional): If True, the image source is a prepared ext4 VHDX.
+        image_sha256 (str, optional): Expected digest of the image, verified while it is streamed.
+        cache_path (str, optional): The cache directory holding the APT lists snapshots.
+        mirror (str, optional): The Ubuntu mirror replacing the image default one.
 
     Raises:
         StepError: If any step in the process fails.
     """
+    context = wsl_runner_get_context()
 
-    # Execute 'terminate' as a way to see if that instance already exists
-    result = wsl_runner_exec_process("wsl", ["--terminate", instance_name], True, 0)
+    unregister_step = ("Unregistering existing instance (if any)", "wsl", ["--unregister", instance_name], True)
+
+    # Execute 'terminate' as a way to see if that instance already exists. When resuming past the unregister step,
+    # the instance is the one of the interrupted run and is kept, there is nothing to confirm.
+    result = None
+    if context.plan is None and not wsl_runner_journal_peek(unregister_step[0],
+                                                            wsl_runner_get_step_hash(*unregister_step[1:3])):
+        result = wsl_runner_exec_process("wsl", ["--terminate", instance_name], True, 0)
     if result is not None:
         status, ext_status, log_lines = result  # Unpack the tuple
         if status == 0:
@@ -2006,19 +5115,45 @@ def run_initial_setup_steps(instance_name: str, instance_path: str, bare_linux_i
             ) is False:
                 raise StepError(f"Instance '{instance_name}' already exists.")
 
+    # Offline bundle: the package lists it was created with are restored instead of updated,
+    # restored lists are only valid for the image default sources
+    bundle_lists = wsl_runner_bundle_has("apt_lists")
+    acquire = "\n".join(IMCV2_WSL_APT_ACQUIRE_CONFIG)
+
     steps_commands = [
 
         # Unregister the instance if it exists
-        ("Unregistering existing instance (if any)",
-         "wsl", ["--unregister", instance_name], True),
+        unregister_step,
 
-        # Import the Linux image as a new WSL instance
+        # Stream the Linux image into a new WSL instance
         ("Importing Linux image as a new WSL instance",
-         "wsl", ["--import", instance_name, os.path.join(instance_path, instance_name), bare_linux_image_path]),
+         wsl_runner_stream_import, [instance_name, os.path.join(instance_path, instance_name), image_source,
+                                    proxy_server, vhd, 30, image_sha256]),
+
+        # Point the sources at the selected mirror (security updates stay on their own host) and tune the downloads
+        *(
+            [("Selecting Ubuntu mirror and download settings",
+              "wsl", ["-d", instance_name, "--user", "root", "--", "bash", "-c",
+                      f"sed -i -E 's#https?://([a-z]{{2}}\\.)?archive\\.ubuntu\\.com/ubuntu/?#{mirror}/#' "
+                      f"/etc/apt/sources.list /etc/apt/sources.list.d/*.sources 2>/dev/null; "
+                      f"printf '%s\\n' '{acquire}' > {IMCV2_WSL_APT_ACQUIRE_CONFIG_FILE}"])]
+            if mirror and not bundle_lists else []
+        ),
 
-        # Update the APT package lists
+        # Update the APT package lists, seeded from the host-side snapshot, or restore them from the offline bundle
+        ("Restoring APT package lists", wsl_runner_restore_from_bundle,
+         [instance_name, "apt_lists", "rm -rf /var/lib/apt/lists/* && tar -C /var/lib/apt/lists -xf -"])
+        if bundle_lists else
         ("Updating APT package lists",
-         "wsl", ["-d", instance_name, "--", "bash", "-c", "apt update -qq"]),
+         wsl_runner_update_apt_lists, [instance_name, cache_path],
+         False, IMCV2_WSL_STEP_POLICY_NETWORK),
+
+        # Offline bundle: pre-seed the APT archives cache so packages are installed without the network
+        *(
+            [("Restoring packages archive", wsl_runner_restore_from_bundle,
+              [instance_name, "debs", "tar -C /var/cache/apt/archives -xf -"])]
+            if wsl_runner_bundle_has("debs") else []
+        ),
 
         # List upgradable packages
         ("Listing upgradable packages",
@@ -2029,66 +5164,148 @@ def run_initial_setup_steps(instance_name: str, instance_path: str, bare_linux_i
          "wsl", ["--terminate", instance_name])
     ]
 
-    # Execute each command and handle errors
-    for description, process, args, *ignore_errors in steps_commands:
-        ignore_errors = ignore_errors[0] if ignore_errors else False
-        if wsl_runner_run_process(description, process, args, hidden=hidden, new_line=new_line,
-                                  ignore_errors=ignore_errors) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, hidden, new_line)
 
     # Print success message
     wsl_runner_print_status(TextType.BOTH, "WSL environment startup completed", True, InfoType.DONE)
 
 
 def run_pre_prerequisites_local_steps(instance_path: str, bare_linux_image_path: str,
-                                      ubuntu_url: str, proxy_server: str, new_line: bool = False):
+                                      proxy_server: str, new_line: bool = False, resources_path: Optional[str] = None):
     """
     Prepares the environment by verifying directories and downloading the necessary resources.
+    The Linux image itself is not downloaded here, it is streamed straight into 'wsl --import'.
 
     Args:
         instance_path (str): Directory path for WSL instance data.
-        bare_linux_image_path (str): Directory path for the Ubuntu Linux image.
-        ubuntu_url (str): URL to download the Ubuntu image.
+        bare_linux_image_path (str): Directory path for local Linux images.
         proxy_server (str): Proxy server address to use for downloads.
         new_line (bool): If True, displays status messages on a new line.
+        resources_path (str, optional): Local directory receiving the verified remote resources.
 
     Raises:
         StepError: If any step in the process fails.
     """
 
     icon_file_name, icon_url = wsl_runner_get_resource_tuple_by_name("SDK Icon")
+    resources_path = resources_path if resources_path else wsl_runner_get_resources_path()
 
     steps_commands = [
         # Ensure the necessary directories exist
         ("Verifying destination paths", wsl_runner_ensure_directory_exists,
          [(bare_linux_image_path, instance_path)]),
 
-        # Download Ubuntu bare Linux image
-        ("Downloading Ubuntu image", wsl_runner_download_resources,
-         [ubuntu_url, bare_linux_image_path, proxy_server]),
-
         # Download SDK icon
-        ("Downloading Ubuntu image", wsl_runner_download_resources,
-         [icon_url, instance_path, proxy_server])
+        ("Downloading SDK icon", wsl_runner_download_resources,
+         [icon_url, instance_path, proxy_server, 30, False]),
+
+        # Download and verify the resources later copied into the instance
+        ("Downloading SDK resources", wsl_runner_download_all_resources,
+         [resources_path, proxy_server])
     ]
 
-    # Execute each command and handle errors
-    for description, func, args in steps_commands:
-        # Execute the function with the provided arguments
-        if ws_runner_run_function(description, func, args, new_line=new_line) != 0:
-            raise StepError(f"Failed during step: {description}")
+    # Execute each step, applying its policy
+    wsl_runner_run_steps(steps_commands, new_line=new_line)
 
     # Print success message
     wsl_runner_print_status(TextType.BOTH, "Prerequisites satisfied", True, InfoType.DONE)
 
 
-def wsl_runner_check_installed(print_version: bool = False, wsl_major_required: int = 2):
+def run_make_bundle_steps(bundle_path: str, ubuntu_url: str, proxy_server: str, resources_path: str,
+                          instance_name: Optional[str] = None, username: Optional[str] = None,
+                          include_debs: bool = False, new_line: bool = False):
+    """
+    Creates an offline bundle: a single ZIP archive holding the base image, all remote and external resources and,
+    when an existing instance is given, its pyenv tree (including the prebuilt Python) and optionally
+    the installed .deb set along with the APT package lists.
+    The archive's central directory provides random access to each artifact, and an index maps each
+    artifact to the URL it replaces together with its SHA-256 digest.
+
+    Args:
+        bundle_path (str): Path of the bundle to create.
+        ubuntu_url (str): URL of the Ubuntu image.
+        proxy_server (str): Proxy server address to use for downloads.
+        resources_path (str): Local directory holding the verified remote resources.
+        instance_name (str, optional): Existing provisioned instance to collect guest artifacts from.
+        username (str, optional): The instance user owning the pyenv tree.
+        include_debs (bool): If True, include the instance .deb set and APT package lists.
+        new_line (bool): If True, displays status messages on a new line.
+
+    Raises:
+        StepError: If any step in the process fails.
+    """
+    index = {"version": 1, "created": int(time.time()), "files": [], "guest": {}}
+    partial = bundle_path + ".part"
+    sums_url = f"{ubuntu_url.rsplit('/', 1)[0]}/SHA256SUMS"
+
+    try:
+        with zipfile.ZipFile(partial, "w", allowZip64=True) as archive:
+            steps_commands = [
+                ("Downloading SDK resources", wsl_runner_download_all_resources,
+                 [resources_path, proxy_server]),
+
+                ("Adding Ubuntu image checksums", wsl_runner_bundle_add,
+                 [archive, index, sums_url, None, proxy_server]),
+
+                ("Adding Ubuntu image", wsl_runner_bundle_add_image,
+                 [archive, index, ubuntu_url, proxy_server]),
+            ]
+
+            # Resources are added from their verified local copies
+            for resource in remote_resources + external_resources:
+                file_name, url = wsl_runner_get_resource_tuple_by_name(resource["name"])
+                steps_commands.append((f"Adding {resource['name']}", wsl_runner_bundle_add,
+                                       [archive, index, url, os.path.join(resources_path, file_name)]))
+
+            if instance_name:
+                steps_commands.append(
+                    ("Adding pyenv and prebuilt Python", wsl_runner_bundle_add_guest,
+                     [archive, index, "pyenv", instance_name, f"tar -C /home/{username} -cf - .pyenv", username]))
+
+            if instance_name and include_debs:
+                steps_commands += [
+                    ("Adding APT package lists", wsl_runner_bundle_add_guest,
+                     [archive, index, "apt_lists", instance_name,
+                      "tar -C /var/lib/apt/lists --exclude=./lock --exclude=./partial -cf - ."]),
+
+                    # Fetch the exact installed version of every package
+                    ("Adding installed .deb set", wsl_runner_bundle_add_guest,
+                     [archive, index, "debs", instance_name,
+                      "rm -rf /tmp/imcv2_debs && mkdir -p /tmp/imcv2_debs && cd /tmp/imcv2_debs && "
+                      "dpkg-query -W -f='${binary:Package}=${Version}\\n' | "
+                      "xargs -r -n 1 -P 8 apt-get download -q >/dev/null 2>&1; "
+                      "tar -cf - *.deb; status=$?; cd / && rm -rf /tmp/imcv2_debs; exit $status"]),
+                ]
+
+            # Execute each step, applying its policy
+            wsl_runner_run_steps(steps_commands, new_line=new_line)
+
+            archive.writestr(IMCV2_WSL_BUNDLE_INDEX, json.dumps(index, indent=2))
+
+        os.replace(partial, bundle_path)
+
+        # Published next to the bundle, lets clients update an older copy using block level deltas
+        if wsl_runner_write_block_index(bundle_path) != 0:
+            raise StepError(f"Failed to index bundle '{bundle_path}'")
+
+    except (OSError, zipfile.BadZipFile) as e:
+        raise StepError(f"Failed to create bundle '{bundle_path}': {e}")
+    finally:
+        with suppress(OSError):
+            os.remove(partial)
+
+    wsl_runner_print_status(TextType.BOTH, f"Bundle created ({bundle_path})", True, InfoType.DONE)
+
+
+def wsl_runner_check_installed(print_version: bool = False, wsl_major_required: int = 2, configure: bool = True):
     """
     Checks if WSL is installed and whether the required WSL major version is available.
 
     Args:
         print_version (bool): Whether to print the version details.
         wsl_major_required (int): Required major version of WSL.
+        configure (bool): If True, the '.wslconfig' file is sized for this host once the version is confirmed.
 
     Returns:
         int: zero if the required WSL version is installed, 1 otherwise.
@@ -2101,44 +5318,42 @@ def wsl_runner_check_installed(print_version: bool = False, wsl_major_required:
 
     try:
 
-        args = [
-            "--version"
-        ]
-        result = wsl_runner_exec_process("wsl", args, True, 0)
-        if result is not None:
-            status, ext_status, log_lines = result  # Unpack the tuple
-            if status is not None and log_lines is not None and status == 0:
-
-                if print_version:
-                    print(f"'wsl --version output:")
-                    wsl_runner_print_log(log_lines)
-
-                # Refined regex for version extraction
-                for line in log_lines:
-                    if line.startswith("WSL version:"):
-                        match = re.search(r"WSL version:\s*(\d+)\.", line, re.IGNORECASE)
-                        if match:
-                            wsl_major_version = int(match.group(1))
-                            if print_version:
-                                print(f"Parsed WSL major version: {wsl_major_version}")
-
-                            if wsl_major_version >= wsl_major_required:
-                                # Create a default wsl configuration file
-                                wsl_runner_create_config(force_create=True)
-                                return 0  # WSL version meets the requirement
-                            else:
-                                print(
-                                    f"WSL version {wsl_major_version} is below the required version"
-                                    f" '{wsl_major_required}'.\n"
-                                    f"Command output: {print_version}\n")
-
-                                return 1
-
-                print(f"Error: Unable to find 'WSL version:' in:\n{print_version}\n")
-                return 1
-            else:
-                print(f"Error: WSL command failed with return code {status}.")
-                return 1
+        # 'wsl --version' was executed while collecting the host facts
+        facts = wsl_runner_get_host_facts()
+        status, log_lines = facts.wsl_version_status, facts.wsl_version_lines
+        if status is not None and log_lines is not None and status == 0:
+
+            if print_version:
+                print(f"'wsl --version output:")
+                wsl_runner_print_log(log_lines)
+
+            # Refined regex for version extraction
+            for line in log_lines:
+                if line.startswith("WSL version:"):
+                    match = re.search(r"WSL version:\s*(\d+)\.", line, re.IGNORECASE)
+                    if match:
+                        wsl_major_version = int(match.group(1))
+                        if print_version:
+                            print(f"Parsed WSL major version: {wsl_major_version}")
+
+                        if wsl_major_version >= wsl_major_required:
+                            # Size the WSL virtual machine for this host, keeping any user settings
+                            if configure:
+                                wsl_runner_create_config()
+                            return 0  # WSL version meets the requirement
+                        else:
+                            print(
+                                f"WSL version {wsl_major_version} is below the required version"
+                                f" '{wsl_major_required}'.\n"
+                                f"Command output: {print_version}\n")
+
+                            return 1
+
+            print(f"Error: Unable to find 'WSL version:' in:\n{print_version}\n")
+            return 1
+        else:
+            print(f"Error: WSL command failed with return code {status}.")
+            return 1
 
     except FileNotFoundError:
         print(
@@ -2163,18 +5378,32 @@ def wsl_runner_main() -> int:
     Returns:
         int: Exit code (0 for success, 1 for failure).
     """
+    context = wsl_runner_get_context()
 
-    wsl_runner_set_console_code_page(65001)
-    print("\nInitializing...")
+    startup_timings["Module loaded"] = time.perf_counter() - startup_time
 
-    # Make Windows Terminal as the default terminal
-    wsl_set_win_term_default()
+    # Show a brief version and exit, without loading the arguments parser
+    if len(sys.argv) == 2 and sys.argv[1] in ("-ver", "--version"):
+        print(f"{IMCV2_SCRIPT_NAME} v{IMCV2_SCRIPT_VERSION}\n{IMCV2_SCRIPT_DESCRIPTION}.")
+        return 0
 
     parser = argparse.ArgumentParser(description="IMCV2 WSL Runner")
     parser.add_argument("-n", "--name",
                         help="Name of the WSL instance to create (e.g., 'IMCV2').")
-    parser.add_argument("-t", "--start_step", type=int, default=0,
-                        help="Start execution from a specific step other than 0.")
+    parser.add_argument("-t", "--start_step", default="0",
+                        help="Start execution from a specific step (index or name) other than 0.")
+    parser.add_argument("-z", "--time_zone",
+                        help="Specify the instance time zone (e.g. 'Europe/Berlin') instead of the host time zone.")
+    parser.add_argument("--plan", nargs="?", const="",
+                        help="Print the execution plan (steps, downloads, restarts and predicted durations) without "
+                             "provisioning, optionally saving it as JSON to the given file. Nothing is downloaded "
+                             "except the Ubuntu package indexes, refreshed in the cache for the size estimate.")
+    parser.add_argument("-r", "--resume", action="store_true",
+                        help="Continue after the last completed sub-step of the previous run, re-running "
+                             "sub-steps whose definition changed.")
+    parser.add_argument("--durable_io", action="store_true",
+                        help="Install packages with the default dpkg settings (fsync per file, triggers per "
+                             "package, documentation unpacked) instead of the faster provisioning ones.")
     parser.add_argument("-b", "--base_path",
                         help=f"Specify alternate base local path to use instead of "
                              f"'{IMCV2_WSL_DEFAULT_BASE_PATH}'.")
@@ -2184,33 +5413,83 @@ def wsl_runner_main() -> int:
     parser.add_argument("-u", "--ubuntu_url",
                         help=f"Specify a URL for a bare Ubuntu image instead of "
                              f"'{IMCV2_WSL_DEFAULT_UBUNTU_URL}'.")
+    parser.add_argument("-M", "--mirror",
+                        help="Local Ubuntu mirror (e.g. 'http://mirror.example.com/ubuntu') benchmarked along "
+                             "with the public ones.")
+    parser.add_argument("-V", "--vhd",
+                        help="Import a prepared ext4 VHDX (local path or URL) instead of the Ubuntu image.")
     parser.add_argument("-p", "--password",
                         help=f"Specify the initial user password instead of  "
                              f"'{IMCV2_WSL_DEFAULT_PASSWORD}'.")
+    parser.add_argument("-P", "--probe_timeout", type=float, default=IMCV2_WSL_DEFAULT_PROBE_TIMEOUT,
+                        help=f"Seconds allowed for the proxy / direct route probe instead of "
+                             f"'{IMCV2_WSL_DEFAULT_PROBE_TIMEOUT}'.")
+    parser.add_argument("-B", "--bundle",
+                        help="Provision offline from a bundle created with '--make_bundle' (local path or URL).")
+    parser.add_argument("-m", "--make_bundle",
+                        help="Create an offline bundle at the given path and exit. Guest artifacts (pyenv, "
+                             "packages) are included when an existing instance is given with '-n'.")
+    parser.add_argument("--bundle_debs", action="store_true",
+                        help="Include the instance .deb set and APT package lists in the bundle.")
+    parser.add_argument("-R", "--resources",
+                        help="Use the resources from a local directory (e.g. kept by the launcher) instead of "
+                             "downloading them.")
+    parser.add_argument("--minimize_packages",
+                        help="Write the minimal top-level set of the packages list to the given file, report the "
+                             "sizes saved and exit.")
+    parser.add_argument("--make_block_index",
+                        help="Write the block index used for delta updates next to the given artifact and exit.")
+    parser.add_argument("--check_pins", nargs="?", const="",
+                        help="Verify the pinned resource digests against a local 'resources' directory (defaults to "
+                             "the one of this checkout) and exit.")
     parser.add_argument("-H", "--hidden", action="store_false", help=f"Sets to disable the default hidden mode.")
+    parser.add_argument("--profile_startup", action="store_true",
+                        help="Print the startup milestones and the time taken by deferred imports on exit.")
 
     parser.add_argument("-ver", "--version", action="store_true", help="Display version information.")
     args = parser.parse_args()
+    startup_timings["Arguments parsed"] = time.perf_counter() - startup_time
 
     # Show a brief version and exit
     if args.version:
         print(f"{IMCV2_SCRIPT_NAME} v{IMCV2_SCRIPT_VERSION}\n{IMCV2_SCRIPT_DESCRIPTION}.")
         return 0
 
+    if args.profile_startup:
+        atexit.register(wsl_runner_print_startup_profile)
+
+    # Maintainer check, runs on any host (e.g. before pushing a change to 'resources')
+    if args.check_pins is not None:
+        return wsl_runner_check_resource_pins(args.check_pins)
+
+    if winreg is None:
+        raise EnvironmentError("This script must be run on Windows.")
+
+    wsl_runner_set_console_code_page(65001)
+    print("\nInitializing...")
+
+    # Publisher side of the delta updates, e.g. for a prepared VHDX
+    if args.make_block_index:
+        return wsl_runner_write_block_index(args.make_block_index)
+
     # Must not be administrators
     if wsl_runner_is_admin() == 0:
         print("Warnning: This installer is not intended to be executed with Administrator privileges.\n"
               "Please open a new 'Windows Terminal' as a regular user and try again.")
         # return 1
 
-    if not args.name:
+    if not args.name and not args.make_bundle:
         print("Error: Instance name argument (-n) is mandatory.")
         return 1
 
+    if args.plan is not None and args.make_bundle:
+        print("Error: The plan and make bundle options can't be combined.")
+        return 1
+
     username = os.getlogin()
     instance_name = args.name
-    global intel_proxy_detected
-    global spinner_disabled
+
+    context.local_resources_path = args.resources
 
     # Set variables based on default are arguments if provided
     password = args.password if args.password else IMCV2_WSL_DEFAULT_PASSWORD
@@ -2218,83 +5497,216 @@ def wsl_runner_main() -> int:
     proxy_server = args.proxy_server if args.proxy_server else IMCV2_WSL_DEFAULT_INTEL_PROXY
     ubuntu_url = args.ubuntu_url if args.ubuntu_url else IMCV2_WSL_DEFAULT_UBUNTU_URL
     instance_path = os.path.join(base_path, IMCV2_WSL_DEFAULT_SDK_INSTANCES_PATH)
+    cache_path = os.path.join(base_path, IMCV2_WSL_DEFAULT_CACHE_PATH)
+    resources_path = wsl_runner_get_resources_path(base_path)
     bare_linux_image_path = os.path.join(base_path, IMCV2_WSL_DEFAULT_LINUX_IMAGE_PATH)
 
-    # Construct file paths
+    # Durations of previous runs tighten the step time limits
+    wsl_runner_load_step_timings(cache_path)
+
+    # Construct file paths, a previously staged image is used as-is, otherwise the image is streamed from the URL
     bare_linux_image_file = os.path.join(bare_linux_image_path, os.path.basename(urlparse(ubuntu_url).path))
+    image_source = args.vhd if args.vhd else (
+        bare_linux_image_file if os.path.isfile(bare_linux_image_file) else ubuntu_url)
 
     try:
 
+        # Collect the host facts, the network route is probed concurrently
+        facts = wsl_runner_get_host_facts(proxy_server, probe_timeout=args.probe_timeout, cache_path=cache_path)
+
         # This script is designed to work at Intel
-        if not wsl_runner_is_proxy_available(proxy_server):
+        if not facts.proxy_available:
             wsl_runner_print_status(TextType.BOTH, "Intel proxy is not available", True, InfoType.WARNING)
-            intel_proxy_detected = False
+            context.intel_proxy_detected = False
 
-        # Make suer we have enough free disk spae
-        if wsl_runner_get_free_disk_space(os.environ["USERPROFILE"]) < IMCV2_WSL_DEFAULT_MIN_FREE_SPACE:
-            wsl_runner_print_status(TextType.BOTH, "Insufficient free disk space", True, InfoType.ERROR)
-            return 1
-
-        # Make sure we have few essentials tools in the system search path
-        if (wsl_runner_which(["curl"])) == 1:
-            wsl_runner_print_status(TextType.BOTH, "Basic system utilities are missing", True, InfoType.ERROR)
-            return 1
+        # Maintainer tool: reduce the packages list against the package index and the base image
+        if args.minimize_packages:
+            packages_file_name, packages_url = wsl_runner_get_resource_tuple_by_name("Packages list")
+            if (wsl_runner_ensure_directory_exists([resources_path]) != 0 or
+                    wsl_runner_download_resources(packages_url, resources_path, proxy_server) != 0):
+                return 1
+            return wsl_runner_minimize_packages(args.minimize_packages,
+                                                os.path.join(resources_path, packages_file_name),
+                                                bare_linux_image_file if os.path.isfile(bare_linux_image_file)
+                                                else ubuntu_url, cache_path, proxy_server)
 
         # It looks like 'wsl.exe' doesn't like to be executed from non-physical drivers
         wsl_runner_set_home_drive()
 
-        # Make Windows Terminal as the default terminal
-        wsl_set_win_term_default()
+        # Make Windows Terminal as the default terminal, deferred to the plan when planning
+        if args.plan is None:
+            wsl_set_win_term_default()
 
         # If we got the debug flags to show everything and be sure to disable hiding and force new line on everything.
         hidden = bool(args.hidden)  # True if args.hidden is truthy, otherwise False
         new_line = not hidden  # Opposite of hidden
-        spinner_disabled = not hidden  # If not hidden, then no spinner
+        context.spinner_disabled = not hidden  # If not hidden, then no spinner
 
         # WSL version 2 must be installed first, make sure we have it.
-        if wsl_runner_check_installed((not hidden), 2) != 0:
+        if wsl_runner_check_installed((not hidden), 2, configure=args.plan is None) != 0:
             return 1
 
         # Greetings!
         wsl_runner_show_info()
 
+        # Estimate the peak disk footprint, evict old cache content or move the instances when it does not fit
+        packages_file_name, packages_url = wsl_runner_get_resource_tuple_by_name("Packages list")
+        packages_cached = wsl_runner_is_resource_cached(packages_url, resources_path)
+        if not args.bundle and args.plan is None and wsl_runner_ensure_directory_exists([resources_path]) == 0:
+            wsl_runner_download_resources(packages_url, resources_path, proxy_server)
+        artifacts = [os.path.join(cache_path, IMCV2_WSL_DEFAULT_ARTIFACTS_CACHE_PATH,
+                                  os.path.basename(urlparse(url).path))
+                     for url in (args.bundle, args.vhd) if url and urlparse(url).scheme in ("http", "https")]
+        estimate = wsl_runner_estimate_space(os.path.join(resources_path, packages_file_name), cache_path,
+                                             proxy_server, make_bundle=bool(args.make_bundle),
+                                             artifact_sizes=[os.path.getsize(path) for path in artifacts
+                                                             if os.path.isfile(path)],
+                                             offline=bool(args.bundle))
+        if args.plan is not None:
+            # Nothing is evicted or moved while planning, the remaining steps only build the plan
+            context.plan = {"steps": [], "downloads": {}, "proxy_server": proxy_server,
+                            "packages": estimate["packages"], "host_changes": [],
+                            "package_bytes": 0 if args.bundle else estimate["download"],
+                            "space": {"needed": estimate["instance"] + estimate["cache"],
+                                      "free": max(0, wsl_runner_get_free_disk_space(instance_path))}}
+            space_path = instance_path
+
+            # Host settings and the packages list download are only reported
+            wsl_set_win_term_default()
+            wsl_runner_create_config()
+            if not args.bundle and not packages_cached:
+                wsl_runner_plan_download("Packages list", packages_url, proxy_server)
+        else:
+            space_path = wsl_runner_plan_space(estimate, instance_path, cache_path, relocate=not args.base_path,
+                                               keep=artifacts + [path for path in (args.bundle, args.vhd) if path])
+        if space_path is None:
+            wsl_runner_print_status(TextType.BOTH, f"Insufficient free disk space "
+                                                   f"({(estimate['instance'] + estimate['cache']) / 1024 ** 3:.1f} "
+                                                   f"GB needed)", True, InfoType.ERROR)
+            return 1
+        if space_path != instance_path:
+            instance_path = space_path
+            wsl_runner_print_status(TextType.BOTH, f"Low disk space, using '{instance_path}'", True,
+                                    InfoType.WARNING)
+
+        if args.make_bundle:
+            run_make_bundle_steps(args.make_bundle, ubuntu_url, proxy_server, resources_path, instance_name,
+                                  username, args.bundle_debs, new_line)
+            if not hidden:
+                wsl_runner_print_http_timings()
+            return 0
+
+        # Remote bundles and prepared VHDX images are kept in the cache and updated using block level deltas.
+        # While planning, they are counted as full downloads and the cached copies (if any) are used.
+        for name, url in (("Offline bundle", args.bundle), ("VHDX image", args.vhd)):
+            if not url or urlparse(url).scheme not in ("http", "https"):
+                continue
+            if context.plan is not None:
+                wsl_runner_plan_download(name, url, proxy_server)
+                local_path = os.path.join(cache_path, IMCV2_WSL_DEFAULT_ARTIFACTS_CACHE_PATH,
+                                          os.path.basename(urlparse(url).path))
+                local_path = local_path if os.path.isfile(local_path) else None
+            else:
+                local_path = wsl_runner_sync_artifact(url, cache_path, proxy_server)
+            if url == args.bundle:
+                args.bundle = local_path
+            else:
+                image_source = local_path if local_path else url
+
+        # Everything the bundle holds is served from it from here on
+        if args.bundle and wsl_runner_open_bundle(args.bundle) != 0:
+            return 1
+
+        # The host time zone unless one was given
+        time_zone = wsl_runner_get_time_zone(args.time_zone)
+
+        # The fastest Ubuntu mirror for this network (measured once and cached) and the Ubuntu image digest,
+        # published next to it, are fetched at the same time. Prepared VHDX images are not verified.
+        # While planning, only a previous choice is used and a pending benchmark is reported.
+        if context.plan is not None:
+            mirror = wsl_runner_get_cached_mirror(proxy_server, cache_path, args.mirror)
+            context.plan["mirror"] = {"url": mirror if mirror else IMCV2_WSL_DEFAULT_UBUNTU_MIRROR,
+                                      "benchmark": mirror is None}
+            mirror, image_sha256 = context.plan["mirror"]["url"], None
+        else:
+            engine = wsl_runner_get_async_engine()
+            tasks = [engine.run_function(wsl_runner_select_mirror, [proxy_server, cache_path, args.mirror],
+                                         resource="network")]
+            if not args.vhd:
+                tasks.append(engine.run_function(wsl_runner_get_image_sha256, [ubuntu_url, proxy_server],
+                                                 resource="network"))
+            mirror, image_sha256 = (engine.run_all(tasks) + [None])[:2]
+
         # Define all steps as a list of tuples (step_name, function_call)
         steps = [
             ("Pre-prerequisites",
-             lambda: run_pre_prerequisites_local_steps(instance_path, bare_linux_image_path, ubuntu_url,
-                                                       proxy_server)),
-            ("Initial setup", lambda: run_initial_setup_steps(instance_name, instance_path,
-                                                              bare_linux_image_file, hidden, new_line)),
+             lambda: run_pre_prerequisites_local_steps(instance_path, bare_linux_image_path, proxy_server,
+                                                       resources_path=resources_path)),
+            ("Initial setup", lambda: run_initial_setup_steps(instance_name, instance_path, image_source,
+                                                              hidden, new_line, proxy_server, bool(args.vhd),
+                                                              image_sha256, cache_path, mirror)),
             ("User creation", lambda: run_user_creation_steps(instance_name, username, password, hidden, new_line)),
-            ("User shell setup", lambda: run_user_shell_steps(instance_name, username, proxy_server, hidden, new_line)),
-            ("Time zone setup", lambda: run_time_zone_steps(instance_name, hidden, new_line)),
-            ("Kerberos setup", lambda: run_kerberos_steps(instance_name, hidden, new_line)),
+            ("User shell setup", lambda: run_user_shell_steps(instance_name, username, proxy_server, hidden, new_line,
+                                                              resources_path)),
+            ("System preseed", lambda: run_preseed_steps(instance_name, time_zone, hidden, new_line)),
             ("Install system packages", lambda: run_install_system_packages(instance_name, username,
-                                                                            proxy_server, hidden, new_line)),
+                                                                            proxy_server, hidden, new_line,
+                                                                            resources_path=resources_path,
+                                                                            durable_io=args.durable_io)),
             ("Install git configuration", lambda: run_install_git_config(instance_name, username,
-                                                                         proxy_server, hidden, new_line)),
-            ("Install pyenv", lambda: run_install_pyenv(instance_name, username, proxy_server, hidden, new_line)),
+                                                                         proxy_server, hidden, new_line,
+                                                                         resources_path)),
+            ("Install pyenv", lambda: run_install_pyenv(instance_name, username, proxy_server, hidden, new_line,
+                                                        resources_path)),
             ("Post-install steps",
-             lambda: run_post_install_steps(instance_name, username, proxy_server, hidden, new_line)),
-            ("Create desktop shortcut", lambda: wsl_runner_create_shortcut(instance_name, instance_path,
-                                                                           f"{instance_name} SDK")),
+             lambda: run_post_install_steps(instance_name, username, proxy_server, hidden, new_line,
+                                            resources_path)),
+            ("Compact instance disk", lambda: run_compact_steps(instance_name, instance_path, username,
+                                                                hidden, new_line)),
+            ("Create desktop shortcut", lambda: wsl_runner_run_steps(
+                [("Creating desktop shortcut", wsl_runner_create_shortcut,
+                  [instance_name, instance_path, f"{instance_name} SDK"], True)], hidden, new_line)),
         ]
 
-        # Execute steps from the specified starting point
-        if args.start_step < 0 or args.start_step >= len(steps):
-            raise ValueError(f"Invalid start step: {args.start_step}. Must be between 0 and {len(steps) - 1}.")
-
-        print("\033[?25l")  # Hide the cursor
-        wsl_runner_delete_shortcut(f"{instance_name} SDK")  # Remove current shortcut (if exist)
-
-        for i, (step_name, step_function) in enumerate(steps[args.start_step:], start=args.start_step):
+        # Execute steps from the specified starting point, given by index or by name
+        step_names = [step_name.lower() for step_name, step_function in steps]
+        if args.start_step.isdigit():
+            start_step = int(args.start_step)
+        else:
+            start_step = step_names.index(args.start_step.lower()) if args.start_step.lower() in step_names else -1
+        if start_step < 0 or start_step >= len(steps):
+            raise ValueError(f"Invalid start step: {args.start_step}. Must be between 0 and {len(steps) - 1} "
+                             f"or one of: {', '.join(step_name for step_name, step_function in steps)}.")
+        if args.resume and start_step:
+            raise ValueError("The start step and resume options can't be combined.")
+
+        # Sub-steps are recorded as they complete, so that '--resume' continues right after the last one
+        wsl_runner_open_journal(os.path.join(cache_path, "journal", f"{instance_name}.jsonl"), args.resume,
+                                [step_name for step_name, step_function in steps[:start_step]])
+
+        if context.plan is None:
+            print("\033[?25l")  # Hide the cursor
+            wsl_runner_delete_shortcut(f"{instance_name} SDK")  # Remove current shortcut (if exist)
+
+        for i, (step_name, step_function) in enumerate(steps[start_step:], start=start_step):
             # Printing everything for debugging can be useful to track the step number.
-            # Later, we could implement the option -t <number> to execute only that specific step.
-            if not hidden:
-                print(f"\nStarting step {i}:\n")
+            if not hidden and context.plan is None:
+                print(f"\nStarting step {i} ({step_name}):\n")
 
+            context.journal["group"] = step_name
             step_function()
 
+        if context.plan is not None:
+            wsl_runner_print_plan(args.plan)
+            return 0
+
+        # Package installations of later plans are scaled by the size of the packages list
+        wsl_runner_record_run_metric("Packages", estimate["packages"])
+
+        # Per-request network timings help diagnose slow proxies
+        if not hidden:
+            wsl_runner_print_http_timings()
+
         # Silently attempt to map a drive letter
         wsl_runner_map_instance(IMCV2_WSL_DEFAULT_DRIVE_LETTER, instance_name, False)
 
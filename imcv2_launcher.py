@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+"""
+Script:       imcv2_launcher.py
+Author:       Intel IMCv2 Team
+Version:      1.0
+
+Description:
+Runs the IMCv2 WSL image creator from a versioned local copy, so that repeated runs and '-t' resumes
+start without depending on the network. It performs the following steps:
+
+1. Resolves the tracked Git reference (the 'main' branch unless pinned) to a commit using a single
+   conditional request. No request is made within the revalidation TTL, when pinned to a commit or when resuming
+   ('-t' or '--resume').
+2. Downloads the creator and its 'resources' directory for that commit once, into
+   '<base path>\\Launcher\\versions\\<commit>', keeping the few most recent versions.
+3. Installs itself next to the versions and runs the local creator with the remaining arguments,
+   its resources being served from the local copy.
+
+Usage:
+    python imcv2_launcher.py -n <InstanceName> [creator arguments]
+
+Arguments (any other argument is passed to the creator):
+    --pin <ref>         Pin a branch, tag or commit, kept until '--unpin' is used.
+    --unpin             Track the 'main' branch again.
+    --ttl <seconds>     Skip the revalidation when the last one is more recent (default 3600).
+    --refresh           Revalidate now, regardless of the TTL.
+
+Dependencies:
+- Python 3.x
+
+Notes:
+- This script is designed for internal use by the Intel IMCv2 team.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from contextlib import suppress
+from typing import Optional
+
+IMCV2_LAUNCHER_REPOSITORY = "emichael72/wsl_starter"
+IMCV2_LAUNCHER_DEFAULT_REF = "main"
+IMCV2_LAUNCHER_DEFAULT_BASE_PATH = os.path.join(os.environ.get("USERPROFILE", os.path.expanduser("~")), "IMCV2_SDK")
+IMCV2_LAUNCHER_DEFAULT_INTEL_PROXY = "http://proxy-dmz.intel.com:911"
+IMCV2_LAUNCHER_DEFAULT_PATH = "Launcher"
+IMCV2_LAUNCHER_DEFAULT_TTL = 3600  # Seconds a resolved reference is used without revalidation
+IMCV2_LAUNCHER_DEFAULT_VERSIONS = 3  # Local versions kept
+IMCV2_LAUNCHER_DEFAULT_TIMEOUT = 15
+IMCV2_LAUNCHER_STATE = "launcher.json"
+IMCV2_LAUNCHER_CREATOR = "imcv2_image_creator.py"
+IMCV2_LAUNCHER_SCRIPT = "imcv2_launcher.py"
+IMCV2_LAUNCHER_RESOURCES = "resources"
+
+
+def wsl_launcher_load_state(launcher_path: str) -> dict:
+    """
+    Loads the launcher state: the pinned reference and the commit each reference last resolved to.
+
+    Args:
+        launcher_path (str): The launcher directory.
+
+    Returns:
+        dict: The state, empty when missing or unreadable.
+    """
+    with suppress(OSError, ValueError):
+        with open(os.path.join(launcher_path, IMCV2_LAUNCHER_STATE), "r") as file:
+            state = json.load(file)
+            if isinstance(state, dict):
+                return state
+    return {}
+
+
+def wsl_launcher_save_state(launcher_path: str, state: dict):
+    """
+    Saves the launcher state.
+
+    Args:
+        launcher_path (str): The launcher directory.
+        state (dict): The state to save.
+    """
+    state_file = os.path.join(launcher_path, IMCV2_LAUNCHER_STATE)
+    with suppress(OSError):
+        with open(state_file + ".tmp", "w") as file:
+            json.dump(state, file, indent=2)
+        os.replace(state_file + ".tmp", state_file)
+
+
+def wsl_launcher_open(url: str, proxy_server: Optional[str], headers: Optional[dict] = None):
+    """
+    Sends a GET request through the proxy, falling back to a direct connection when the proxy is not reachable.
+
+    Args:
+        url (str): The URL to fetch.
+        proxy_server (str, optional): The proxy server to try first.
+        headers (dict, optional): Extra request headers.
+
+    Returns:
+        The response, to be closed by the caller.
+
+    Raises:
+        urllib.error.HTTPError: If the server answered with a non-success status (including 304).
+        OSError: If the URL could not be reached.
+    """
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(url, headers=dict(headers or {}, **{"User-Agent": "IMCv2 Launcher"}))
+    routes = [proxy_server, None] if proxy_server else [None]
+    error = OSError(f"Could not reach '{url}'")
+    for route in routes:
+        proxies = {"http": route, "https": route} if route else {}
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler(proxies))
+        try:
+            return opener.open(request, timeout=IMCV2_LAUNCHER_DEFAULT_TIMEOUT)
+        except urllib.error.HTTPError:
+            raise
+        except OSError as e:
+            error = e
+
+    raise error
+
+
+def wsl_launcher_resolve(ref: str, state: dict, proxy_server: Optional[str]) -> Optional[str]:
+    """
+    Resolves a Git reference to a commit with a conditional request, updating the state.
+
+    Args:
+        ref (str): Branch, tag or commit.
+        state (dict): The launcher state, its 'refs' entry is updated.
+        proxy_server (str, optional): The proxy server to use.
+
+    Returns:
+        str: The commit, None if it could not be resolved.
+    """
+    import urllib.error
+
+    entry = state.setdefault("refs", {}).setdefault(ref, {})
+    headers = {"Accept": "application/vnd.github.sha"}
+    if entry.get("etag") and entry.get("commit"):
+        headers["If-None-Match"] = entry["etag"]
+
+    try:
+        with wsl_launcher_open(f"https://api.github.com/repos/{IMCV2_LAUNCHER_REPOSITORY}/commits/{ref}",
+                               proxy_server, headers) as response:
+            commit = response.read().decode("ascii", "replace").strip()
+            etag = response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            print(f"Warning: Could not resolve '{ref}': {e}")
+            return None
+        commit, etag = entry["commit"], entry["etag"]
+    except OSError as e:
+        print(f"Warning: Could not resolve '{ref}': {e}")
+        return None
+
+    if not re.fullmatch(r"[0-9a-f]{40}", commit):
+        print(f"Warning: Unexpected answer while resolving '{ref}'.")
+        return None
+
+    entry.update({"commit": commit, "etag": etag, "checked": time.time()})
+    return commit
+
+
+def wsl_launcher_fetch_version(commit: str, versions_path: str, proxy_server: Optional[str]) -> int:
+    """
+    Downloads the creator, the launcher and the resources of a commit into their version directory.
+    The version directory only appears once complete.
+
+    Args:
+        commit (str): The commit.
+        versions_path (str): The directory holding the versions.
+        proxy_server (str, optional): The proxy server to use.
+
+    Returns:
+        int: 0 on success, 1 otherwise.
+    """
+    import tarfile
+
+    version_path = os.path.join(versions_path, commit)
+    partial = version_path + ".part"
+    shutil.rmtree(partial, ignore_errors=True)
+
+    try:
+        with wsl_launcher_open(f"https://codeload.github.com/{IMCV2_LAUNCHER_REPOSITORY}/tar.gz/{commit}",
+                               proxy_server) as response, tarfile.open(fileobj=response, mode="r|gz") as archive:
+            for member in archive:
+                # Members are '<repository>-<commit>/<path>', only the files the creator needs are kept
+                path = member.name.split("/", 1)[-1]
+                parts = path.split("/")
+                if not member.isfile() or ".." in parts or not (
+                        path in (IMCV2_LAUNCHER_CREATOR, IMCV2_LAUNCHER_SCRIPT) or
+                        (len(parts) == 2 and parts[0] == IMCV2_LAUNCHER_RESOURCES)):
+                    continue
+
+                destination = os.path.join(partial, *parts)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                with archive.extractfile(member) as source, open(destination, "wb") as file:
+                    shutil.copyfileobj(source, file)
+
+        if not os.path.isfile(os.path.join(partial, IMCV2_LAUNCHER_CREATOR)):
+            raise ValueError(f"'{IMCV2_LAUNCHER_CREATOR}' is missing")
+        os.replace(partial, version_path)
+
+    except (OSError, ValueError, tarfile.TarError) as e:
+        print(f"Error: Failed to download version '{commit[:12]}': {e}")
+        shutil.rmtree(partial, ignore_errors=True)
+        return 1
+
+    return 0
+
+
+def wsl_launcher_prune_versions(versions_path: str, keep: list):
+    """
+    Removes the least recently used versions beyond IMCV2_LAUNCHER_DEFAULT_VERSIONS.
+
+    Args:
+        versions_path (str): The directory holding the versions.
+        keep (list): Commits that must not be removed.
+    """
+    with suppress(OSError):
+        versions = sorted((entry for entry in os.scandir(versions_path) if entry.is_dir()),
+                          key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in versions[IMCV2_LAUNCHER_DEFAULT_VERSIONS:]:
+            if entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def wsl_launcher_install(version_path: str, launcher_path: str):
+    """
+    Installs the launcher of the running version into the launcher directory, so later runs can start locally.
+
+    Args:
+        version_path (str): The version directory.
+        launcher_path (str): The launcher directory.
+    """
+    source = os.path.join(version_path, IMCV2_LAUNCHER_SCRIPT)
+    destination = os.path.join(launcher_path, IMCV2_LAUNCHER_SCRIPT)
+    with suppress(OSError):
+        with open(source, "rb") as file:
+            content = file.read()
+        if os.path.isfile(destination):
+            with open(destination, "rb") as file:
+                if file.read() == content:
+                    return
+        else:
+            print(f"Launcher installed, next time run: python \"{destination}\" -n <InstanceName>")
+
+        with open(destination + ".tmp", "wb") as file:
+            file.write(content)
+        os.replace(destination + ".tmp", destination)
+
+
+def wsl_launcher_main() -> int:
+    """
+    Main entry point of the launcher.
+    Selects the local version to run, updating it when needed, and runs its creator with the remaining arguments.
+
+    Returns:
+        int: Exit code (0 for success, 1 for failure).
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--pin")
+    parser.add_argument("--unpin", action="store_true")
+    parser.add_argument("--ttl", type=float, default=IMCV2_LAUNCHER_DEFAULT_TTL)
+    parser.add_argument("--refresh", action="store_true")
+    args, creator_args = parser.parse_known_args()
+
+    # The creator's base path, proxy and resume options also apply here
+    creator_parser = argparse.ArgumentParser(add_help=False)
+    creator_parser.add_argument("-b", "--base_path", default=IMCV2_LAUNCHER_DEFAULT_BASE_PATH)
+    creator_parser.add_argument("-s", "--proxy_server", default=IMCV2_LAUNCHER_DEFAULT_INTEL_PROXY)
+    creator_parser.add_argument("-t", "--start_step", default="0")
+    creator_parser.add_argument("-r", "--resume", action="store_true")
+    known = creator_parser.parse_known_args(creator_args)[0]
+
+    launcher_path = os.path.join(known.base_path, IMCV2_LAUNCHER_DEFAULT_PATH)
+    versions_path = os.path.join(launcher_path, "versions")
+    os.makedirs(versions_path, exist_ok=True)
+
+    state = wsl_launcher_load_state(launcher_path)
+    if args.unpin:
+        state.pop("pin", None)
+    if args.pin:
+        state["pin"] = args.pin
+    ref = state.get("pin") or IMCV2_LAUNCHER_DEFAULT_REF
+
+    # Commits never change, resumes keep the version they started with, and recent checks are trusted
+    entry = state.get("refs", {}).get(ref, {})
+    commit = ref if re.fullmatch(r"[0-9a-f]{40}", ref) else entry.get("commit")
+    if (known.resume or known.start_step != "0") and state.get("last") and not args.pin and not args.refresh:
+        commit = state["last"]
+    elif commit != ref and (args.refresh or not commit or time.time() - entry.get("checked", 0) >= args.ttl or
+                            not os.path.isdir(os.path.join(versions_path, commit))):
+        # Offline, the previously resolved version is used
+        commit = wsl_launcher_resolve(ref, state, known.proxy_server) or commit
+
+    if not commit:
+        print(f"Error: '{ref}' could not be resolved and no local version is available.")
+        return 1
+
+    version_path = os.path.join(versions_path, commit)
+    if not os.path.isdir(version_path) and wsl_launcher_fetch_version(commit, versions_path, known.proxy_server) != 0:
+        return 1
+
+    state["last"] = commit
+    wsl_launcher_save_state(launcher_path, state)
+    with suppress(OSError):
+        os.utime(version_path)
+    wsl_launcher_prune_versions(versions_path, [commit])
+    wsl_launcher_install(version_path, launcher_path)
+
+    # Imported rather than executed, so its compiled code is cached next to it
+    import runpy
+
+    sys.argv = [os.path.join(version_path, IMCV2_LAUNCHER_CREATOR)] + creator_args + [
+        "--resources", os.path.join(version_path, IMCV2_LAUNCHER_RESOURCES)]
+    sys.path.insert(0, version_path)
+    try:
+        runpy.run_module(os.path.splitext(IMCV2_LAUNCHER_CREATOR)[0], run_name="__main__", alter_sys=True)
+    except SystemExit as exit_request:
+        return exit_request.code if isinstance(exit_request.code, int) else 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(wsl_launcher_main())
@@ -9,14 +9,23 @@
 #
 # Script Name:  imcv2_sdk_runner.sh
 # Description:  IMCv2 SDK for WSL auto-runner and maintenance script.
-# Version:      1.6
+# Version:      1.7
 # Copyright:    2024 Intel Corporation.
 # Author:       Intel IMCv2 Team.
 #
 # ------------------------------------------------------------------------------
 
 # Script global variables
-script_version="1.6"
+script_version="1.7"
+runner_start_time="${EPOCHREALTIME:-}"
+runner_timing="${IMCV2_RUNNER_TIMING:-0}"
+runner_stamp_file="$HOME/.imcv2/.runner_stamp"
+runner_token_cache="$HOME/.imcv2/.token_cache"
+runner_github_url="https://github.com/intel-innersource/firmware.ethernet.imcv2"
+runner_token=""
+runner_drive_letter="${IMCV2_DRIVE_LETTER:-W}"
+runner_drive_distro="${IMCV2_DRIVE_DISTRO:-IMCv2}"
+runner_drive_cache="$HOME/.imcv2/.drive_cache"
 
 #
 # @brief Detects the current Linux distribution and returns its name in lowercase.
@@ -42,6 +51,76 @@ runner_get_distro() {
 	return 0
 }
 
+#
+# @brief Checks whether the instance drive letter is mapped on the Windows side.
+# @details
+# - A positive result is cached for IMCV2_DRIVE_CACHE_TTL seconds (default 300).
+# - The drive is probed through a /mnt/<letter> mount first and 'cmd.exe' next, both of
+#   which are much cheaper than starting PowerShell. An empty automount directory does
+#   not count as mapped.
+# @return 0 if the drive is mapped, 1 otherwise.
+#
+
+runner_is_drive_mapped() {
+
+	local ttl="${IMCV2_DRIVE_CACHE_TTL:-300}"
+	local now="${EPOCHSECONDS:-$(date +%s)}"
+	local checked
+	local probe
+
+	if [[ -f "$runner_drive_cache" ]] && read -r checked <"$runner_drive_cache" 2>/dev/null; then
+		if [[ "$checked" =~ ^[0-9]+$ && $((now - checked)) -lt $ttl ]]; then
+			return 0
+		fi
+	fi
+
+	if mountpoint -q "/mnt/${runner_drive_letter,,}" 2>/dev/null; then
+		probe="1"
+	else
+		# Run from a Windows path, 'cmd.exe' refuses UNC working directories
+		probe=$(cd /mnt/c 2>/dev/null && cmd.exe /d /c "if exist ${runner_drive_letter}:\\ (echo 1) else (echo 0)" 2>/dev/null)
+		probe="${probe//[$'\r\n ']/}"
+	fi
+
+	if [[ "$probe" != "1" ]]; then
+		rm -f "$runner_drive_cache" >/dev/null 2>&1
+		return 1
+	fi
+
+	mkdir -p "$(dirname "$runner_drive_cache")" 2>/dev/null
+	printf "%s\n" "$now" >"$runner_drive_cache" 2>/dev/null
+	return 0
+}
+
+#
+# @brief Converts resolved Linux paths to their Windows form without spawning 'wslpath'.
+# @details
+# - /mnt/<letter>/... paths are converted to <LETTER>:\...
+# - Paths of the instance the drive letter is mapped to are converted to <drive>:\...
+# - Paths of any other instance are converted to \\wsl.localhost\<distro>\...
+# @param[in] 1 Absolute Linux path.
+# @return Always returns 0, the converted path is stored in 'runner_win_path'.
+#
+
+runner_to_win_path() {
+
+	local path="$1"
+	local letter
+
+	if [[ "$path" =~ ^/mnt/([a-zA-Z])(/.*)?$ ]]; then
+		letter="${BASH_REMATCH[1]}"
+		path="${BASH_REMATCH[2]}"
+		runner_win_path="${letter^^}:${path//\//\\}"
+		[[ -n "$path" ]] || runner_win_path+="\\"
+	elif [[ "$WSL_DISTRO_NAME" == "$runner_drive_distro" ]]; then
+		runner_win_path="${runner_drive_letter}:${path//\//\\}"
+	else
+		runner_win_path="\\\\wsl.localhost\\${WSL_DISTRO_NAME}${path//\//\\}"
+	fi
+
+	return 0
+}
+
 #
 # @brief Launches a command in the background with fully suppressed output and job notifications.
 #        This function is 'WSL-aware', meaning the arguments will be translated to Windows paths prior to execution
@@ -63,22 +142,33 @@ runner_launch() {
 	shift
 
 	# Check if running under WSL
-	if [[ "$(runner_get_distro)" == "wsl" ]]; then
-		# Check if W: is accessible
-		if ! powershell.exe -Command "Test-Path W:\\" | grep -q True; then
-			echo "Error: W: drive not found. Ensure it is correctly mapped."
+	if [[ -n "$WSL_DISTRO_NAME" || "$(runner_get_distro)" == "wsl" ]]; then
+		# Check if the instance drive is accessible
+		if ! runner_is_drive_mapped; then
+			echo "Error: ${runner_drive_letter}: drive not found. Ensure it is correctly mapped."
 			return 1
 		fi
 
+		# Resolve all arguments at once, fall back to one by one if the output does not line up
+		local resolved=()
+		local index=0
+		if [[ $# -gt 0 ]]; then
+			mapfile -t resolved < <(realpath -m -- "$@" 2>/dev/null)
+			if [[ ${#resolved[@]} -ne $# ]]; then
+				resolved=()
+				for arg in "$@"; do
+					resolved+=("$(realpath -m -- "$arg" 2>/dev/null)")
+				done
+			fi
+		fi
+
 		converted_args=()
 		for arg in "$@"; do
-			# Resolve the full path
-			full_path=$(realpath "$arg" 2>/dev/null)
-			if [[ -f "$full_path" || -d "$full_path" ]]; then
-				# Replace \\wsl.localhost\IMCv2\ with W:\
-				win_path=$(wslpath -w "$full_path")
-				win_path="${win_path/\\\\wsl.localhost\\IMCv2\\/W:\\}"
-				converted_args+=("$win_path")
+			full_path="${resolved[index]}"
+			index=$((index + 1))
+			if [[ -n "$full_path" && (-f "$full_path" || -d "$full_path") ]]; then
+				runner_to_win_path "$full_path"
+				converted_args+=("$runner_win_path")
 			else
 				converted_args+=("$arg")
 			fi
@@ -272,6 +362,140 @@ $script_path"
 	return 0 # Done
 }
 
+#
+# @brief Records that the auto-runner reached its steady state.
+# @details
+# - Stores the rc file the auto-start line was pinned to along with the script version.
+# - Any later change to either invalidates the stamp and forces the maintenance path again.
+# @return 0 on success, 1 otherwise.
+#
+
+runner_update_stamp() {
+
+	# 'rc_file' is set by runner_pin_auto_start()
+	if [[ -z "$rc_file" ]]; then
+		return 1
+	fi
+
+	mkdir -p "$(dirname "$runner_stamp_file")" 2>/dev/null
+	printf "%s %s\n" "$rc_file" "$script_version" >"$runner_stamp_file" 2>/dev/null || return 1
+	return 0
+}
+
+#
+# @brief Checks, using shell builtins only, whether any maintenance is needed.
+# @details
+# - The SDK must be installed and the stamp written by runner_update_stamp() must exist.
+# - The rc file must not have been modified since the stamp was written, since that
+#   could have displaced the auto-start line.
+# - The stamp must have been written by this script version.
+# @return 0 if the steady-state fast path can be taken, 1 otherwise.
+#
+
+runner_fast_path() {
+
+	local stamp_rc
+	local stamp_version
+
+	if [[ -z "${IMCV2_INSTALL_PATH}" || ! -d "${IMCV2_INSTALL_PATH}" || ! -f "$runner_stamp_file" ]]; then
+		return 1
+	fi
+
+	read -r stamp_rc stamp_version <"$runner_stamp_file" 2>/dev/null || return 1
+
+	if [[ "$stamp_version" != "$script_version" || ! -f "$stamp_rc" || "$stamp_rc" -nt "$runner_stamp_file" ]]; then
+		return 1
+	fi
+
+	return 0
+}
+
+#
+# @brief Prints the time elapsed since the script started when timing is enabled.
+# @details Enabled by '-T, --timing' or by exporting IMCV2_RUNNER_TIMING=1.
+#          Relies on bash's EPOCHREALTIME so that measuring does not fork.
+# @return Always returns 0.
+#
+
+runner_timing_report() {
+
+	local now_us
+	local start_us
+	local elapsed_us
+
+	if [[ "$runner_timing" != "1" || -z "$runner_start_time" ]]; then
+		return 0
+	fi
+
+	now_us="${EPOCHREALTIME/[.,]/}"
+	start_us="${runner_start_time/[.,]/}"
+	elapsed_us=$((10#$now_us - 10#$start_us))
+
+	printf "Auto-runner completed in %d.%03d ms.\n" $((elapsed_us / 1000)) $((elapsed_us % 1000))
+	return 0
+}
+
+#
+# @brief Deletes the cached GitHub token, forcing the next runner_get_token() to ask 'dt'.
+# @return Always returns 0.
+#
+
+runner_invalidate_token() {
+
+	rm -f "$runner_token_cache" >/dev/null 2>&1
+	runner_token=""
+	return 0
+}
+
+#
+# @brief Retrieves a GitHub token using 'dt', reusing a cached token until shortly before it expires.
+# @details
+# - The cache file holds the token expiry (epoch seconds) and the token, readable by the owner only.
+# - 'dt' does not report the token lifetime, IMCV2_TOKEN_TTL seconds (default 3600) is assumed.
+# - A cached token is refreshed IMCV2_TOKEN_MARGIN seconds (default 300) before it expires.
+# @param[in] 1 Path to the 'dt' executable (optional, default 'dt' from the search path).
+# @param[in] 2 Repository URL the token is generated for (optional).
+# @return 0 and sets 'runner_token' on success, 1 otherwise.
+#
+
+runner_get_token() {
+
+	local dt_bin="${1:-dt}"
+	local github_url="${2:-$runner_github_url}"
+	local ttl="${IMCV2_TOKEN_TTL:-3600}"
+	local margin="${IMCV2_TOKEN_MARGIN:-300}"
+	local now="${EPOCHSECONDS:-$(date +%s)}"
+	local expiry
+	local token
+
+	runner_token=""
+
+	# Serve from the cache when the token is not about to expire
+	if [[ -f "$runner_token_cache" ]] && read -r expiry token <"$runner_token_cache" 2>/dev/null; then
+		if [[ -n "$token" && "$expiry" =~ ^[0-9]+$ && $((expiry - margin)) -gt $now ]]; then
+			runner_token="$token"
+			return 0
+		fi
+	fi
+
+	token=$("$dt_bin" github print-token "$github_url" 2>/dev/null)
+	if [[ -z "$token" ]]; then
+		runner_invalidate_token
+		return 1
+	fi
+
+	# Recreate the cache file so it never exists with wider permissions
+	(
+		umask 077
+		mkdir -p "$(dirname "$runner_token_cache")" &&
+			rm -f "$runner_token_cache" &&
+			printf "%s %s\n" "$((now + ttl))" "$token" >"$runner_token_cache"
+	) >/dev/null 2>&1
+
+	runner_token="$token"
+	return 0
+}
+
 #
 # @brief Ensures the 'dt' (devtool) tool is installed and configured for use.
 # Checks if 'dt' is available and attempts to retrieve a GitHub token.
@@ -283,7 +507,6 @@ runner_ensure_dt() {
 
 	local dt_path="/home/$USER/bin/dt"
 	local netrc_path="/home/$USER/.netrc"
-	local github_url="https://github.com/intel-innersource/firmware.ethernet.imcv2"
 	local dt_tool_url="https://gfx-assets.intel.com/artifactory/gfx-build-assets/build-tools/devtool-go/latest/artifacts/linux64/dt"
 	local dt_download_path="$HOME/Downloads/dt"
 	local dt_optional_path="/home/$USER/.imcv2/bin/dt"
@@ -312,8 +535,7 @@ runner_ensure_dt() {
 
 	# Check for .netrc and attempt to get a token
 	if [[ -f "$netrc_path" ]]; then
-		token=$("$dt_path" github print-token "$github_url" 2>/dev/null)
-		if [[ -n "$token" ]]; then
+		if runner_get_token "$dt_path"; then
 			export PATH="/home/$USER/bin:$PATH"
 			return 0
 		fi
@@ -367,9 +589,9 @@ runner_ensure_dt() {
 	# Delete 'dt' installer once we're done with it.
 	rm -rf "$dt_download_path" 2>/dev/null
 
-	# Attempt to generate token again
-	token=$("$dt_path" github print-token "$github_url" 2>/dev/null)
-	if [[ -n "$token" ]]; then
+	# Attempt to generate token again, setup may have replaced the credentials
+	runner_invalidate_token
+	if runner_get_token "$dt_path"; then
 		export PATH="/home/$USER/bin:$PATH"
 
 		# Make sure auto run is the last line
@@ -384,6 +606,7 @@ runner_ensure_dt() {
 	# Delete any residual leftovers generated by 'dt' in the hope that another
 	# attempt will fix the issue.
 	rm -rf "$netrc_path" 2>/dev/null
+	runner_invalidate_token
 
 	# Return the error exit code of the setup command
 	return "$setup_exit_code"
@@ -404,6 +627,7 @@ runner_install_sdk() {
 	local force="${3:-0}"                 # Default to 0 if not provided
 	local netrc_path="/home/$USER/.netrc" # 'dt' auto-login file.
 	local exit_code=0
+	local attempt
 
 	# Check mandatory arguments
 	if [[ -z "$action" || -z "$destination_path" ]]; then
@@ -459,11 +683,22 @@ runner_install_sdk() {
 		curl_output=$(mktemp)
 		curl_error=$(mktemp)
 
-		http_status=$(curl -sSL \
-			-H "Authorization: token $(dt github print-token https://github.com/intel-innersource/firmware.ethernet.imcv2 2>/dev/null)" \
-			-H "Cache-Control: no-store" \
-			-w "%{http_code}" -o "$curl_output" \
-			"https://raw.githubusercontent.com/intel-innersource/firmware.ethernet.imcv2/main/scripts/imcv2_boot_strap.sh" 2>"$curl_error")
+		for attempt in 1 2; do
+			runner_get_token
+
+			http_status=$(curl -sSL \
+				-H "Authorization: token ${runner_token}" \
+				-H "Cache-Control: no-store" \
+				-w "%{http_code}" -o "$curl_output" \
+				"https://raw.githubusercontent.com/intel-innersource/firmware.ethernet.imcv2/main/scripts/imcv2_boot_strap.sh" 2>"$curl_error")
+
+			# A rejected token is dropped from the cache and generated again once
+			if [[ "$http_status" == "401" || "$http_status" == "403" ]]; then
+				runner_invalidate_token
+				continue
+			fi
+			break
+		done
 
 		# Check the HTTP status code
 		if [[ "$http_status" -ne 200 ]]; then
@@ -474,6 +709,7 @@ runner_install_sdk() {
 
 			# Delete the file generated by 'dt', which will force 'dt' to run its setup after reopening the terminal.
 			rm -f "$netrc_path" >/dev/null 2>&1
+			runner_invalidate_token
 			rm -f "$curl_output" "$curl_error" >/dev/null 2>&1
 			sleep 3
 			runner_wsl_reset
@@ -526,6 +762,7 @@ runner_wsl_reset() {
 # - Sets up the IMCv2 environment by creating Git configuration,
 #   ensuring 'dt' are installed, installing the SDK if needed,
 #   and pinning the auto-start configuration.
+# - Once the SDK is installed, later shell starts take a builtins-only fast path.
 # @param "$@" Command-line arguments passed to the script.
 # @return 0 on success, propagates the return value of runner_install_sdk otherwise.
 #
@@ -537,6 +774,7 @@ main() {
 	local ansi_reset="\033[0m"
 	local ansi_yellow="\033[93m"
 	local ret_val=0
+	local pin_status=0
 
 	# Disable globbing in Zsh to avoid issues with -? and --?
 	setopt noglob 2>/dev/null
@@ -552,6 +790,7 @@ main() {
 		printf "  -l, --launch             General purpose WSL specific launcher.\n"
 		printf "  -v, --ver                Prints the 'IMCv2 Runner' script version and exit.\n"
 		printf "  -r, --restart_wsl        Restart the WSL Session.\n"
+		printf "  -T, --timing             Report the auto-runner execution time.\n"
 		printf "\n"
 		exit 0
 	fi
@@ -603,6 +842,10 @@ main() {
 			printf "IMCv2 Runner version ${script_version}\n"
 			exit 0
 			;;
+		-T | --timing)
+			shift
+			runner_timing=1
+			;;
 		-i | --install_path)
 			shift
 			if [[ $# -eq 0 ]]; then
@@ -624,12 +867,23 @@ main() {
 		esac
 	done
 
+	# Steady state: nothing to maintain, avoid forking anything
+	if runner_fast_path; then
+		printf "\033[H\033[2J\033[?25h\n"
+		printf "\nIMCv2 WSL Auto-runner version ${ansi_cyan}${script_version}${ansi_reset}\n"
+		printf -- "---------------------------------\n\n"
+		printf "Type '${ansi_yellow}im${ansi_reset}' to start the SDK.\n\n"
+		runner_timing_report
+		exit 0
+	fi
+
 	# Clear the screen
 	clear
 	echo -e "\033[?25h"
 
 	# Make sure we're last in startup shell script
 	runner_pin_auto_start
+	pin_status=$?
 
 	# Display version information
 	printf "\nIMCv2 WSL Auto-runner version ${ansi_cyan}${script_version}${ansi_reset}\n"
@@ -662,9 +916,15 @@ main() {
 		fi
 	else
 		printf "Type '${ansi_yellow}im${ansi_reset}' to start the SDK.\n"
+
+		# Let the next shell start take the fast path
+		if [[ $pin_status -eq 0 ]]; then
+			runner_update_stamp
+		fi
 	fi
 
 	printf "\n"
+	runner_timing_report
 	exit $ret_val
 }
 